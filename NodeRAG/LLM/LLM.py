@@ -1,5 +1,16 @@
 import os
+import re
+import math
+import time
+import random
+import asyncio
+import hashlib
+import inspect
+import threading
 import backoff
+import numpy as np
+from typing import Dict
+from functools import wraps
 from ..utils.lazy_import import LazyImport
 from json import JSONDecodeError
 import json
@@ -7,7 +18,8 @@ import json
 
 from ..logging.error import (
     error_handler,
-    error_handler_async
+    error_handler_async,
+    ThrottleError
 )
 
 from ..LLM.LLM_base import (
@@ -20,6 +32,7 @@ from ..LLM.LLM_base import (
     OpenAI_message,
     Gemini_content
 )
+from .usage import report_usage
 
 
 from openai import (
@@ -35,11 +48,80 @@ from google.api_core.exceptions import (
 )
 
 
+# Throttling is handled by API_client for all in-flight requests at once, so it is not retried per call
+THROTTLE_ERRORS = (RateLimitError, ResourceExhausted, TooManyRequests)
 
 
+def is_throttle(exception:Exception) -> bool:
+    if isinstance(exception, THROTTLE_ERRORS):
+        return True
+    return getattr(exception,'code',None) == 429 or getattr(exception,'status_code',None) == 429
 
 
-
+def parse_duration(value:str) -> float|None:
+    '''Parse rate limit header durations such as "20ms", "1.5s" or "6m0s" into seconds'''
+    
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'ms':0.001,'s':1,'m':60,'h':3600}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value)
+    if not parts:
+        return None
+    return sum(float(number)*units[unit] for number,unit in parts)
+
+
+def retry_after(exception:Exception) -> float|None:
+    
+    headers = getattr(getattr(exception,'response',None),'headers',None)
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        return parse_duration(headers['retry-after-ms'])/1000
+    # x-ratelimit-reset-* give when the whole quota window resets, which can be hours away, not a backoff
+    if headers.get('retry-after'):
+        return parse_duration(headers['retry-after'])
+    return None
+
+
+def throttle_signal(func):
+    '''Turn provider specific throttling errors into ThrottleError carrying the advertised retry delay'''
+    
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if is_throttle(e):
+                    raise ThrottleError(str(e), retry_after(e)) from e
+                raise
+    else:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if is_throttle(e):
+                    raise ThrottleError(str(e), retry_after(e)) from e
+                raise
+    return wrapper
+
+
+def provider_usage(response, embedding: bool = False) -> None:
+    '''Report the token usage returned with an OpenAI or Gemini response'''
+    
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        if embedding:
+            report_usage(embedding_tokens=usage.prompt_tokens)
+        else:
+            report_usage(usage.prompt_tokens, usage.completion_tokens)
+        return
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata is not None:
+        report_usage(metadata.prompt_token_count, metadata.candidates_token_count)
 
 
 OpenAI = LazyImport('openai','OpenAI')
@@ -105,8 +187,9 @@ class OPENAI(LLM):
         return options
     
     
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          [RateLimitError, Timeout, APIConnectionError,JSONDecodeError], 
+                          (Timeout, APIConnectionError, JSONDecodeError), 
                           max_time=30, 
                           max_tries=4)
     def _create_completion(self, messages, response_format=None):
@@ -120,6 +203,7 @@ class OPENAI(LLM):
             
             params["response_format"] = response_format
             response = self.client.beta.chat.completions.parse(**params)
+            provider_usage(response)
             json_response = response.choices[0].message.parsed.model_dump_json()
             json_response = json.loads(json_response)
 
@@ -127,11 +211,13 @@ class OPENAI(LLM):
 
         else:
             response = self.client.chat.completions.create(**params)
+            provider_usage(response)
             return response.choices[0].message.content.strip()
 
         
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          [RateLimitError, Timeout, APIConnectionError,JSONDecodeError], 
+                          (Timeout, APIConnectionError, JSONDecodeError), 
                           max_time=30, 
                           max_tries=4)
     async def _create_completion_async(self, messages, response_format=None):
@@ -143,12 +229,14 @@ class OPENAI(LLM):
         if response_format:
             params["response_format"] = response_format
             response = await self.client_async.beta.chat.completions.parse(**params)
+            provider_usage(response)
             json_response = response.choices[0].message.parsed.model_dump_json()
             json_response = json.loads(json_response)
             return json_response
         else:
 
             response = await self.client_async.chat.completions.create(**params)
+            provider_usage(response)
             return response.choices[0].message.content.strip()
         
 
@@ -216,8 +304,9 @@ class OpenAI_Embedding(LLM):
         response = await self.API_client_async(input)
         return response
     
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          (RateLimitError, Timeout, APIConnectionError), 
+                          (Timeout, APIConnectionError), 
                           max_time=30, 
                           max_tries=4)
     def _create_embedding(self, input: Embedding_message) -> Embedding_output:
@@ -237,6 +326,7 @@ class OpenAI_Embedding(LLM):
             model=self.model_name,
             input=actual_input
         )
+        provider_usage(response, embedding=True)
         return [res.embedding for res in response.data]
     
     @error_handler
@@ -245,8 +335,9 @@ class OpenAI_Embedding(LLM):
         
         return response
     
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          (RateLimitError, Timeout, APIConnectionError), 
+                          (Timeout, APIConnectionError), 
                           max_time=30, 
                           max_tries=4)
     async def _create_embedding_async(self, input: Embedding_message) -> Embedding_output:
@@ -271,6 +362,7 @@ class OpenAI_Embedding(LLM):
             model=self.model_name,
             input=actual_input
         )
+        provider_usage(response, embedding=True)
         return [res.embedding for res in response.data]
     
     @error_handler_async
@@ -309,8 +401,9 @@ class Gemini(LLM):
         }
         return options
     
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          [ResourceExhausted,TooManyRequests, InternalServerError,JSONDecodeError], 
+                          (InternalServerError, JSONDecodeError), 
                           max_time=30, 
                           max_tries=4)
     def _create_completion(self, messages, response_format=None):
@@ -329,6 +422,7 @@ class Gemini(LLM):
                 response_schema=response_format,
             )
             response = self.client.models.generate_content(**params,config=config)
+            provider_usage(response)
             json_response = response.text
             json_response = json.loads(json_response)
             return json_response
@@ -340,10 +434,12 @@ class Gemini(LLM):
                 max_output_tokens=self.config.get("max_tokens", 10000),
             )
             response = self.client.models.generate_content(**params,config=config)
+            provider_usage(response)
             return response.text
         
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          (ResourceExhausted,TooManyRequests,InternalServerError,JSONDecodeError), 
+                          (InternalServerError, JSONDecodeError), 
                           max_time=30, 
                           max_tries=4)
     async def _create_completion_async(self, messages, response_format=None):
@@ -360,6 +456,7 @@ class Gemini(LLM):
                 response_schema=response_format,
             )
             response = await self.client.aio.models.generate_content(**params,config=config)
+            provider_usage(response)
             json_response = response.text
             json_response = json.loads(json_response)
             return json_response
@@ -371,6 +468,7 @@ class Gemini(LLM):
                 max_output_tokens=self.config.get("max_tokens", 10000),
             )
             response = await self.client.aio.models.generate_content(**params,config=config)
+            provider_usage(response)
             return response.text
 
 
@@ -430,8 +528,9 @@ class Gemini_Embedding(LLM):
             api_keys = os.getenv('GOOGLE_API_KEY')
         self.client = genai.Client(api_key=api_keys)
     
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          (ResourceExhausted, TooManyRequests, InternalServerError), 
+                          (InternalServerError,), 
                           max_time=30, 
                           max_tries=4)
     def _create_embedding(self, input: Embedding_message) -> Embedding_output:
@@ -464,8 +563,9 @@ class Gemini_Embedding(LLM):
         response = self._create_embedding(input)
         return response
     
+    @throttle_signal
     @backoff.on_exception(backoff.expo, 
-                          (ResourceExhausted, TooManyRequests, InternalServerError), 
+                          (InternalServerError,), 
                           max_time=30, 
                           max_tries=4)
     async def _create_embedding_async(self, input: Embedding_message) -> Embedding_output:
@@ -498,3 +598,265 @@ class Gemini_Embedding(LLM):
         return response
 
 
+    
+    
+    
+def prompt_template_words() -> set:
+    '''Words of the shipped prompt templates, so fake outputs are built from the data inside a prompt'''
+    
+    global _prompt_template_words
+    if _prompt_template_words is None:
+        from ..utils.prompt import (answer, attribute_generation_prompt, community_summary,
+                                    decompose, relationship_reconstraction, text_decomposition)
+        words = set()
+        for module in [answer, attribute_generation_prompt, community_summary,
+                       decompose, relationship_reconstraction, text_decomposition]:
+            for value in vars(module).values():
+                if isinstance(value, str):
+                    words.update(word.lower() for word in re.findall(r'\w+', value))
+        _prompt_template_words = words
+    return _prompt_template_words
+
+_prompt_template_words = None
+
+    
+class Fake(LLM):
+    
+    def __init__(self, 
+                 model_name: str, 
+                 api_keys: str | None,
+                 Config: ModelConfig|None=None) -> None:
+        """
+        Offline provider returning deterministic, schema-valid responses derived from the prompt.
+        
+        The same prompt always produces the same response, so builds are repeatable. Latency,
+        throttling (429) and timeouts can be injected to exercise the concurrency and retry paths.
+        
+        Args:
+            model_name (str): Reported model name, defaults to "fake".
+            api_keys (str | None): Ignored.
+            Config (ModelConfig | None): fake_latency (mean seconds), fake_latency_distribution
+                ("fixed", "uniform", "exponential" or "lognormal"), fake_latency_sigma, fake_throttle_rate,
+                fake_timeout_rate, fake_retry_after, fake_output_tokens and fake_seed.
+        """
+        super().__init__(model_name or 'fake', api_keys, Config)
+        self.config = self.extract_config(Config or {})
+        self.random = random.Random(self.config['seed'])
+        self._lock = threading.Lock()
+        self.usage = {'requests':0,'prompt_tokens':0,'completion_tokens':0,'throttled':0,'timeouts':0}
+        
+    def extract_config(self, config: ModelConfig) -> ModelConfig:
+        options = {
+            "latency": config.get("fake_latency", 0.0),
+            "latency_distribution": config.get("fake_latency_distribution", "fixed"),
+            "latency_sigma": config.get("fake_latency_sigma", 0.5),
+            "throttle_rate": config.get("fake_throttle_rate", 0.0),
+            "timeout_rate": config.get("fake_timeout_rate", 0.0),
+            "retry_after": config.get("fake_retry_after", None),
+            "output_tokens": config.get("fake_output_tokens", 64),
+            "seed": config.get("fake_seed", 0),
+        }
+        return options
+    
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        return len(text)//4 + 1
+    
+    def latency(self) -> float:
+        
+        mean = self.config['latency']
+        if mean <= 0:
+            return 0.0
+        with self._lock:
+            match self.config['latency_distribution']:
+                case 'uniform':
+                    return self.random.uniform(0, 2*mean)
+                case 'exponential':
+                    return self.random.expovariate(1/mean)
+                case 'lognormal':
+                    sigma = self.config['latency_sigma']
+                    # keep the configured mean: E[lognormal] = exp(mu + sigma^2/2)
+                    return self.random.lognormvariate(math.log(mean) - sigma**2/2, sigma)
+                case _:
+                    return mean
+                
+    def inject_errors(self) -> None:
+        
+        with self._lock:
+            draw = self.random.random()
+            self.usage['requests'] += 1
+            if draw < self.config['throttle_rate']:
+                self.usage['throttled'] += 1
+                raise ThrottleError('Fake provider throttled the request', self.config['retry_after'])
+            if draw < self.config['throttle_rate'] + self.config['timeout_rate']:
+                self.usage['timeouts'] += 1
+                raise TimeoutError('Fake provider timed out')
+            
+    def account(self, input: LLM_message, response) -> None:
+        
+        prompt = input.get('system_prompt','') + input.get('query','')
+        completion = response if isinstance(response, str) else json.dumps(response)
+        prompt_tokens, completion_tokens = self.count_tokens(prompt), self.count_tokens(completion)
+        with self._lock:
+            self.usage['prompt_tokens'] += prompt_tokens
+            self.usage['completion_tokens'] += completion_tokens
+        report_usage(prompt_tokens, completion_tokens)
+        
+    @staticmethod
+    def words(text: str) -> list[str]:
+        '''Distinct non-template words of a prompt, capitalised names first'''
+        
+        template = prompt_template_words()
+        seen = set()
+        names, others = [], []
+        for word in re.findall(r'\w+', text):
+            key = word.lower()
+            if key in seen or key in template or len(word) < 3 or word.isdigit():
+                continue
+            seen.add(key)
+            (names if word[0].isupper() else others).append(word)
+        return names + others or ['fake']
+    
+    def phrase(self, rng: random.Random, words: list[str], length: int) -> str:
+        return ' '.join(rng.choice(words) for _ in range(max(1, length)))
+    
+    def fake_value(self, name: str, annotation, rng: random.Random, words: list[str]):
+        
+        # entities are drawn from capitalised names when the prompt has any
+        names = [word for word in words if word[0].isupper()] or words
+        # relationships are parsed as "source, relation, target" by the graph pipeline
+        if name == 'relationships':
+            return [f'{rng.choice(names)}, {self.phrase(rng, words, 2)}, {rng.choice(names)}'
+                    for _ in range(rng.randint(1, 3))]
+        if name == 'entities':
+            return rng.sample(names, min(len(names), rng.randint(1, 4)))
+        if hasattr(annotation, 'model_fields'):
+            return self.fake_instance(annotation, rng, words)
+        if getattr(annotation, '__origin__', None) is list:
+            item = annotation.__args__[0]
+            return [self.fake_value('', item, rng, words) for _ in range(rng.randint(1, 3))]
+        if annotation is int:
+            return rng.randint(0, 100)
+        if annotation is float:
+            return rng.random()
+        if annotation is bool:
+            return rng.random() < 0.5
+        length = self.config['output_tokens'] if name in ('description', 'semantic_unit') else 3
+        return self.phrase(rng, words, length)
+    
+    def fake_instance(self, schema, rng: random.Random, words: list[str]) -> Dict:
+        
+        return {name: self.fake_value(name, field.annotation, rng, words)
+                for name, field in schema.model_fields.items()}
+        
+    def fake_response(self, input: LLM_message):
+        
+        query = input.get('query', '')
+        rng = random.Random(hashlib.sha256(query.encode('utf-8')).hexdigest())
+        words = self.words(query)
+        response_format = input.get('response_format')
+        if response_format:
+            return response_format(**self.fake_instance(response_format, rng, words)).model_dump()
+        return self.phrase(rng, words, self.config['output_tokens'])
+    
+    @backoff.on_exception(backoff.expo, 
+                          (TimeoutError,), 
+                          max_time=30, 
+                          max_tries=4)
+    def _create_completion(self, input: LLM_message):
+        time.sleep(self.latency())
+        self.inject_errors()
+        response = self.fake_response(input)
+        self.account(input, response)
+        return response
+    
+    @backoff.on_exception(backoff.expo, 
+                          (TimeoutError,), 
+                          max_time=30, 
+                          max_tries=4)
+    async def _create_completion_async(self, input: LLM_message):
+        await asyncio.sleep(self.latency())
+        self.inject_errors()
+        response = self.fake_response(input)
+        self.account(input, response)
+        return response
+    
+    @error_handler
+    def API_client(self, input: LLM_message) -> LLMOutput:
+        return self._create_completion(input)
+    
+    @error_handler_async
+    async def API_client_async(self, input: LLM_message) -> LLMOutput:
+        return await self._create_completion_async(input)
+    
+    def stream_chat(self, input: LLM_message):
+        response = self.fake_response({'query': input.get('query', '')})
+        for word in response.split(' '):
+            yield word + ' '
+            
+            
+class Fake_Embedding(Fake):
+    
+    def __init__(self, 
+                 model_name: str, 
+                 api_keys: str | None,
+                 Config: ModelConfig|None=None) -> None:
+        """
+        Offline embedding provider returning deterministic unit vectors of dimension dim.
+        
+        Vectors are hashed bags of words, so texts sharing words are close and semantic search over a
+        fake build still returns related nodes. Accepts the same latency and error options as Fake.
+        """
+        super().__init__(model_name or 'fake_embedding', api_keys, Config)
+        self.dim = (Config or {}).get('dim', 1536)
+        
+    def embed(self, text: str) -> list[float]:
+        
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()) or [text]:
+            seed = int.from_bytes(hashlib.sha256(word.encode('utf-8')).digest()[:8], 'little')
+            vector += np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+    
+    def embed_input(self, input: Embedding_message) -> Embedding_output:
+        
+        if isinstance(input, list):
+            texts = [item['input'] if isinstance(item, dict) and 'input' in item else item for item in input]
+        elif isinstance(input, dict) and 'input' in input:
+            texts = input['input']
+        else:
+            texts = input
+        if isinstance(texts, str):
+            texts = [texts]
+        tokens = sum(self.count_tokens(text) for text in texts)
+        with self._lock:
+            self.usage['prompt_tokens'] += tokens
+        report_usage(embedding_tokens=tokens)
+        return [self.embed(text) for text in texts]
+    
+    @backoff.on_exception(backoff.expo, 
+                          (TimeoutError,), 
+                          max_time=30, 
+                          max_tries=4)
+    def _create_embedding(self, input: Embedding_message) -> Embedding_output:
+        time.sleep(self.latency())
+        self.inject_errors()
+        return self.embed_input(input)
+    
+    @backoff.on_exception(backoff.expo, 
+                          (TimeoutError,), 
+                          max_time=30, 
+                          max_tries=4)
+    async def _create_embedding_async(self, input: Embedding_message) -> Embedding_output:
+        await asyncio.sleep(self.latency())
+        self.inject_errors()
+        return self.embed_input(input)
+    
+    @error_handler
+    def API_client(self, input: Embedding_message) -> Embedding_output:
+        return self._create_embedding(input)
+    
+    @error_handler_async
+    async def API_client_async(self, input: Embedding_message) -> Embedding_output:
+        return await self._create_embedding_async(input)
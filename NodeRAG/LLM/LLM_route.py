@@ -1,11 +1,19 @@
-import asyncio
-import time
+import os
+import json
+import tempfile
 from .LLM_base import I,O,Dict
 from .LLM import *
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .usage import call_usage, add_usage
+from ..utils.token_utils import get_token_counter
+from ..logging.metrics import get_metrics
 
 from ..logging.error import (
     cache_error,
-    cache_error_async
+    cache_error_async,
+    ErrorMessage,
+    ThrottleError
 )
 
 
@@ -30,6 +38,10 @@ def LLM_route(config : ModelConfig) -> LLM:
             return Gemini(model_name, api_keys, config)
         case "gemini_embedding":
             return Gemini_Embedding(embedding_model_name, api_keys, config)
+        case "fake" | "local":
+            return Fake(model_name, api_keys, config)
+        case "fake_embedding" | "local_embedding":
+            return Fake_Embedding(embedding_model_name, api_keys, config)
         case _:
             raise ValueError("Service provider not supported")
    
@@ -38,46 +50,186 @@ def LLM_route(config : ModelConfig) -> LLM:
 class API_client():
     
     def __init__(self, 
-                 config : ModelConfig) -> None:
+                 config : ModelConfig,
+                 response_cache : ResponseCache|None = None) -> None:
         
         self.llm = LLM_route(config)
-        # rate_limit is interpreted as requests per minute for time-based limiting
-        requests_per_minute = config.get("rate_limit", 10)
-        # Semaphore limits concurrent requests (set to 1 for strict rate limiting)
-        self.semaphore = asyncio.Semaphore(1)
-        # Calculate minimum delay between requests: 60 seconds / requests_per_minute
-        # For 10 requests/minute, this is 6 seconds between requests
-        self.min_delay = 60.0 / requests_per_minute if requests_per_minute > 0 else 6.0
-        self.last_request_time = 0.0
-        self._lock = asyncio.Lock()
-
+        self.embedding = str(config.get("service_provider")).endswith("embedding")
+        # identical requests are answered from the cache before any network call
+        self.response_cache = response_cache
+        self.cache_options = {'service_provider': config.get("service_provider"),
+                              'temperature': config.get("temperature", 0.0),
+                              'max_tokens': config.get("max_tokens", 10000)}
+        # rate_limit is interpreted as requests per minute, token_rate_limit as tokens per minute
+        self.rate_limiter = RateLimiter(config.get("rate_limit", 10),
+                                        config.get("token_rate_limit", None),
+                                        config.get("max_concurrency", 8),
+                                        decrease_factor=config.get("throttle_decrease", 0.5),
+                                        increase_step=config.get("throttle_increase", 0.02),
+                                        decrease_window=config.get("throttle_window", 5.0),
+                                        state_path=self.rate_limit_state_path(config))
+        self.token_counter = self.load_token_counter(self.llm.model_name)
+        # throttled requests are retried here, after the limiter has slowed every request down
+        self.throttle_retries = config.get("throttle_retries", 6)
 
+    def rate_limit_state_path(self, config : ModelConfig) -> str|None:
+        
+        '''Processes using the same provider and model share one budget when rate_limit_backend is "file"'''
+        
+        backend = config.get("rate_limit_backend", "local")
+        match backend:
+            case "local":
+                return None
+            case "file":
+                folder = config.get("rate_limit_state_dir", os.path.join(tempfile.gettempdir(), 'noderag_rate_limit'))
+                name = f'{config.get("service_provider")}_{self.llm.model_name}'.replace(os.sep,'_')
+                return os.path.join(folder, name)
+            case _:
+                raise ValueError(f"Rate limit backend {backend} not supported")
+    
+    @staticmethod
+    def load_token_counter(model_name:str|None):
+        
+        try:
+            return get_token_counter(model_name)
+        except Exception:
+            return None
+        
+    def count_tokens(self, text:str) -> int:
+        
+        if self.token_counter is None:
+            # roughly four characters per token for models without a known tokenizer
+            return len(text)//4 + 1
+        return self.token_counter(text)
+            
+    def input_tokens(self, input: I) -> int:
+        
+        if isinstance(input, dict):
+            if 'query' in input:
+                return self.count_tokens(input.get('system_prompt','')) + self.count_tokens(input['query'])
+            return self.input_tokens(input.get('input',''))
+        if isinstance(input, list):
+            return sum(self.input_tokens(item) for item in input)
+        if isinstance(input, str):
+            return self.count_tokens(input)
+        return 0
+            
+    def estimate_tokens(self, input: I) -> int:
+        
+        # only pay for tokenization when a tokens-per-minute budget is enforced
+        if not self.rate_limiter.counts_tokens:
+            return 0
+        return self.input_tokens(input)
+    
+    def request_usage(self, input: I, response: O, reported: Dict) -> Dict[str,int]:
+        
+        '''Tokens of a finished request, as reported by the provider or else counted locally'''
+        
+        if reported['reported']:
+            return {field: reported[field] for field in ['prompt_tokens','completion_tokens','embedding_tokens']}
+        if self.embedding:
+            return {'embedding_tokens': self.input_tokens(input)}
+        completion = response if isinstance(response, str) else json.dumps(response)
+        return {'prompt_tokens': self.input_tokens(input), 'completion_tokens': self.count_tokens(completion)}
+    
+    def cache_key(self, input: I) -> str|None:
+        
+        if self.response_cache is None:
+            return None
+        return ResponseCache.key(self.llm.model_name, input, self.cache_options)
+    
+    def cached(self, key: str|None) -> O|None:
+        
+        if key is None:
+            return None
+        response = self.response_cache.get(key)
+        if response is not None:
+            get_metrics().count('cache_hits')
+            add_usage({'cache_hits': 1})
+        return response
+    
+    def cache_response(self, key: str|None, response: O) -> None:
+        
+        # errors are never cached so a rebuild retries them
+        if key is not None and response is not None and not isinstance(response, ErrorMessage):
+            self.response_cache.put(key, response)
+    
+    def on_throttle(self, error: ThrottleError) -> ErrorMessage:
+        
+        self.rate_limiter.on_throttle(error.retry_after)
+        get_metrics().count('throttled')
+        return ErrorMessage(error)
+    
+    def finish(self, input: I, key: str|None, response: O, reported: Dict|None, tokens: int, attempts: int) -> O:
+        
+        usage = {}
+        if reported is not None and not isinstance(response, ErrorMessage):
+            self.rate_limiter.on_success()
+            self.cache_response(key, response)
+            usage = self.request_usage(input, response, reported)
+            if tokens:
+                self.rate_limiter.reconcile(tokens, sum(usage.values()))
+        
+        # counted into the build stage running when the request finishes and into open track_usage scopes
+        metrics = get_metrics()
+        metrics.count('llm_requests', attempts)
+        metrics.count('retries', attempts-1)
+        if isinstance(response, ErrorMessage):
+            metrics.count('errors')
+        for field, value in usage.items():
+            metrics.count(field, value)
+        add_usage({'requests': attempts, **usage})
+        return response
             
     @cache_error_async
     async def __call__(self, input: I, *,cache_path:str|None=None,meta_data:Dict|None=None) -> O:
         
-        async with self.semaphore:
-            # Time-based rate limiting
-            async with self._lock:
-                current_time = time.time()
-                time_since_last = current_time - self.last_request_time
-                if time_since_last < self.min_delay:
-                    await asyncio.sleep(self.min_delay - time_since_last)
-                self.last_request_time = time.time()
-            
-            response = await self.llm.predict_async(input)
-
+        key = self.cache_key(input)
+        cached = self.cached(key)
+        if cached is not None:
+            return cached
+        
+        tokens = self.estimate_tokens(input)
+        
+        for attempt in range(self.throttle_retries+1):
+            try:
+                with call_usage() as reported:
+                    async with self.rate_limiter.limit(tokens):
+                        response = await self.llm.predict_async(input)
+            except ThrottleError as e:
+                response = self.on_throttle(e)
+                continue
             
-        return response
+            return self.finish(input, key, response, reported, tokens, attempt+1)
+        
+        return self.finish(input, key, response, None, tokens, attempt+1)
+    
+    @property
+    def effective_rate(self) -> float:
+        return self.rate_limiter.effective_rate
     
     @cache_error
     def request(self, input:I, *,cache_path:str|None=None,meta_data:Dict|None=None) -> O:
         
+        key = self.cache_key(input)
+        cached = self.cached(key)
+        if cached is not None:
+            return cached
 
-        response = self.llm.predict(input)
+        tokens = self.estimate_tokens(input)
         
+        for attempt in range(self.throttle_retries+1):
+            try:
+                with call_usage() as reported:
+                    with self.rate_limiter.limit_sync(tokens):
+                        response = self.llm.predict(input)
+            except ThrottleError as e:
+                response = self.on_throttle(e)
+                continue
+            
+            return self.finish(input, key, response, reported, tokens, attempt+1)
         
-        return response
+        return self.finish(input, key, response, None, tokens, attempt+1)
     
     def stream_chat(self,input:I):
         yield from self.llm.stream_chat(input)
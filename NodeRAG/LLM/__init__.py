@@ -16,6 +16,8 @@ from .LLM_base import (
 )
 
 from .LLM_route import API_client
+from .response_cache import ResponseCache
+from .usage import track_usage, report_usage, empty_usage
 
 from .LLM_state import (
     get_api_client,
@@ -40,6 +42,10 @@ __all__ = [
     'I',
     'O',
     'API_client',
+    'ResponseCache',
+    'track_usage',
+    'report_usage',
+    'empty_usage',
     'get_api_client',
     'get_embedding_client',
     'set_api_client',
@@ -0,0 +1,283 @@
+import asyncio
+import math
+import threading
+import time
+import json
+import os
+from contextlib import asynccontextmanager, contextmanager
+
+# seconds, longest pause a throttled request puts on the request bucket
+MAX_THROTTLE_PAUSE = 30.0
+
+
+class TokenBucket():
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        """
+        Token bucket refilled continuously at rate_per_minute/60 tokens per second.
+
+        Args:
+            rate_per_minute (float): Sustained refill rate, math.inf admits everything at once.
+            capacity (float | None): Maximum burst size, defaults to one minute of refill.
+        """
+        if not rate_per_minute > 0:
+            raise ValueError(f'Token bucket rate must be positive, got {rate_per_minute}')
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.timestamp = self.clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def state(self):
+        with self._lock:
+            yield
+
+    def refill(self, now: float) -> None:
+        if self.rate == math.inf:
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+    def reserve(self, amount: float) -> float:
+        '''Take amount tokens, going into debt if needed, and return the seconds to wait before using them'''
+
+        with self.state():
+            now = self.clock()
+            self.refill(now)
+            # a single request larger than the bucket would otherwise never be admitted
+            self.tokens -= min(amount, self.capacity)
+            delay = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(delay, self.paused_until - now)
+
+    def refund(self, amount: float) -> None:
+
+        with self.state():
+            self.refill(self.clock())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds: float) -> None:
+        '''Admit nothing for the next seconds, e.g. while the provider asks clients to back off'''
+
+        with self.state():
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+class FileTokenBucket(TokenBucket):
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, path: str, rate_per_minute: float, capacity: float | None = None) -> None:
+        """
+        Token bucket whose state lives in a lock-protected file, shared by every process on the machine
+        that points at the same path. Each process refills with its own configured rate.
+
+        Args:
+            path (str): State file, created on first use.
+            rate_per_minute (float): Sustained refill rate.
+            capacity (float | None): Maximum burst size, defaults to one minute of refill.
+        """
+        super().__init__(rate_per_minute, capacity)
+        self.path = path
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    @contextmanager
+    def state(self):
+        import fcntl
+
+        with self._lock, open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                if content:
+                    state = json.loads(content)
+                    self.tokens = min(self.capacity, state['tokens'])
+                    self.timestamp = state['timestamp']
+                    self.paused_until = state.get('paused_until', 0.0)
+                yield
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({'tokens': self.tokens,
+                                    'timestamp': self.timestamp,
+                                    'paused_until': self.paused_until}))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RateLimiter():
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self,
+                 requests_per_minute: float,
+                 tokens_per_minute: float | None = None,
+                 max_concurrency: int = 1,
+                 decrease_factor: float = 0.5,
+                 increase_step: float = 0.02,
+                 min_factor: float = 0.05,
+                 decrease_window: float = 5.0,
+                 state_path: str | None = None) -> None:
+        """
+        Enforce requests-per-minute and tokens-per-minute budgets plus a cap on in-flight requests.
+
+        Reservations are taken in arrival order, so waiting tasks are admitted first come first served
+        instead of polling the buckets. On top of the static budgets the limiter adapts its rate to
+        throttling: a throttled request multiplies the effective rate by decrease_factor, at most once per
+        decrease_window, so a burst of 429s from requests already in flight counts as one signal. Every
+        successful request raises the rate by increase_step of its current value, up to the configured
+        budget. The concurrency cap is not adapted, the paced rate already keeps requests apart.
+
+        Args:
+            requests_per_minute (float): Request budget, the bucket allows one second of burst. Zero or
+                less leaves requests unlimited.
+            tokens_per_minute (float | None): Token budget, disabled when None, zero or less.
+            max_concurrency (int): Maximum number of requests in flight at once.
+            decrease_factor (float): Multiplicative decrease applied on throttling.
+            increase_step (float): Relative increase of the rate factor applied on success.
+            min_factor (float): Lower bound of the rate factor.
+            decrease_window (float): Seconds after a decrease during which throttling does not decrease again.
+            state_path (str | None): Share the budgets with other processes through lock-protected
+                files at state_path + '.requests' / '.tokens'. Process local when None.
+        """
+        self.requests_per_minute = requests_per_minute if requests_per_minute and requests_per_minute > 0 else math.inf
+        self.tokens_per_minute = tokens_per_minute if tokens_per_minute and tokens_per_minute > 0 else None
+        capacity = max(1.0, self.requests_per_minute / 60.0)
+        if state_path is None:
+            self.request_bucket = TokenBucket(self.requests_per_minute, capacity=capacity)
+            self.token_bucket = TokenBucket(self.tokens_per_minute) if self.tokens_per_minute else None
+        else:
+            self.request_bucket = FileTokenBucket(state_path + '.requests', self.requests_per_minute, capacity=capacity)
+            self.token_bucket = FileTokenBucket(state_path + '.tokens', self.tokens_per_minute) if self.tokens_per_minute else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_factor = min_factor
+        self.decrease_window = decrease_window
+
+        self.factor = 1.0
+        self.in_flight = 0
+        self.in_flight_sync = 0
+        self.last_decrease = -math.inf
+        self.consecutive_throttles = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._condition = None
+        self._loop = None
+        self._thread_condition = threading.Condition()
+
+    @property
+    def counts_tokens(self) -> bool:
+        return self.token_bucket is not None
+
+    @property
+    def effective_rate(self) -> float:
+        '''Requests per minute currently allowed after adaptation'''
+        return self.requests_per_minute * self.factor
+
+    @property
+    def effective_concurrency(self) -> int:
+        return self.max_concurrency
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # asyncio primitives are bound to the loop that first waits on them
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    def stats(self) -> dict:
+        return {'effective_rate': self.effective_rate,
+                'effective_concurrency': self.effective_concurrency,
+                'in_flight': self.in_flight + self.in_flight_sync,
+                'throttled': self.throttled}
+
+    def set_factor(self, factor: float) -> None:
+
+        self.factor = min(1.0, max(self.min_factor, factor))
+        self.request_bucket.rate = self.requests_per_minute * self.factor / 60.0
+        if self.token_bucket is not None:
+            self.token_bucket.rate = self.tokens_per_minute * self.factor / 60.0
+
+    def on_success(self) -> None:
+
+        with self._lock:
+            self.consecutive_throttles = 0
+            if self.factor < 1.0:
+                self.set_factor(self.factor * (1.0 + self.increase_step))
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        '''Slow every request down after the provider throttled one'''
+
+        with self._lock:
+            now = self.clock()
+            self.throttled += 1
+            self.consecutive_throttles += 1
+            # requests sent before the last decrease took effect are throttled at the old rate, do not punish twice
+            if now - self.last_decrease >= self.decrease_window:
+                self.set_factor(self.factor * self.decrease_factor)
+                self.last_decrease = now
+            if retry_after is None:
+                retry_after = 2 ** (self.consecutive_throttles - 1)
+            # a shared (file) bucket pauses every build process on the machine, so no pause exceeds the backoff ceiling
+            retry_after = min(MAX_THROTTLE_PAUSE, retry_after)
+        self.request_bucket.pause(retry_after)
+
+    def reserve(self, tokens: int = 0) -> float:
+
+        delay = self.request_bucket.reserve(1)
+        if self.token_bucket is not None and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        return delay
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        '''Correct the token bucket once the provider reports the real usage of a request'''
+
+        if self.token_bucket is None:
+            return
+        if actual < estimated:
+            self.token_bucket.refund(estimated - actual)
+        elif actual > estimated:
+            self.token_bucket.reserve(actual - estimated)
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0):
+
+        condition = self.condition
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.effective_concurrency)
+            self.in_flight += 1
+        try:
+            delay = self.reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+    @contextmanager
+    def limit_sync(self, tokens: int = 0):
+
+        with self._thread_condition:
+            self._thread_condition.wait_for(lambda: self.in_flight_sync < self.effective_concurrency)
+            self.in_flight_sync += 1
+        try:
+            delay = self.reserve(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+        finally:
+            with self._thread_condition:
+                self.in_flight_sync -= 1
+                self._thread_condition.notify_all()
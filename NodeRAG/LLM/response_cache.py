@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+
+class ResponseCache():
+
+    def __init__(self, path: str, max_size_mb: float = 1024) -> None:
+        """
+        Content-addressed store of LLM and embedding responses in an SQLite file.
+
+        Responses are keyed by a hash of everything that determines them (model, prompt, response
+        schema, sampling settings), so identical requests from a rebuild are answered locally.
+        When the stored responses grow beyond max_size_mb the least recently used ones are evicted.
+
+        Args:
+            path (str): SQLite database file, created on first use.
+            max_size_mb (float): Size budget of the stored responses in megabytes.
+        """
+        self.path = path
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # one connection shared by the event loop and search threads, serialized by the lock
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS responses (
+                                       key TEXT PRIMARY KEY,
+                                       value TEXT NOT NULL,
+                                       size INTEGER NOT NULL,
+                                       accessed REAL NOT NULL)''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self.connection.commit()
+        self.size = self.connection.execute('SELECT COALESCE(SUM(size),0) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def key(model: str, input: Any, options: dict | None = None) -> str:
+        '''Hash model, request content, response schema and sampling options into a cache key'''
+
+        return hashlib.sha256(json.dumps({'model': model,
+                                          'input': ResponseCache.normalize(input),
+                                          'options': options or {}},
+                                         sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def normalize(value: Any) -> Any:
+        # pydantic response formats are identified by their JSON schema
+        if hasattr(value, 'model_json_schema'):
+            return value.model_json_schema()
+        if isinstance(value, dict):
+            return {k: ResponseCache.normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [ResponseCache.normalize(v) for v in value]
+        return value
+
+    def get(self, key: str) -> Any | None:
+
+        with self._lock:
+            row = self.connection.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+            self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        with self._lock:
+            previous = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.connection.execute('INSERT OR REPLACE INTO responses (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                                    (key, data, size, time.time()))
+            self.size += size - (previous[0] if previous else 0)
+            if self.size > self.max_size:
+                self.evict()
+            self.connection.commit()
+
+    def evict(self) -> None:
+        '''Drop least recently used responses until the cache is back under 90% of its budget'''
+
+        target = self.max_size * 0.9
+        rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self.connection.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        self.evictions += len(evicted)
+
+    def stats(self) -> dict:
+
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'entries': entries,
+                'size_mb': self.size / (1024 * 1024)}
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self.connection.execute('DELETE FROM responses')
+            self.connection.commit()
+            self.size = 0
+
+    def close(self) -> None:
+
+        with self._lock:
+            self.connection.close()
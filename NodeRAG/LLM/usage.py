@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+
+USAGE_FIELDS = ('requests', 'cache_hits', 'prompt_tokens', 'completion_tokens', 'embedding_tokens')
+
+# usage reported by the provider for the request being made in this context
+_call_usage: ContextVar[Dict | None] = ContextVar('noderag_call_usage', default=None)
+# accumulators opened with track_usage, every finished request is added to all of them
+_scopes: ContextVar[tuple] = ContextVar('noderag_usage_scopes', default=())
+_lock = threading.Lock()
+
+
+def empty_usage() -> Dict[str, int]:
+    return {field: 0 for field in USAGE_FIELDS}
+
+
+def report_usage(prompt_tokens: int = 0, completion_tokens: int = 0, embedding_tokens: int = 0) -> None:
+    '''Called by providers with the token counts returned alongside a response'''
+
+    usage = _call_usage.get()
+    if usage is None:
+        return
+    usage['prompt_tokens'] += prompt_tokens or 0
+    usage['completion_tokens'] += completion_tokens or 0
+    usage['embedding_tokens'] += embedding_tokens or 0
+    usage['reported'] = True
+
+
+@contextmanager
+def call_usage():
+    '''Collect the usage reported by the provider for one request'''
+
+    usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'embedding_tokens': 0, 'reported': False}
+    token = _call_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _call_usage.reset(token)
+
+
+@contextmanager
+def track_usage(*usages: Dict[str, int]):
+    """
+    Accumulate requests, cache hits and tokens of every API_client call made inside the block.
+
+    Scopes nest and follow the context into tasks and threads started with asyncio.to_thread.
+
+    Args:
+        *usages (Dict[str, int]): Accumulators to add to, a new one is created when none is given.
+
+    Yields:
+        Dict[str, int]: The first accumulator.
+    """
+    usages = usages or (empty_usage(),)
+    token = _scopes.set(_scopes.get() + usages)
+    try:
+        yield usages[0]
+    finally:
+        _scopes.reset(token)
+
+
+def add_usage(usage: Dict[str, int]) -> None:
+
+    scopes = _scopes.get()
+    if not scopes:
+        return
+    with _lock:
+        for scope in scopes:
+            for field in USAGE_FIELDS:
+                scope[field] = scope.get(field, 0) + usage.get(field, 0)
@@ -1,14 +1,27 @@
 import argparse
 from .visual_html import visualize
+from .visual_webgl import export_graph_view, serve
 from rich import console
 
 console = console.Console()
 
 parser = argparse.ArgumentParser()
 parser.add_argument('-f', "--main_folder", type=str, required=True)
-parser.add_argument('-n', "--nodes_num", type=int, default=500,help="nodes number")
+parser.add_argument('-n', "--nodes_num", type=int, default=None,help="nodes number (default 500, 50000 with --webgl)")
+parser.add_argument('-w', "--webgl", action='store_true',help="export a server-side layout for the WebGL viewer instead of the pyvis page")
+parser.add_argument("--niter", type=int, default=200,help="layout iterations for --webgl")
+parser.add_argument('-s', "--serve", action='store_true',help="serve the WebGL export over HTTP after writing it")
+parser.add_argument('-p', "--port", type=int, default=8000)
+parser.add_argument("--host", default='127.0.0.1',help="address to serve on; 0.0.0.0 publishes the node texts to the network")
 args = parser.parse_args()
 
-console.print(f"Visualizing {args.main_folder} with nodes number {args.nodes_num}")
-visualize(args.main_folder, args.nodes_num)
-
+if args.webgl:
+    nodes_num = args.nodes_num or 50000
+    console.print(f"Exporting {args.main_folder} for the WebGL viewer with nodes number {nodes_num}")
+    output = export_graph_view(args.main_folder, nodes_num, args.niter)
+    if args.serve:
+        serve(output, args.port, args.host)
+else:
+    nodes_num = args.nodes_num or 500
+    console.print(f"Visualizing {args.main_folder} with nodes number {nodes_num}")
+    visualize(args.main_folder, nodes_num)
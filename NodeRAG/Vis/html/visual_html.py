@@ -1,7 +1,9 @@
 from pyvis.network import Network
-import pickle
 from NodeRAG.storage.graph_mapping import Mapper
+from NodeRAG.storage.graph_store import GraphStore
 from NodeRAG.utils.PPR import sparse_PPR
+from NodeRAG.utils.compact_graph import CompactGraph
+from NodeRAG.utils.search_graph import PageRankStore
 import os
 import math
 from tqdm import tqdm
@@ -11,35 +13,29 @@ import networkx as nx
 console = Console()
 
 def load_graph(cache_folder):
-    with open(os.path.join(cache_folder, 'graph.pkl'), 'rb') as f:
-        return pickle.load(f)
+    return GraphStore(os.path.join(cache_folder, 'graph.pkl')).load(track=False)
 
 def initialize_mapper(cache_folder, storage):
     return Mapper([os.path.join(cache_folder, s) for s in storage])
 
+def load_page_rank(cache_folder, graph):
+    return PageRankStore(os.path.join(cache_folder, 'pagerank.pkl'), os.path.join(cache_folder, 'graph.pkl')).load(graph)
+
 def create_network():
     return Network(height='100vh', width='100vw', bgcolor='#222222', font_color='white')
 
-def filter_nodes(graph,nodes_num=2000):
+def filter_nodes(graph,nodes_num=2000,page_rank=None):
     
-    page_rank = sparse_PPR(graph).PR()
+    if page_rank is None:
+        page_rank = sparse_PPR(graph).PR()
     nodes = [node for node,score in page_rank[:nodes_num]]
     subgraph = graph.subgraph(nodes).copy()
     if not nx.is_connected(subgraph):
-        console.print(f"subgraph is not connected")
-        additional_nodes = set()
-        for i in range(len(nodes)):
-            for j in range(i+1,len(nodes)):
-                if not nx.has_path(subgraph,nodes[i],nodes[j]):
-                    # Try to find path in full graph, but handle case where no path exists
-                    try:
-                        path_length,path_nodes = nx.bidirectional_dijkstra(graph,nodes[i],nodes[j])
-                        additional_nodes.update(set(path_nodes))
-                    except nx.NetworkXNoPath:
-                        # No path exists in full graph either - skip connecting these nodes
-                        console.print(f"No path found between nodes {nodes[i][:20]}... and {nodes[j][:20]}... - skipping")
-                        continue
-        final_nodes = set(nodes) | additional_nodes
+        # join the components of the top nodes through an approximate Steiner tree in the full graph
+        compact = CompactGraph.from_networkx(graph)
+        additional_nodes = compact.ids.decode(compact.steiner_connectors(compact.ids.encode(nodes)))
+        console.print(f"subgraph is not connected, {len(additional_nodes)} nodes added to connect it")
+        final_nodes = set(nodes) | set(additional_nodes)
         subgraph = graph.subgraph(final_nodes).copy()
     else:
         final_nodes = set(nodes)
@@ -57,15 +53,8 @@ def add_nodes_to_network(net, subgraph, mapper,weighted_nodes):
         node_dict = subgraph.nodes[node]
         node_type = node_dict['type']
         color = get_node_color(node_type)
-        
-        # Get node context/title - try mapper first, fallback to graph node data
-        try:
-            node_title = mapper.get(node, 'context')
-        except KeyError:
-            # Fallback: get text from graph node if not in mapper (for Q&A nodes or other edge cases)
-            node_title = node_dict.get('text', node_dict.get('context', ''))
-        
-        net.add_node(node, label=node_type, title=node_title, color=color, size=20 * weighted_nodes[node] + 20)
+        title = node_title(mapper, node, node_dict)
+        net.add_node(node, label=node_type, title=title, color=color, size=20 * weighted_nodes[node] + 20)
 
 def get_node_color(node_type):
     match node_type:
@@ -112,7 +101,7 @@ def set_network_options(net):
     }
     """)
 
-def visualize(main_folder,nodes_num=2000):
+def resolve_main_folder(main_folder):
     # Support multi-user: if main_folder contains user_id in config, use effective_main_folder
     # Otherwise use main_folder as-is (backward compatible)
     effective_main_folder = main_folder
@@ -128,9 +117,9 @@ def visualize(main_folder,nodes_num=2000):
         except:
             # If config loading fails, use original main_folder
             pass
-    
-    cache_folder = os.path.join(effective_main_folder, 'cache')
-    graph = load_graph(cache_folder)
+    return effective_main_folder
+
+def load_mapper(cache_folder):
 
     storage = ['attributes.parquet', 'entities.parquet', 'relationship.parquet', 'high_level_elements.parquet', 'semantic_units.parquet','text.parquet','high_level_elements_titles.parquet']
     
@@ -141,10 +130,25 @@ def visualize(main_folder,nodes_num=2000):
         if os.path.exists(qa_path):
             storage.append(qa_file)
     
-    mapper = initialize_mapper(cache_folder, storage)
+    return initialize_mapper(cache_folder, storage)
+
+def node_title(mapper, node, node_dict):
+    
+    # Get node context/title - try mapper first, fallback to graph node data
+    try:
+        return mapper.get(node, 'context')
+    except KeyError:
+        # Fallback: get text from graph node if not in mapper (for Q&A nodes or other edge cases)
+        return node_dict.get('text', node_dict.get('context', ''))
+
+def visualize(main_folder,nodes_num=2000):
+    effective_main_folder = resolve_main_folder(main_folder)
+    cache_folder = os.path.join(effective_main_folder, 'cache')
+    graph = load_graph(cache_folder)
+    mapper = load_mapper(cache_folder)
 
     net = create_network()
-    subgraph,weighted_nodes = filter_nodes(graph,nodes_num)
+    subgraph,weighted_nodes = filter_nodes(graph,nodes_num,load_page_rank(cache_folder,graph))
 
     add_nodes_to_network(net, subgraph, mapper,weighted_nodes)
     add_edges_to_network(net, subgraph)
@@ -0,0 +1,338 @@
+import os
+import json
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import numpy as np
+import igraph as ig
+from rich.console import Console
+
+from NodeRAG.utils.compact_graph import CompactGraph
+from NodeRAG.Vis.html.visual_html import (
+    resolve_main_folder,
+    load_graph,
+    load_mapper,
+    load_page_rank,
+    node_title,
+    get_node_color
+)
+console = Console()
+
+TOOLTIP_CHUNK = 1000
+DEFAULT_COLOR = '#AAAAAA'
+
+
+def select_nodes(compact, page_rank, nodes_num):
+    '''Codes of the top nodes_num nodes plus their connectors, ordered by PageRank, and the score of every node'''
+
+    scores = np.zeros(compact.n_nodes, dtype=np.float32)
+    scores[compact.ids.encode([node for node,score in page_rank])] = [score for node,score in page_rank]
+    top = compact.ids.encode([node for node,score in page_rank[:nodes_num]])
+    selected = np.union1d(top, compact.steiner_connectors(top))
+    return selected[np.argsort(-scores[selected], kind='stable')], scores
+
+def subgraph_edges(compact, order):
+    '''Edges between the selected nodes as positions in order, sorted by the later-ranked end'''
+
+    position = np.full(compact.n_nodes, -1, dtype=np.int64)
+    position[order] = np.arange(len(order))
+    src, dst = position[compact.src], position[compact.dst]
+    keep = (src >= 0) & (dst >= 0) & (src != dst)
+    edges = np.column_stack([src[keep], dst[keep]])
+    # the viewer draws the first k nodes and every edge among them as a prefix of this array
+    return edges[np.argsort(edges.max(axis=1), kind='stable')]
+
+def layout(n_nodes, edges, niter):
+
+    coords = np.array(ig.Graph(n=n_nodes, edges=edges.tolist()).layout_fruchterman_reingold(grid=True, niter=niter).coords, dtype=np.float64)
+    if len(coords) == 0:
+        return coords.reshape(0, 2)
+    coords -= (coords.max(axis=0) + coords.min(axis=0)) / 2
+    extent = np.abs(coords).max()
+    return coords / extent if extent > 0 else coords
+
+def write_tooltips(folder, graph, mapper, nodes):
+
+    os.makedirs(folder, exist_ok=True)
+    for start in range(0, len(nodes), TOOLTIP_CHUNK):
+        chunk = [{'id': node, 'type': graph.nodes[node].get('type'), 'text': node_title(mapper, node, graph.nodes[node])}
+                 for node in nodes[start:start + TOOLTIP_CHUNK]]
+        with open(os.path.join(folder, f'{start // TOOLTIP_CHUNK}.json'), 'w', encoding='utf-8') as f:
+            json.dump(chunk, f, ensure_ascii=False)
+
+def export_graph_view(main_folder, nodes_num=50000, niter=200, output=None):
+    """
+    Export the top nodes_num nodes by PageRank for the WebGL viewer.
+
+    The layout is computed here with igraph (Fruchterman-Reingold, grid variant). Node positions,
+    sizes and types go to nodes.bin (float32 x, y, size, type per node, by descending PageRank),
+    edges to edges.bin (uint32 pairs), tooltips to tooltips/<chunk>.json fetched on hover, and the
+    viewer to index.html. The folder has to be served over HTTP, e.g. with serve().
+
+    Args:
+        main_folder (str): Main folder of the build.
+        nodes_num (int): Nodes shown when zoomed in fully; connector nodes are added to these.
+        niter (int): Layout iterations.
+        output (str): Export folder, main_folder/graph_view by default.
+
+    Returns:
+        str: The export folder.
+    """
+    effective_main_folder = resolve_main_folder(main_folder)
+    cache_folder = os.path.join(effective_main_folder, 'cache')
+    output = output or os.path.join(effective_main_folder, 'graph_view')
+    os.makedirs(output, exist_ok=True)
+
+    graph = load_graph(cache_folder)
+    compact = CompactGraph.from_networkx(graph)
+    order, scores = select_nodes(compact, load_page_rank(cache_folder, graph), nodes_num)
+    edges = subgraph_edges(compact, order)
+    console.print(f"layout of {len(order)} nodes and {len(edges)} edges")
+    coords = layout(len(order), edges, niter)
+
+    # node size grows with PageRank relative to the top node, as the pyvis export does with the raw score
+    top_score = scores[order[0]] if len(order) and scores[order[0]] > 0 else 1
+    types = compact.types[order]
+    nodes = np.column_stack([coords, 1 + 4 * scores[order] / top_score, types]).astype(np.float32)
+    nodes.tofile(os.path.join(output, 'nodes.bin'))
+    edges.astype(np.uint32).tofile(os.path.join(output, 'edges.bin'))
+
+    type_names = [str(name) for name in compact.type_names]
+    with open(os.path.join(output, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'nodes': len(order),
+                   'edges': len(edges),
+                   'types': type_names,
+                   'colors': [get_node_color(name) or DEFAULT_COLOR for name in type_names],
+                   'tooltip_chunk': TOOLTIP_CHUNK}, f)
+
+    write_tooltips(os.path.join(output, 'tooltips'), graph, load_mapper(cache_folder), compact.ids.decode(order))
+    with open(os.path.join(output, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(VIEWER_HTML)
+
+    console.print(f"graph view written to {output}")
+    return output
+
+def serve(folder, port=8000, host='127.0.0.1'):
+
+    # the tooltips hold the full text of every node, so the export is served to this machine unless a host is given
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=folder)
+    console.print(f"serving {folder} on http://{host}:{port}/")
+    ThreadingHTTPServer((host, port), handler).serve_forever()
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>NodeRAG graph</title>
+<style>
+html, body { margin: 0; height: 100%; overflow: hidden; background: #222222; font-family: sans-serif; }
+canvas { display: block; width: 100vw; height: 100vh; }
+#info { position: absolute; left: 8px; top: 8px; color: #aaaaaa; font-size: 12px; }
+#tip { position: absolute; display: none; max-width: 420px; padding: 6px 8px; border-radius: 4px; background: #333333;
+       color: #eeeeee; font-size: 12px; white-space: pre-wrap; pointer-events: none; }
+</style>
+</head>
+<body>
+<canvas id="canvas"></canvas>
+<div id="info"></div>
+<div id="tip"></div>
+<script>
+const canvas = document.getElementById('canvas');
+const info = document.getElementById('info');
+const tip = document.getElementById('tip');
+const gl = canvas.getContext('webgl', {antialias: true});
+gl.getExtension('OES_element_index_uint');
+
+// nodes by descending PageRank: zoom level decides how long a prefix is drawn
+const LOD_NODES = 5000;
+const view = {zoom: 1, x: 0, y: 0};
+let meta, nodes, edges, edgeEnds, programs, buffers;
+let hovered = -1;
+const tooltips = new Map();
+
+function compile(vertex, fragment) {
+  const program = gl.createProgram();
+  for (const [type, source] of [[gl.VERTEX_SHADER, vertex], [gl.FRAGMENT_SHADER, fragment]]) {
+    const shader = gl.createShader(type);
+    gl.shaderSource(shader, source);
+    gl.compileShader(shader);
+    gl.attachShader(program, shader);
+  }
+  gl.linkProgram(program);
+  return program;
+}
+
+const TRANSFORM = `
+  uniform vec2 scale;
+  uniform vec2 offset;
+  vec4 project(vec2 p) { return vec4((p + offset) * scale, 0.0, 1.0); }`;
+
+function setup() {
+  const node = compile(`
+    attribute vec4 node;
+    uniform vec3 colors[16];
+    uniform float pointScale;
+    varying vec3 color;
+    ${TRANSFORM}
+    void main() {
+      gl_Position = project(node.xy);
+      gl_PointSize = max(2.0, node.z * pointScale);
+      color = colors[int(node.w)];
+    }`, `
+    precision mediump float;
+    varying vec3 color;
+    void main() {
+      if (length(gl_PointCoord - 0.5) > 0.5) discard;
+      gl_FragColor = vec4(color, 1.0);
+    }`);
+  const edge = compile(`
+    attribute vec4 node;
+    ${TRANSFORM}
+    void main() { gl_Position = project(node.xy); }`, `
+    precision mediump float;
+    void main() { gl_FragColor = vec4(0.6, 0.6, 0.6, 0.25); }`);
+  programs = {node, edge};
+
+  buffers = {nodes: gl.createBuffer(), edges: gl.createBuffer()};
+  gl.bindBuffer(gl.ARRAY_BUFFER, buffers.nodes);
+  gl.bufferData(gl.ARRAY_BUFFER, nodes, gl.STATIC_DRAW);
+  gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, buffers.edges);
+  gl.bufferData(gl.ELEMENT_ARRAY_BUFFER, edges, gl.STATIC_DRAW);
+
+  const colors = new Float32Array(48);
+  meta.colors.slice(0, 16).forEach((hex, i) => {
+    for (let c = 0; c < 3; c++) colors[3 * i + c] = parseInt(hex.slice(1 + 2 * c, 3 + 2 * c), 16) / 255;
+  });
+  gl.useProgram(programs.node);
+  gl.uniform3fv(gl.getUniformLocation(programs.node, 'colors'), colors);
+  gl.enable(gl.BLEND);
+  gl.blendFunc(gl.SRC_ALPHA, gl.ONE_MINUS_SRC_ALPHA);
+}
+
+function visibleNodes() {
+  return Math.min(meta.nodes, Math.floor(LOD_NODES * view.zoom * view.zoom));
+}
+
+function visibleEdges(k) {
+  // edges are sorted by their later-ranked end, the visible ones are a prefix
+  let lo = 0, hi = meta.edges;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (edgeEnds[mid] < k) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+function scale() {
+  const aspect = canvas.width / canvas.height;
+  return aspect > 1 ? [view.zoom / aspect, view.zoom] : [view.zoom, view.zoom * aspect];
+}
+
+function draw() {
+  canvas.width = canvas.clientWidth * devicePixelRatio;
+  canvas.height = canvas.clientHeight * devicePixelRatio;
+  gl.viewport(0, 0, canvas.width, canvas.height);
+  gl.clearColor(0.133, 0.133, 0.133, 1);
+  gl.clear(gl.COLOR_BUFFER_BIT);
+
+  const k = visibleNodes();
+  const m = visibleEdges(k);
+  for (const program of [programs.edge, programs.node]) {
+    gl.useProgram(program);
+    gl.uniform2fv(gl.getUniformLocation(program, 'scale'), scale());
+    gl.uniform2f(gl.getUniformLocation(program, 'offset'), view.x, view.y);
+    const location = gl.getAttribLocation(program, 'node');
+    gl.bindBuffer(gl.ARRAY_BUFFER, buffers.nodes);
+    gl.enableVertexAttribArray(location);
+    gl.vertexAttribPointer(location, 4, gl.FLOAT, false, 16, 0);
+  }
+  gl.useProgram(programs.edge);
+  gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, buffers.edges);
+  gl.drawElements(gl.LINES, 2 * m, gl.UNSIGNED_INT, 0);
+  gl.useProgram(programs.node);
+  gl.uniform1f(gl.getUniformLocation(programs.node, 'pointScale'), devicePixelRatio * Math.sqrt(view.zoom) * 3);
+  gl.drawArrays(gl.POINTS, 0, k);
+  info.textContent = `${k} of ${meta.nodes} nodes, ${m} of ${meta.edges} edges`;
+}
+
+let pending = false;
+function redraw() {
+  if (!pending) {
+    pending = true;
+    requestAnimationFrame(() => { pending = false; draw(); });
+  }
+}
+
+function toWorld(event) {
+  const [sx, sy] = scale();
+  const x = (2 * event.clientX / canvas.clientWidth - 1) / sx - view.x;
+  const y = (1 - 2 * event.clientY / canvas.clientHeight) / sy - view.y;
+  return [x, y];
+}
+
+function nearest(event) {
+  const [x, y] = toWorld(event);
+  const radius = 8 * 2 / canvas.clientHeight / view.zoom;
+  let best = -1, bestDistance = radius * radius;
+  for (let i = 0, k = visibleNodes(); i < k; i++) {
+    const dx = nodes[4 * i] - x, dy = nodes[4 * i + 1] - y;
+    const d = dx * dx + dy * dy;
+    if (d < bestDistance) { best = i; bestDistance = d; }
+  }
+  return best;
+}
+
+async function tooltip(i) {
+  const chunk = Math.floor(i / meta.tooltip_chunk);
+  if (!tooltips.has(chunk)) tooltips.set(chunk, fetch(`tooltips/${chunk}.json`).then(r => r.json()));
+  return (await tooltips.get(chunk))[i % meta.tooltip_chunk];
+}
+
+let drag = null;
+canvas.addEventListener('mousedown', e => { drag = [e.clientX, e.clientY]; });
+window.addEventListener('mouseup', () => { drag = null; });
+canvas.addEventListener('mousemove', async e => {
+  if (drag) {
+    const [sx, sy] = scale();
+    view.x += 2 * (e.clientX - drag[0]) / canvas.clientWidth / sx;
+    view.y -= 2 * (e.clientY - drag[1]) / canvas.clientHeight / sy;
+    drag = [e.clientX, e.clientY];
+    tip.style.display = 'none';
+    redraw();
+    return;
+  }
+  const i = nearest(e);
+  hovered = i;
+  if (i < 0) { tip.style.display = 'none'; return; }
+  const node = await tooltip(i);
+  if (hovered !== i) return;
+  tip.textContent = `${node.type}\\n${node.text}`;
+  tip.style.left = `${e.clientX + 12}px`;
+  tip.style.top = `${e.clientY + 12}px`;
+  tip.style.display = 'block';
+});
+canvas.addEventListener('wheel', e => {
+  e.preventDefault();
+  const [x, y] = toWorld(e);
+  view.zoom *= Math.exp(-e.deltaY * 0.001);
+  const [wx, wy] = toWorld(e);
+  view.x += wx - x;
+  view.y += wy - y;
+  redraw();
+}, {passive: false});
+window.addEventListener('resize', redraw);
+
+(async () => {
+  meta = await (await fetch('meta.json')).json();
+  nodes = new Float32Array(await (await fetch('nodes.bin')).arrayBuffer());
+  edges = new Uint32Array(await (await fetch('edges.bin')).arrayBuffer());
+  edgeEnds = new Uint32Array(meta.edges);
+  for (let e = 0; e < meta.edges; e++) edgeEnds[e] = Math.max(edges[2 * e], edges[2 * e + 1]);
+  setup();
+  draw();
+})();
+</script>
+</body>
+</html>
+"""
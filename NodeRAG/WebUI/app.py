@@ -312,8 +312,8 @@ def sidebar():
             
             st.session_state.config['docu_type'] = st.selectbox(
                 "Document Type",
-                ["mixed", "md", "txt", "docx"],
-                index=["mixed", "md", "txt", "docx"].index(st.session_state.config['docu_type']),
+                ["mixed", "md", "txt", "docx", "jsonl", "csv", "parquet"],
+                index=["mixed", "md", "txt", "docx", "jsonl", "csv", "parquet"].index(st.session_state.config['docu_type']),
                 help="Type of documents to process"
             )
 
@@ -7,10 +7,11 @@ parser.add_argument('-q','--question', type=str, help='The question to ask the s
 parser.add_argument('-f','--folder', type=str, help='The main folder of the project')
 parser.add_argument('-r','--retrieval', action='store_true', help='Whether to return the retrieval')
 parser.add_argument('-a','--answer', action='store_true', help='Whether to return the answer')
+parser.add_argument('-t','--timings', action='store_true', help='Whether to return the per-stage search timings')
 
 args = parser.parse_args()
 
-data = {'question':args.question}
+data = {'question':args.question,'timings':args.timings}
 
 with open(args.folder+'/Node_config.yaml', 'r') as f:
     args.config = yaml.safe_load(f)
@@ -37,5 +38,8 @@ else:
     response = requests.post(url+'/answer_retrieval', json=data)
     print({'answer':response.json()['answer'], 'retrieval':response.json()['retrieval']})
 
+if args.timings and 'timings' in response.json():
+    print(response.json()['timings'])
+
 
     
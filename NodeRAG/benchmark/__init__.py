@@ -0,0 +1,13 @@
+from .corpus import synthetic_corpus,synthetic_qa
+from .build_benchmark import build_benchmark,run_build,StateProfiler
+from .search_benchmark import search_benchmark,synthetic_graph
+
+__all__ = [
+    'synthetic_corpus',
+    'synthetic_qa',
+    'build_benchmark',
+    'run_build',
+    'StateProfiler',
+    'search_benchmark',
+    'synthetic_graph'
+]
@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import tempfile
+
+from .build_benchmark import build_benchmark
+from .search_benchmark import search_benchmark
+
+parser = argparse.ArgumentParser(description='NodeRAG benchmarks')
+subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+build = subparsers.add_parser('build', help='End-to-end build over synthetic corpora')
+build.add_argument('-s','--scales', type=int, nargs='+', default=[1000,10000,100000], help='Numbers of text chunks')
+build.add_argument('-w','--workdir', type=str, default=os.path.join(tempfile.gettempdir(),'noderag_benchmark'), help='Folder for corpora and build outputs')
+build.add_argument('-o','--output', type=str, default=None, help='Write the JSON report to this path')
+build.add_argument('--chunk_size', type=int, default=512)
+build.add_argument('--dim', type=int, default=256)
+build.add_argument('--build_workers', type=int, default=64)
+build.add_argument('--latency', type=float, default=0.0, help='Mean fake provider latency in seconds')
+build.add_argument('--throttle_rate', type=float, default=0.0)
+build.add_argument('--timeout_rate', type=float, default=0.0)
+build.add_argument('--qa_pairs', type=int, default=0, help='Mock Q&A pairs, enables the Q&A pipeline')
+build.add_argument('--seed', type=int, default=0)
+
+search = subparsers.add_parser('search', help='Search component microbenchmarks over synthetic graphs')
+search.add_argument('-s','--sizes', type=int, nargs='+', default=[1000,10000,100000], help='Graph sizes in nodes')
+search.add_argument('-w','--workdir', type=str, default=os.path.join(tempfile.gettempdir(),'noderag_benchmark'), help='Folder for the synthetic caches')
+search.add_argument('-o','--output', type=str, default=None, help='Write the JSON report to this path')
+search.add_argument('-q','--queries', type=int, default=50, help='Random queries per size')
+search.add_argument('--dim', type=int, default=256)
+search.add_argument('--seed', type=int, default=0)
+
+args = parser.parse_args()
+
+match args.benchmark:
+    case 'build':
+        report = build_benchmark(args.scales,
+                                 args.workdir,
+                                 args.output,
+                                 seed=args.seed,
+                                 chunk_size=args.chunk_size,
+                                 dim=args.dim,
+                                 build_workers=args.build_workers,
+                                 latency=args.latency,
+                                 throttle_rate=args.throttle_rate,
+                                 timeout_rate=args.timeout_rate,
+                                 qa_pairs=args.qa_pairs)
+    case 'search':
+        report = search_benchmark(args.sizes,
+                                  args.workdir,
+                                  args.output,
+                                  queries=args.queries,
+                                  dim=args.dim,
+                                  seed=args.seed)
+
+if args.output is None:
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List
+
+from .corpus import synthetic_corpus, synthetic_qa
+from ..logging.metrics import current_rss, peak_rss, to_mb
+
+
+BENCHMARK_USER = 'benchmark'
+
+
+def folder_sizes(folder: str) -> Dict[str, int]:
+
+    sizes = {}
+    if not os.path.exists(folder):
+        return sizes
+    for file in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file)
+        if os.path.isfile(path):
+            sizes[file] = os.path.getsize(path)
+    return sizes
+
+
+class StateProfiler():
+
+    def __init__(self, config, interval: float = 0.05) -> None:
+        """
+        NodeRag observer recording wall time, peak RSS and LLM requests of every build state.
+
+        Args:
+            config (NodeConfig): Config of the build, its clients are read for request counts.
+            interval (float): Seconds between RSS samples.
+        """
+        self.config = config
+        self.interval = interval
+        self.states = {}
+        self.state = None
+        self.started = None
+        self.counters = None
+        self.peak = 0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self.sample, daemon=True)
+        self._sampler.start()
+
+    def sample(self) -> None:
+
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss() or 0)
+
+    def client_counters(self) -> Dict[str, int]:
+
+        counters = {}
+        for name, client in [('llm', self.config.API_client), ('embedding', self.config.embedding_client)]:
+            usage = getattr(getattr(client, 'llm', None), 'usage', {})
+            for key in ['requests', 'prompt_tokens', 'completion_tokens', 'throttled', 'timeouts']:
+                counters[f'{name}_{key}'] = usage.get(key, 0)
+        if self.config.response_cache is not None:
+            counters['cache_hits'] = self.config.response_cache.hits
+            counters['cache_misses'] = self.config.response_cache.misses
+        return counters
+
+    def update(self, state: str) -> None:
+
+        now = time.perf_counter()
+        self.peak = max(self.peak, current_rss() or 0)
+        counters = self.client_counters()
+        if self.state is not None:
+            record = self.states.setdefault(self.state, {'seconds': 0.0, 'peak_rss_mb': None})
+            record['seconds'] += now - self.started
+            # no RSS reading on this platform leaves the peak empty
+            if self.peak:
+                record['peak_rss_mb'] = max(record['peak_rss_mb'] or 0.0, self.peak / 2**20)
+            for key, value in counters.items():
+                record[key] = record.get(key, 0) + value - self.counters.get(key, 0)
+        self.state = state
+        self.started = now
+        self.counters = counters
+        self.peak = current_rss() or 0
+
+    def close(self) -> None:
+
+        self._stop.set()
+        self._sampler.join()
+
+
+def benchmark_config(main_folder: str,
+                     chunk_size: int = 512,
+                     dim: int = 256,
+                     build_workers: int = 64,
+                     latency: float = 0.0,
+                     throttle_rate: float = 0.0,
+                     timeout_rate: float = 0.0,
+                     qa_pairs: int = 0) -> Dict:
+    '''Build config against the offline provider, rate limits are left wide open'''
+
+    config = {'main_folder': main_folder,
+              'language': 'English',
+              'chunk_size': chunk_size,
+              'dim': dim,
+              'build_workers': build_workers,
+              'llm_cache': False}
+    if qa_pairs:
+        config['user_id'] = BENCHMARK_USER
+        config['qa_api'] = {'enabled': True, 'use_mock': True, 'mock_data_path': 'qa_history.json'}
+    provider = {'rate_limit': 10**7,
+                'max_concurrency': build_workers,
+                'fake_latency': latency,
+                'fake_latency_distribution': 'lognormal' if latency else 'fixed',
+                'fake_throttle_rate': throttle_rate,
+                'fake_timeout_rate': timeout_rate}
+    return {'config': config,
+            'model_config': {'service_provider': 'fake', 'model_name': 'fake', **provider},
+            'embedding_config': {'service_provider': 'fake_embedding',
+                                 'embedding_model_name': 'fake_embedding',
+                                 'dim': dim, **provider}}
+
+
+def run_build(config: Dict) -> Dict:
+    '''Build the corpus of config in this process and return the per-state profile'''
+
+    from ..config import NodeConfig
+    from ..build.Node import NodeRag
+
+    node_config = NodeConfig(config)
+    builder = NodeRag(node_config, web_ui=True)
+    profiler = StateProfiler(node_config)
+    builder.add_observer(profiler)
+
+    started = time.perf_counter()
+    try:
+        builder.run()
+    finally:
+        profiler.update('FINISHED')
+        profiler.close()
+    total = time.perf_counter() - started
+
+    return {'seconds': total,
+            'peak_rss_mb': to_mb(peak_rss()),
+            'states': {state: record for state, record in profiler.states.items() if state not in ('INIT', 'FINISHED')},
+            'artifacts': {'cache': folder_sizes(node_config.cache),
+                          'info': folder_sizes(node_config.info)},
+            'artifact_mb': sum(folder_sizes(node_config.cache).values()) / 2**20}
+
+
+def build_benchmark(scales: List[int],
+                    workdir: str,
+                    output: str | None = None,
+                    seed: int = 0,
+                    **options) -> Dict:
+    """
+    Build synthetic corpora of the given sizes against the offline provider and report per-state costs.
+
+    Every scale is built in a fresh process, so peak RSS is not inherited from the previous scale.
+
+    Args:
+        scales (List[int]): Numbers of text chunks, e.g. [1000, 10000, 100000].
+        workdir (str): Folder the corpora and build outputs are written to.
+        output (str | None): Write the JSON report to this path.
+        seed (int): Corpus seed.
+        **options: Forwarded to benchmark_config (chunk_size, dim, build_workers, latency, throttle_rate,
+            timeout_rate, qa_pairs).
+
+    Returns:
+        Dict: Report with one entry per scale.
+    """
+    report = {'benchmark': 'build',
+              'options': {'seed': seed, **options},
+              'runs': []}
+    chunk_size = options.get('chunk_size', 512)
+    for chunks in scales:
+        main_folder = os.path.abspath(os.path.join(workdir, f'build_{chunks}'))
+        config = benchmark_config(main_folder, **options)
+        folder = main_folder
+        if config['config'].get('user_id'):
+            folder = os.path.join(main_folder, 'users', f'user_{BENCHMARK_USER}')
+            synthetic_qa(os.path.join(main_folder, 'qa_history.json'), options['qa_pairs'], seed)
+        for sub_folder in ['input', 'cache', 'info']:
+            os.makedirs(os.path.join(folder, sub_folder), exist_ok=True)
+        synthetic_corpus(os.path.join(folder, 'input'), chunks, chunk_size, seed=seed)
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            run = executor.submit(run_build, config).result()
+        report['runs'].append({'chunks': chunks, **run})
+
+    if output is not None:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
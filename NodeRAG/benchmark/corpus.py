@@ -0,0 +1,99 @@
+import json
+import os
+import random
+from typing import List
+
+
+SYLLABLES = ['ka', 'lo', 'mir', 'an', 'tes', 'vor', 'el', 'dun', 'ra', 'sin',
+             'bel', 'tor', 'ia', 'gar', 'nox', 'pe', 'lum', 'zar', 'ok', 'fen']
+VERBS = ['founded', 'acquired', 'studied', 'visited', 'funded', 'criticised', 'joined',
+         'designed', 'replaced', 'described', 'supported', 'merged with']
+NOUNS = ['project', 'treaty', 'laboratory', 'network', 'expedition', 'company', 'archive',
+         'council', 'theory', 'festival', 'railway', 'library']
+
+
+def entity_names(count: int, rng: random.Random) -> List[str]:
+    '''Distinct capitalised pseudo names, so the offline provider extracts them as entities'''
+
+    names = set()
+    while len(names) < count:
+        names.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(names)
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> List[float]:
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def synthetic_text(chars: int, names: List[str], weights: List[float], rng: random.Random) -> str:
+
+    sentences = []
+    length = 0
+    while length < chars:
+        source, target, other = rng.choices(names, weights, k=3)
+        sentence = (f'{source} {rng.choice(VERBS)} {target} for the {rng.choice(NOUNS)} '
+                    f'of {other} in {rng.randint(1800, 2030)}.')
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(sentences)
+
+
+def synthetic_corpus(input_folder: str,
+                     chunks: int,
+                     chunk_size: int = 512,
+                     chunks_per_document: int = 100,
+                     entities: int | None = None,
+                     seed: int = 0) -> List[str]:
+    """
+    Write markdown documents that split into about `chunks` text units of `chunk_size` tokens.
+
+    Entity mentions follow a Zipf distribution over `entities` names (default two per chunk),
+    so the resulting graph has the heavy-tailed degree distribution of real corpora.
+
+    Args:
+        input_folder (str): Folder the documents are written to.
+        chunks (int): Approximate number of text units after splitting.
+        chunk_size (int): config.chunk_size of the build, the splitter cuts every 4 * chunk_size characters.
+        chunks_per_document (int): Text units per document.
+        entities (int | None): Number of distinct entity names.
+        seed (int): Random seed, the same arguments always produce the same corpus.
+
+    Returns:
+        List[str]: Paths of the written documents.
+    """
+    rng = random.Random(seed)
+    names = entity_names(entities or max(10, 2 * chunks), rng)
+    weights = zipf_weights(len(names))
+    # shuffle so popular names are not alphabetically clustered
+    rng.shuffle(weights)
+
+    os.makedirs(input_folder, exist_ok=True)
+    paths = []
+    for document in range(0, chunks, chunks_per_document):
+        paragraphs = [synthetic_text(int(chunk_size * 4 * 0.95), names, weights, rng)
+                      for _ in range(min(chunks_per_document, chunks - document))]
+        path = os.path.join(input_folder, f'document_{document // chunks_per_document:05d}.md')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(paragraphs))
+        paths.append(path)
+    return paths
+
+
+def synthetic_qa(path: str, pairs: int, seed: int = 0) -> str:
+    '''Write a mock Q&A history file in the format read by QAAPIClient'''
+
+    rng = random.Random(seed)
+    names = entity_names(max(10, pairs), rng)
+    qa_pairs = []
+    for i in range(pairs):
+        company = rng.choice(names)
+        qa_pairs.append({'question_id': str(i),
+                         'question': f'Why do you want to work on the {rng.choice(NOUNS)} at {company}?',
+                         'answer': synthetic_text(400, names, zipf_weights(len(names)), rng),
+                         'job_title': f'{rng.choice(NOUNS).capitalize()} Engineer',
+                         'company_name': company,
+                         'submission_date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00Z'})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(qa_pairs, f, ensure_ascii=False)
+    return path
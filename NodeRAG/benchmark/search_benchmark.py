@@ -0,0 +1,276 @@
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from typing import Callable, Dict, List
+
+import networkx as nx
+import numpy as np
+
+from .build_benchmark import benchmark_config
+from .corpus import entity_names, zipf_weights
+
+
+# share of each node type in graphs built from real corpora
+NODE_TYPES = {'text': 0.05,
+              'semantic_unit': 0.2,
+              'entity': 0.3,
+              'relationship': 0.25,
+              'attribute': 0.05,
+              'high_level_element': 0.075,
+              'high_level_element_title': 0.075}
+EMBEDDED_TYPES = ['semantic_unit', 'attribute', 'high_level_element', 'text']
+
+
+def node_id(type: str, index: int) -> str:
+    return hashlib.md5(f'{type}_{index}'.encode('utf-8')).hexdigest()
+
+
+def synthetic_graph(nodes: int, seed: int = 0) -> tuple[nx.Graph, Dict[str, Dict[str, str]]]:
+    """
+    Generate a NodeRAG shaped heterogeneous graph and the text of its nodes.
+
+    Semantic units and relationships attach to entities chosen with Zipf weights, entities with
+    attributes carry an `attributes` list, high level element titles carry `related_node`, text
+    units link to their semantic units, as in a built graph.
+
+    Args:
+        nodes (int): Approximate number of nodes.
+        seed (int): Random seed.
+
+    Returns:
+        tuple: The graph and, per node type, a mapping of hash id to context.
+    """
+    rng = np.random.default_rng(seed)
+    counts = {type: max(1, int(nodes * share)) for type, share in NODE_TYPES.items()}
+    ids = {type: [node_id(type, i) for i in range(count)] for type, count in counts.items()}
+    names = entity_names(counts['entity'], random.Random(seed))
+    contexts = {type: {} for type in NODE_TYPES}
+
+    G = nx.Graph()
+    for type, type_ids in ids.items():
+        G.add_nodes_from(type_ids, type=type, weight=1)
+
+    entities = ids['entity']
+    weights = np.array(zipf_weights(len(entities)))
+    weights = weights / weights.sum()
+    for i, entity in enumerate(entities):
+        contexts['entity'][entity] = names[i]
+
+    def pick(k: int) -> List[int]:
+        return rng.choice(len(entities), size=k, p=weights)
+
+    for unit in ids['semantic_unit']:
+        members = pick(3)
+        G.add_edges_from(((unit, entities[m]) for m in members), weight=1)
+        contexts['semantic_unit'][unit] = ' '.join(names[m] for m in members) + ' took part in the same event.'
+    for relationship in ids['relationship']:
+        source, target = pick(2)
+        G.add_edge(entities[source], relationship, weight=1)
+        G.add_edge(relationship, entities[target], weight=1)
+        contexts['relationship'][relationship] = f'{names[source]} works with {names[target]}'
+    # every extracted entity is mentioned by at least one semantic unit
+    units = ids['semantic_unit']
+    for i, entity in enumerate(entities):
+        if G.degree(entity) == 0:
+            unit = units[rng.integers(len(units))]
+            G.add_edge(unit, entity, weight=1)
+            contexts['semantic_unit'][unit] += f' {names[i]} was there.'
+    for attribute, entity in zip(ids['attribute'], rng.permutation(len(entities))):
+        G.add_edge(attribute, entities[entity], weight=1)
+        G.nodes[entities[entity]]['attributes'] = [attribute]
+        contexts['attribute'][attribute] = f'{names[entity]} is a well known entity. ' * 4
+
+    for text in ids['text']:
+        members = rng.choice(len(units), size=min(4, len(units)), replace=False)
+        G.add_edges_from(((units[m], text) for m in members), type='text', weight=1)
+        contexts['text'][text] = ' '.join(contexts['semantic_unit'][units[m]] for m in members)
+    for element, title in zip(ids['high_level_element'], ids['high_level_element_title']):
+        members = rng.choice(len(units), size=min(10, len(units)), replace=False)
+        G.add_edges_from(((element, units[m]) for m in members), weight=1)
+        G.add_edge(element, title, weight=1)
+        G.nodes[title]['related_node'] = element
+        contexts['high_level_element'][element] = ' '.join(contexts['semantic_unit'][units[m]] for m in members[:3])
+        contexts['high_level_element_title'][title] = f'Theme of {contexts["semantic_unit"][units[members[0]]][:40]}'
+    return G, contexts
+
+
+def write_search_cache(config, G: nx.Graph, contexts: Dict[str, Dict[str, str]], seed: int = 0) -> None:
+    '''Write graph, parquet tables and HNSW index where NodeSearch expects a finished build'''
+
+    from ..storage import storage, GraphStore
+    from ..utils import HNSW
+
+    paths = {'text': config.text_path,
+             'semantic_unit': config.semantic_units_path,
+             'entity': config.entities_path,
+             'relationship': config.relationship_path,
+             'attribute': config.attributes_path,
+             'high_level_element': config.high_level_elements_path,
+             'high_level_element_title': config.high_level_elements_titles_path}
+    for type, path in paths.items():
+        storage({'hash_id': list(contexts[type].keys()),
+                 'type': [type] * len(contexts[type]),
+                 'context': list(contexts[type].values()),
+                 'embedding': ['HNSW' if type in EMBEDDED_TYPES else None] * len(contexts[type])}).save_parquet(path)
+    GraphStore(config.base_graph_path).snapshot(G)
+
+    rng = np.random.default_rng(seed)
+    embedded = [id for type in EMBEDDED_TYPES for id in contexts[type]]
+    vectors = rng.standard_normal((len(embedded), config.dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    for path in [config.HNSW_path, config.id_map_path, config.node_ids_path]:
+        if os.path.exists(path):
+            os.remove(path)
+    hnsw = HNSW(config)
+    hnsw.add_nodes(list(zip(embedded, vectors)))
+    hnsw.save_HNSW()
+
+
+def latency(samples: List[float]) -> Dict[str, float]:
+
+    samples = np.array(samples) * 1000
+    return {'n': len(samples),
+            'mean_ms': float(samples.mean()),
+            'p50_ms': float(np.percentile(samples, 50)),
+            'p90_ms': float(np.percentile(samples, 90)),
+            'p99_ms': float(np.percentile(samples, 99)),
+            'max_ms': float(samples.max())}
+
+
+def measure(func: Callable, repeat: int) -> tuple[List[float], object]:
+
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+def benchmark_components(search, queries: int, rng: np.random.Generator, build_repeat: int = 3) -> Dict[str, Dict]:
+    '''Time every retrieval component of a loaded NodeSearch in isolation'''
+
+    from ..storage import storage
+    from ..utils import sparse_PPR
+    from ..search.Answer_base import Retrieval
+
+    config = search.config
+    samples = {name: [] for name in ['HNSW.search', 'HNSW.search_list', 'accurate_search', 'PPR',
+                                     'post_process_top_k', 'Retrieval.structured_prompt']}
+    results = {}
+    results['sparse_PPR'] = latency(measure(lambda: sparse_PPR(search.load_search_graph()), build_repeat)[0])
+    mapper_samples, mapper = measure(search.load_mapper, build_repeat)
+    results['Mapper'] = latency(mapper_samples)
+    results['generate_id_to_text'] = latency(measure(
+        lambda: mapper.generate_id_to_text(['entity', 'high_level_element_title']), build_repeat)[0])
+
+    entities = list(storage.load(config.entities_path)['context'])
+    for _ in range(queries):
+        query = rng.standard_normal(config.dim).astype(np.float32)
+        query /= np.linalg.norm(query)
+
+        started = time.perf_counter()
+        HNSW_results = list(search.hnsw.search(query, HNSW_results=config.HNSW_results))
+        samples['HNSW.search'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        search.hnsw.search_list([query, -query, query[::-1].copy()], HNSW_results=config.HNSW_results)
+        samples['HNSW.search_list'].append(time.perf_counter() - started)
+
+        words = [entities[i] for i in rng.choice(len(entities), size=3)]
+        started = time.perf_counter()
+        accurate_results = search.accurate_search(words)
+        samples['accurate_search'].append(time.perf_counter() - started)
+
+        retrieval = Retrieval(config, search.id_to_text, search.accurate_id_to_text, search.id_to_type)
+        retrieval.HNSW_results_with_distance = HNSW_results
+        retrieval.accurate_results = accurate_results
+        personalization = {id: config.similarity_weight for id in retrieval.HNSW_results}
+        personalization.update({id: config.accuracy_weight for id in accurate_results})
+
+        started = time.perf_counter()
+        weighted_nodes = search.graph_search(personalization)
+        samples['PPR'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        retrieval = search.post_process_top_k(weighted_nodes, retrieval)
+        samples['post_process_top_k'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        retrieval.structured_prompt
+        samples['Retrieval.structured_prompt'].append(time.perf_counter() - started)
+
+    results.update({name: latency(values) for name, values in samples.items()})
+    return results
+
+
+def scaling(runs: List[Dict], superlinear: float = 1.2) -> Dict[str, Dict]:
+    '''Empirical exponent k of time ~ nodes^k between consecutive sizes, from the median latency'''
+
+    curves = {}
+    for previous, current in zip(runs, runs[1:]):
+        ratio = math.log(current['nodes'] / previous['nodes'])
+        for component, stats in current['components'].items():
+            before = previous['components'][component]['p50_ms']
+            if before <= 0 or stats['p50_ms'] <= 0:
+                continue
+            exponent = math.log(stats['p50_ms'] / before) / ratio
+            curve = curves.setdefault(component, {'exponents': [], 'superlinear': False})
+            curve['exponents'].append(round(exponent, 3))
+            curve['superlinear'] = curve['superlinear'] or exponent > superlinear
+    return curves
+
+
+def search_benchmark(sizes: List[int],
+                     workdir: str,
+                     output: str | None = None,
+                     queries: int = 50,
+                     dim: int = 256,
+                     seed: int = 0) -> Dict:
+    """
+    Time retrieval components over synthetic graphs of increasing size.
+
+    Args:
+        sizes (List[int]): Graph sizes in nodes, e.g. [1000, 10000, 100000].
+        workdir (str): Folder the synthetic caches are written to.
+        output (str | None): Write the JSON report to this path.
+        queries (int): Random queries per size, the per-query components are timed on each.
+        dim (int): Embedding dimension of the HNSW index.
+        seed (int): Graph, embedding and query seed.
+
+    Returns:
+        Dict: Latency distributions per component and size, plus scaling exponents.
+    """
+    from ..config import NodeConfig
+    from ..search import NodeSearch
+
+    report = {'benchmark': 'search',
+              'options': {'queries': queries, 'dim': dim, 'seed': seed},
+              'runs': []}
+    for size in sizes:
+        main_folder = os.path.abspath(os.path.join(workdir, f'search_{size}'))
+        for sub_folder in ['input', 'cache', 'info']:
+            os.makedirs(os.path.join(main_folder, sub_folder), exist_ok=True)
+        config = NodeConfig(benchmark_config(main_folder, dim=dim))
+        G, contexts = synthetic_graph(size, seed)
+        write_search_cache(config, G, contexts, seed)
+
+        started = time.perf_counter()
+        search = NodeSearch(config)
+        load_seconds = time.perf_counter() - started
+
+        components = benchmark_components(search, queries, np.random.default_rng(seed))
+        report['runs'].append({'nodes': search.compact.n_nodes,
+                               'edges': search.compact.n_edges,
+                               'load_seconds': load_seconds,
+                               'components': components})
+
+    report['scaling'] = scaling(report['runs'])
+    if output is not None:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
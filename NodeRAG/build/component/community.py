@@ -1,11 +1,11 @@
 import networkx as nx
-from sortedcontainers import SortedDict
 import json
 import backoff
 from json.decoder import JSONDecodeError
 
 from ...storage import genid
 from ...utils.readable_index import community_summary_index,high_level_element_index
+from ...utils.context_packer import ContextPacker
 from .unit import Unit_base
 from ...storage.graph_mapping import Mapper
 
@@ -61,19 +61,21 @@ class Community_summary(Unit_base):
             return query
         
         def get_important_node_query(self):
-            weights_dict = SortedDict()
+            # units ranked by the weight of their neighbours, packed into the budget with their stored token counts
+            weights = {}
             for name in self.used_unit:
-                weight = 0
-                for neighbour in self.graph.neighbors(name):
-                    weight += self.graph[neighbour]['weight']
-                weights_dict[name] = weight
-            weights_dict = reversed(weights_dict)
-            query_old = ''
-            for i in range(len(weights_dict)+1):
-                query = self.get_query(weights_dict.keys()[:i])
-                if self.token_counter.token_limit(query):
-                    return query_old
-                query_old = query
+                weights[name] = sum(self.graph.nodes[neighbour]['weight'] for neighbour in self.graph.neighbors(name))
+            ranked = sorted(self.used_unit,key=lambda name:weights[name],reverse=True)
+            
+            packer = ContextPacker(self.token_counter)
+            overhead = packer.overhead(self.prompt.community_summary.format(content = ''))
+            packed = set(packer.pack(((name,self.mapper.get_tokens(name,self.token_counter)) for name in ranked),overhead))
+            
+            content = ''
+            for node in self.used_unit:
+                if node in packed:
+                    content += self.mapper.get(node,'context')+'\n'
+            return self.prompt.community_summary.format(content = content)
                 
         def get_query(self):
             query = self.get_normal_query()
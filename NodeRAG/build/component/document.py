@@ -1,5 +1,8 @@
+from hashlib import sha256
+from typing import Iterable, Iterator
+
 from ...utils.text_spliter import SemanticTextSplitter
-from ...storage import genid
+from ...storage import genid,storage
 from ...utils.readable_index import document_index
 from .unit import Unit_base
 from .text_unit import Text_unit
@@ -7,6 +10,9 @@ from .text_unit import Text_unit
 
 document_index_counter = document_index()
 
+# characters read from a file at a time when a document is streamed from its path
+BLOCK_SIZE = 1 << 22
+
 
 class document(Unit_base):
     def __init__(self, raw_context:str = None,path:str = None,splitter:SemanticTextSplitter = None):
@@ -24,25 +30,69 @@ class document(Unit_base):
     @property
     def hash_id(self):
         if not self._hash_id:
-            self._hash_id = genid([self.raw_context],"sha256")
+            if self.raw_context is not None:
+                self._hash_id = genid([self.raw_context],"sha256")
+            else:
+                # same digest as genid over the whole text, without reading the file into memory
+                digest = sha256()
+                for block in self.blocks():
+                    digest.update(block.encode('utf-8'))
+                self._hash_id = digest.hexdigest()
         return self._hash_id
-    
+
     @property
     def human_readable_id(self):
         if not self._human_readable_id:
             self._human_readable_id = document_index_counter.increment()
         return self._human_readable_id
-    
+
+    def blocks(self) -> Iterator[str]:
+        '''The text, from raw_context or read from path BLOCK_SIZE characters at a time'''
+
+        if self.raw_context is not None:
+            yield self.raw_context
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            while block := f.read(BLOCK_SIZE):
+                yield block
+
     def split(self) -> None:
         if not self._processed_context:
-            self._processed_context = True
-            texts = self.splitter.split(self.raw_context)
-            self.text_units = [Text_unit(text) for text in texts]
-            self.text_hash_id = [text.hash_id for text in self.text_units]
-            self.text_human_readable_id = [text.human_readable_id for text in self.text_units]
-            
-    
-        
-  
-    
-    
+            self.text_units = list(self.iter_text_units())
+
+    def iter_text_units(self,texts:Iterable[str]|None = None) -> Iterator[Text_unit]:
+        """
+        Text units of the document as they are split, for writing without holding them all.
+
+        Ids are taken here, in document order, so texts split in worker processes and passed in keep
+        the ids sequential splitting gives them.
+        """
+        if texts is None:
+            texts = self.splitter.split_stream(self.blocks())
+        self._processed_context = True
+        self.text_hash_id = []
+        self.text_human_readable_id = []
+        for text in texts:
+            text_unit = Text_unit(text)
+            self.text_hash_id.append(text_unit.hash_id)
+            self.text_human_readable_id.append(text_unit.human_readable_id)
+            yield text_unit
+
+
+def split_document(doc:document) -> list[str]:
+    '''Texts of a document, for splitting in a worker process'''
+
+    return list(doc.splitter.split_stream(doc.blocks()))
+
+
+def record_documents(path:str,text_field:str,splitter:SemanticTextSplitter) -> Iterator[document]:
+    """
+    One document per record of a JSONL, CSV, TSV or parquet file, read in batches.
+
+    Documents are named `<path>#<record index>`; records whose text_field is missing, not a string or
+    blank are skipped.
+    """
+    for i,record in enumerate(storage.iter_records(path,columns=[text_field])):
+        text = record.get(text_field)
+        if isinstance(text,str) and text.strip():
+            yield document(text,f'{path}#{i}',splitter)
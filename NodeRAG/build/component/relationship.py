@@ -34,7 +34,8 @@ class Relationship(Unit_base):
     @property
     def hash_id(self):
         if not self._hash_id:
-            self._hash_id = genid(list(self.unique_relationship),"sha256")
+            # sorted, the iteration order of a frozenset of strings changes with each process's hash seed
+            self._hash_id = genid(sorted(self.unique_relationship),"sha256")
         return self._hash_id
     
     @property
@@ -72,4 +73,7 @@ class Relationship(Unit_base):
             frozen_set_value = unique_rel
         else:
             frozen_set_value = frozenset(unique_rel)
-        return cls(frozen_set=frozen_set_value,context=row['context'],human_readable_id=row['human_readable_id'])
+        relationship = cls(frozen_set=frozen_set_value,text_hash_id=row.get('text_hash_id'),context=row['context'],human_readable_id=row['human_readable_id'])
+        # the stored id is kept, caches built before it was sorted hold the unsorted one
+        relationship._hash_id = row['hash_id']
+        return relationship
@@ -1,6 +1,8 @@
 import os
 from ...utils.HNSW import HNSW
-from ...storage import Mapper
+from ...utils.compact_graph import CompactGraph
+from ...utils.search_graph import SearchGraphStore,PageRankStore
+from ...storage import Mapper,GraphStore
 from ...config import NodeConfig
 from ...logging import info_timer
 
@@ -21,9 +23,7 @@ class HNSW_pipeline():
                         self.config.high_level_elements_path,
                         self.config.text_path]
         
-        for i in range(len(mapping_list)):
-            if not os.path.exists(mapping_list[i]):
-                mapping_list.pop(i)
+        mapping_list = [path for path in mapping_list if os.path.exists(path)]
         
         mapper = Mapper(mapping_list)
         if os.path.exists(self.config.embedding):
@@ -33,11 +33,10 @@ class HNSW_pipeline():
     
     def load_hnsw(self) -> HNSW:
         
+        # HNSW loads the stored index itself when there is one
         hnsw = HNSW(self.config)
         
         if os.path.exists(self.config.HNSW_path):
-            
-            hnsw.load_HNSW(self.config.HNSW_path)
             return hnsw
         
         elif self.mapper.embeddings is not None:
@@ -59,6 +58,16 @@ class HNSW_pipeline():
         self.config.tracker.close()
         self.config.console.print(f'[green]HNSW graph generated for {len(unHNSW)} nodes[/green]')
     
+    def save_search_graphs(self):
+        
+        # merged and ranked once here instead of at every search startup and visualisation
+        base_graph = CompactGraph.from_networkx(GraphStore(self.config.base_graph_path).load(track=False))
+        page_rank = PageRankStore(self.config.pagerank_path,self.config.base_graph_path)
+        page_rank.save(page_rank.build(base_graph))
+        search_graph = SearchGraphStore(self.config)
+        search_graph.save(search_graph.build(base_graph))
+        self.config.console.print('[green]Search graph and PageRank saved[/green]')
+    
     def delete_embedding(self):
         
         if os.path.exists(self.config.embedding):
@@ -69,6 +78,7 @@ class HNSW_pipeline():
         if os.path.exists(self.config.embedding):
             self.generate_HNSW()
             self.hnsw.save_HNSW()
+            self.save_search_graphs()
             self.mapper.update_save()
             self.delete_embedding()
             self.config.console.print('[green]HNSW graph saved[/green]')
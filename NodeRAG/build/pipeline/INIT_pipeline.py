@@ -2,7 +2,7 @@ import os
 import json
 from ...config import NodeConfig
 from ...logging import info_timer
-from ...storage import genid
+from ...storage import genid,storage,FileManifest
 
 
 
@@ -37,7 +37,8 @@ class INIT_pipeline():
         
         if self.config.docu_type == 'mixed':
             for file in os.listdir(self.config.input_folder):
-                if file.endswith('.txt') or file.endswith('.md'):
+                # record files (JSONL, CSV, TSV, parquet) hold one document per record
+                if file.endswith(('.txt','.md')+storage.RECORD_FORMATS):
                     file_path = os.path.join(self.config.input_folder, file)
                     self.documents_path.append(file_path)
         else:
@@ -50,32 +51,34 @@ class INIT_pipeline():
             raise ValueError(f'No files found in {self.config.input_folder}')
         
     def check_increment(self):
-        if not os.path.exists(self.config.document_hash_path):
-            self.save_document_hash()
-            return False
-        else:
-            with open(self.config.document_hash_path,'r') as f:
-                file = json.load(f)
-            previous_hash = file['document_path_hash']
-            if previous_hash == self.document_path_hash:
-                return False
-            else:
+        # per file size, mtime and content hash; only new and modified files are read by the document stage,
+        # the documents of modified and deleted ones are removed first
+        manifest = FileManifest(self.config.file_manifest_path)
+        changes = manifest.scan(self.documents_path)
+        self.save_document_hash(changes)
+        if manifest.entries:
+            if changes['new'] or changes['modified'] or changes['deleted']:
                 return True
+            # no document stage runs to save it; touched files keep their new mtime and are not hashed again
+            manifest.save(changes['entries'])
+            return False
+        # caches built before the manifest existed are checked once against every file
+        return os.path.exists(self.config.documents_path)
             
-    def save_document_hash(self):
+    def save_document_hash(self,changes):
         with open(self.config.document_hash_path,'w') as f:
-            json.dump({'document_path_hash':self.document_path_hash,'document_path':self.documents_path},f)
+            json.dump({'document_path_hash':self.document_path_hash,
+                       'document_path':changes['new']+changes['modified'],
+                       'modified_path':changes['modified'],
+                       'deleted_path':changes['deleted'],
+                       'manifest':changes['entries']},f)
      
    
     @info_timer(message='Init Pipeline')
     async def main(self):
         self.check_folder_structure()
         self.load_files()
-        if self.check_increment():
-            self.save_document_hash()
-            return True
-        else:
-            return False
+        return self.check_increment()
         
         
         
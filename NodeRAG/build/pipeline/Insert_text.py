@@ -1,5 +1,5 @@
 import os
-from ...storage import storage
+from ...storage import storage,GraphStore,TrackedGraph
 from ...config import NodeConfig
 from ...utils import MultigraphConcat
 from ...logging import info_timer
@@ -10,8 +10,12 @@ class Insert_text:
     
     def __init__(self,config:NodeConfig):
         self.config = config
-        self.G = storage.load(self.config.graph_path)
-        self.base_G = self.load_base_graph(self.config.base_graph_path)
+        self.graph_store = GraphStore(self.config.graph_path,self.config.graph_compaction_ratio)
+        self.base_graph_store = GraphStore(self.config.base_graph_path,self.config.graph_compaction_ratio)
+        self.G = self.graph_store.load()
+        self.base_G = self.base_graph_store.load()
+        if self.base_G is None:
+            self.base_G = TrackedGraph()
         self.semantic_units = storage.load(self.config.semantic_units_path)
 
     def insert_text(self):
@@ -32,15 +36,11 @@ class Insert_text:
     def concatenate_graph(self):
         
         self.base_G = MultigraphConcat(self.base_G).concat(self.G)
-        storage(self.base_G).save_pickle(self.config.base_graph_path)
-        os.remove(self.config.graph_path)
+        # only the nodes and edges touched by this increment are appended to the base graph
+        self.base_graph_store.save(self.base_G)
+        self.graph_store.delete()
         self.config.console.print('[bold green]Graph has been concatenated, stored in base graph[/bold green]')
     
-    def load_base_graph(self,base_graph_path:str):
-        if os.path.exists(base_graph_path):
-            return storage.load(base_graph_path)
-        else:
-            return None
     @info_timer(message="Insert text and concatenate graph")
     async def main(self):
         if os.path.exists(self.config.graph_path):
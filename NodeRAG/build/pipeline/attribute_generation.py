@@ -1,65 +1,77 @@
+import asyncio
 import networkx as nx
 import numpy as np
 import math
-import asyncio
+import json
 import os
-from sortedcontainers import SortedDict
 from rich.console import Console
 
 
 from ...storage import (
     Mapper,
-    storage
+    storage,
+    GraphStore,
+    IdDictionary
 )
 from ..component import Attribute
 from ...config import NodeConfig
 from ...logging import info_timer
+from ...logging.error import ErrorMessage
+from ...utils import WorkerPool,CompactGraph,ContextPacker
 
 
 
 class NodeImportance:
     
-    def __init__(self,graph:nx.Graph,console:Console):
+    def __init__(self,graph:nx.Graph,console:Console,betweenness_samples:int = 10,seed:int = 0):
         self.G = graph
+        # both measures run on igraph's C implementations over the integer edge arrays
+        self.compact = CompactGraph.from_networkx(graph)
+        self.G_ig = self.compact.to_igraph()
         self.important_nodes = []
         self.console = console
+        self.betweenness_samples = betweenness_samples
+        self.seed = seed
         
     def K_core(self,k:int|None = None):
         
         if k is None:
             k = self.defult_k()
         
-        self.k_subgraph = nx.core.k_core(self.G,k=k)
+        important = (np.array(self.G_ig.coreness()) >= k) & self.important_candidates()
+        self.important_nodes.extend(self.compact.ids.decode(np.flatnonzero(important)))
         
-        for nodes in self.k_subgraph.nodes():
-            if self.G[nodes]['type'] == 'entity' and self.G[nodes]['weight'] > 1:
-                self.important_nodes.append(nodes)
+    def important_candidates(self) -> np.ndarray:
+        return self.compact.type_mask('entity') & (self.compact.weight > 1)
         
     def avarege_degree(self):
-        average_degree = sum(dict(self.G.degree()).values())/self.G.number_of_nodes()
+        average_degree = 2*self.compact.n_edges/self.compact.n_nodes
         return average_degree
     
     def defult_k(self):
-        k = round(np.log(self.G.number_of_nodes())*self.avarege_degree()**(1/2))
+        k = round(np.log(self.compact.n_nodes)*self.avarege_degree()**(1/2))
         return k
     
     def betweenness_centrality(self):
         
-        self.betweenness = nx.betweenness_centrality(self.G,k=10)
-        average_betweenness = sum(self.betweenness.values())/len(self.betweenness)
+        # shortest paths from a fixed random sample of sources, as nx.betweenness_centrality(k=...) estimates it;
+        # only the ratio to the mean is used, so the normalisation networkx applies does not matter
+        rng = np.random.default_rng(self.seed)
+        sources = rng.choice(self.compact.n_nodes,size=min(self.betweenness_samples,self.compact.n_nodes),replace=False)
+        self.betweenness = np.array(self.G_ig.betweenness(directed=False,sources=sources.tolist()))
+        average_betweenness = self.betweenness.mean()
         scale = round(math.log10(len(self.betweenness)))
         
-        for node in self.betweenness:
-            if self.betweenness[node] > average_betweenness*scale:
-                if self.G.nodes[node]['type'] == 'entity' and self.G.nodes[node]['weight'] > 1:
-                    self.important_nodes.append(node)
+        important = (self.betweenness > average_betweenness*scale) & self.important_candidates()
+        self.important_nodes.extend(self.compact.ids.decode(np.flatnonzero(important)))
                     
     def main(self):
         self.K_core()
         self.console.print('[bold green]K_core done[/bold green]')
         self.betweenness_centrality()
         self.console.print('[bold green]Betweenness done[/bold green]')
-        self.important_nodes = list(set(self.important_nodes))
+        # deduplicated in discovery order, a set would order them by the per-process string hash
+        self.important_nodes = list(dict.fromkeys(self.important_nodes))
         return self.important_nodes
         
         
@@ -80,16 +92,17 @@ class Attribution_generation_pipeline:
         
         
         self.mapper = Mapper([self.config.entities_path,self.config.relationship_path,self.config.semantic_units_path])
-        self.G = storage.load(self.config.graph_path)
+        self.graph_store = GraphStore(self.config.graph_path,self.config.graph_compaction_ratio)
+        self.G = self.graph_store.load()
         
     def get_important_nodes(self):
         
-        node_importance = NodeImportance(self.G,self.config.console)
+        node_importance = NodeImportance(self.G,self.config.console,self.config.betweenness_samples)
         important_nodes = node_importance.main()
         
         if os.path.exists(self.config.attributes_path):
             attributes = storage.load(self.config.attributes_path)
-            existing_nodes = attributes['node'].tolist()
+            existing_nodes = set(IdDictionary.load(self.config.node_ids_path).decode_column(attributes['node']))
             important_nodes = [node for node in important_nodes if node not in existing_nodes]
         
         self.important_nodes = important_nodes
@@ -114,41 +127,49 @@ class Attribution_generation_pipeline:
     def get_important_neibours_material(self,node:str):
         
         entity = self.mapper.get(node,'context')
+        neighbours = [neighbour for neighbour in self.G.neighbors(node) if self.G.nodes[neighbour]['type'] in ('semantic_unit','relationship')]
+        
+        # neighbours ranked by the weight around them, packed into the budget with their stored token counts
+        values = {}
+        for neighbour in neighbours:
+            values[neighbour] = sum(self.G.nodes[neighbour_neighbour]['weight'] for neighbour_neighbour in self.G.neighbors(neighbour))
+        ranked = sorted(neighbours,key=lambda neighbour:values[neighbour],reverse=True)
+        
+        packer = ContextPacker(self.token_counter)
+        overhead = packer.overhead(self.prompt_manager.attribute_generation.format(entity = entity,semantic_units = '\n',relationships = '\n'))
+        packed = packer.pack(((neighbour,self.mapper.get_tokens(neighbour,self.token_counter)) for neighbour in ranked),overhead)
+        
         semantic_neighbours = ''+'\n'
         relationship_neighbours = ''+'\n'
-        sorted_neighbours = SortedDict()
-        
-        for neighbour in self.G.neighbors(node):
-            value = 0
-            for neighbour_neighbour in self.G.neighbors(neighbour):
-                value += self.G.nodes[neighbour_neighbour]['weight']
-            sorted_neighbours[neighbour] = value
-        
-        query = ''
-        for neighbour in reversed(sorted_neighbours):
-            while not self.token_counter.token_limit(query):
-                query = self.prompt_manager.attribute_generation.format(entity = entity,semantic_units = semantic_neighbours,relationships = relationship_neighbours)
-                if self.G.nodes[neighbour]['type'] == 'semantic_unit':
-                    semantic_neighbours += f'{self.mapper.get(neighbour,"context")}\n'
-                elif self.G.nodes[neighbour]['type'] == 'relationship':
-                    relationship_neighbours += f'{self.mapper.get(neighbour,"context")}\n'
+        for neighbour in packed:
+            if self.G.nodes[neighbour]['type'] == 'semantic_unit':
+                semantic_neighbours += f'{self.mapper.get(neighbour,"context")}\n'
+            else:
+                relationship_neighbours += f'{self.mapper.get(neighbour,"context")}\n'
         
+        query = self.prompt_manager.attribute_generation.format(entity = entity,semantic_units = semantic_neighbours,relationships = relationship_neighbours)
         return query
     
+    def load_attribute_cache(self) -> dict:
+        
+        cached = {}
+        if os.path.exists(self.config.attributes_cache):
+            with open(self.config.attributes_cache,'r',encoding='utf-8') as f:
+                for line in f:
+                    line = json.loads(line)
+                    cached[line['node']] = line['context']
+        return cached
+    
     async def generate_attribution_main(self):
         
-        tasks = []
-        self.config.tracker.set(len(self.important_nodes),desc="Generating attributes")
+        # attributes finished by an interrupted run are kept in the cache and not requested again
+        cached = self.load_attribute_cache()
+        pending = [node for node in self.important_nodes if node not in cached]
+        self.config.tracker.set(len(pending),desc="Generating attributes")
         
-        for node in self.important_nodes:
-            tasks.append(self.generate_attribution(node))
-        
-        await asyncio.gather(*tasks)
+        await WorkerPool(self.config.build_workers).run(pending,self.generate_attribution)
         
         self.config.tracker.close()
-                    
-            
-            
             
     async def generate_attribution(self,node:str):
         query = self.get_neighbours_material(node)
@@ -158,35 +179,54 @@ class Attribution_generation_pipeline:
             query = self.get_important_neibours_material(node)
             
         response = await self.API_client({'query':query})
-        if response is not None:
-            attribute = Attribute(response,node)
-            
+        if response is not None and not isinstance(response,ErrorMessage):
+            with open(self.config.attributes_cache,'a',encoding='utf-8') as f:
+                f.write(json.dumps({'node':node,'context':response},ensure_ascii=False)+'\n')
+        self.config.tracker.update()
+        
+    def add_attributes(self):
+        
+        # in the order of the important nodes, not the order the requests finished in
+        cached = self.load_attribute_cache()
+        for node in self.important_nodes:
+            if node not in cached:
+                continue
+            context = cached[node]
+            attribute = Attribute(context,node)
             self.attributes.append(attribute)
             self.G.nodes[node]['attributes'] = [attribute.hash_id]
             self.G.add_node(attribute.hash_id,type='attribute',weight=1)
             self.G.add_edge(node,attribute.hash_id,weight=1)
-        self.config.tracker.update()
 
     def save_attributes(self):
         
         attributes = []
+        # the entity of an attribute is stored as its node code
+        node_ids = IdDictionary.load(self.config.node_ids_path)
         
         for attribute in self.attributes:
-            attributes.append({'node':attribute.node,
+            attributes.append({'node':np.int32(node_ids.add(attribute.node)),
                                'type':'attribute',
                                  'context':attribute.raw_context,
+                                 'tokens':self.token_counter(attribute.raw_context),
                                  'hash_id':attribute.hash_id,
                                  'human_readable_id':attribute.human_readable_id,
                                  'weight':self.G.nodes[attribute.node]['weight'],
                                  'embedding':None})
         
         storage(attributes).save_parquet(self.config.attributes_path,append= os.path.exists(self.config.attributes_path))
+        node_ids.save(self.config.node_ids_path)
         self.config.console.print('[bold green]Attributes stored[/bold green]')
         
         
+    def delete_attribute_cache(self):
+        
+        if os.path.exists(self.config.attributes_cache):
+            os.remove(self.config.attributes_cache)
+        
     def save_graph(self):
         
-        storage(self.G).save_pickle(self.config.graph_path)
+        self.graph_store.save(self.G)
         self.config.console.print('Graph stored')
         
     @info_timer(message='Attribute Generation')
@@ -194,11 +234,14 @@ class Attribution_generation_pipeline:
         
         if os.path.exists(self.config.graph_path):
             
-            self.get_important_nodes()
+            # CPU bound graph analytics, kept off the event loop
+            await asyncio.to_thread(self.get_important_nodes)
             await self.generate_attribution_main()
+            self.add_attributes()
             self.save_attributes()
             self.save_graph()
             self.indices.store_all_indices(self.config.indices_path)
+            self.delete_attribute_cache()
             
 
         
@@ -1,25 +1,29 @@
 import os
 import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
 from ...config import NodeConfig
 from ...storage.storage import storage
-from ..component.document import document
+from ...storage.parquet_writer import ParquetRowWriter
+from ...storage.file_manifest import FileManifest
+from ..component.document import document,split_document,record_documents
 from ...logging import info_timer
+from .document_removal import Document_removal
 
 
 class document_pipline():
 
     def __init__(self, config:NodeConfig):
-        
+
 
         self.config = config
         self.documents_path = self.load_document_path()
         self.indices = self.config.indices
-        self._documents = None
-        self._hash_ids = None
-        self._human_readable_id = None
-        
-        
+        self.exist_doc_id = set()
+
+
     def integrity_check(self):
         if not os.path.exists(self.config.cache):
             os.makedirs(self.config.cache)
@@ -27,101 +31,136 @@ class document_pipline():
             pass
         else:
             self.delete_cache()
-        
+
     def load_document_path(self):
+        # the new and modified input files found by the INIT stage
         with open(self.config.document_hash_path,'r') as f:
             return json.load(f)['document_path']
-            
-    @property
-    def documents(self):
-        if self._documents is None:
-            self._documents = []
-            for path in self.documents_path:
-                with open(path, 'r', encoding='utf-8') as f:
-                    raw_context = f.read()
-                self._documents.append(document(raw_context,path,self.config.semantic_text_splitter))
-        return self._documents
-    
-    @property
-    def hash_ids(self):
-        if not self._hash_ids:
-            self._hash_ids = [doc.hash_id for doc in self.documents]
-        return self._hash_ids
-    
-    @property
-    def human_readable_ids(self):
-        if not self._human_readable_id:
-            self._human_readable_id = [doc.human_readable_id for doc in self.documents]
-        return self._human_readable_id
-    
-    
-    def store_documents_data(self):
-        doc_list = []
-        for doc in self.documents:
-            doc_list.append({'doc_id':doc.human_readable_id,
-                             'doc_hash_id':doc.hash_id,
-                             'text_id':doc.text_human_readable_id,
-                             'text_hash_id':doc.text_hash_id,
-                             'path':doc.path})
-        storage(doc_list).save_parquet(self.config.documents_path,append= os.path.exists(self.config.documents_path))
-        self.config.console.print('[green]Documents stored[/green]')
         
-    def store_text_data(self):
-        text_list = []
+    def save_manifest(self) -> None:
         
-        self.config.tracker.set(len(self.documents),desc="Processing text")
-        for doc in self.documents:
-            doc.split()
-            for text in doc.text_units:
-                text_list.append({'text_id':text.human_readable_id,
-                                'hash_id':text.hash_id,
-                                'type':'text',
-                                'context':text.raw_context,
-                                'doc_id':doc.human_readable_id,
-                                'doc_hash_id':doc.hash_id,
-                                'embedding':None,})
-            self.config.tracker.update()
+        with open(self.config.document_hash_path,'r') as f:
+            FileManifest(self.config.file_manifest_path).save(json.load(f)['manifest'])
+
+    def iter_documents(self,paths:list[str]|None = None):
+        # documents are read from their files or record batches as they are hashed and split, their text is not kept
+        splitter = self.config.semantic_text_splitter
+        for path in self.documents_path if paths is None else paths:
+            if path.endswith(storage.RECORD_FORMATS):
+                yield from record_documents(path,self.config.record_text_field,splitter)
+            else:
+                yield document(path=path,splitter=splitter)
+
+    def count_documents(self) -> int:
+        return sum(storage.count_records(path) if path.endswith(storage.RECORD_FORMATS) else 1 for path in self.documents_path)
+
+    def new_documents(self):
+
+        for doc in self.iter_documents():
+            if doc.hash_id in self.exist_doc_id:
+                self.config.tracker.update()
+                continue
+            yield doc
+
+    def split_documents(self,documents):
+        '''(document, text units) in document order, the text units produced as they are consumed'''
+
+        workers = self.config.split_workers
+        if workers <= 1:
+            for doc in documents:
+                yield doc,doc.iter_text_units()
+            return
+
+        # tokenization and boundary search run in worker processes, at most two documents per worker in flight;
+        # results are taken in document order and the ids are assigned here, as with sequential splitting;
+        # workers are spawned, forking would copy the locks held by the progress, metrics and limiter threads
+        pending = deque()
+        with ProcessPoolExecutor(workers,mp_context=get_context('spawn')) as executor:
+            for doc in documents:
+                pending.append((doc,executor.submit(split_document,doc)))
+                if len(pending) >= 2*workers:
+                    doc,future = pending.popleft()
+                    yield doc,doc.iter_text_units(future.result())
+            while pending:
+                doc,future = pending.popleft()
+                yield doc,doc.iter_text_units(future.result())
+
+    def store_data(self):
+
+        self.config.tracker.set(self.count_documents(),desc="Processing text")
+        # text units and documents are written in row groups as they are split, so memory does not grow with the corpus
+        with ParquetRowWriter(self.config.text_path,append= os.path.exists(self.config.text_path)) as text_writer, \
+             ParquetRowWriter(self.config.documents_path,append= os.path.exists(self.config.documents_path)) as doc_writer:
+            for doc,text_units in self.split_documents(self.new_documents()):
+                for text in text_units:
+                    text_writer.write({'text_id':text.human_readable_id,
+                                       'hash_id':text.hash_id,
+                                       'type':'text',
+                                       'context':text.raw_context,
+                                       'doc_id':doc.human_readable_id,
+                                       'doc_hash_id':doc.hash_id,
+                                       'embedding':None,})
+                doc_writer.write({'doc_id':doc.human_readable_id,
+                                  'doc_hash_id':doc.hash_id,
+                                  'text_id':doc.text_human_readable_id,
+                                  'text_hash_id':doc.text_hash_id,
+                                  'path':doc.path})
+                self.config.tracker.update()
         self.config.tracker.close()
-        storage(text_list).save_parquet(self.config.text_path,append= os.path.exists(self.config.text_path))
-        self.config.console.print('[green]Texts stored[/green]')
-        
+        self.config.console.print('[green]Texts and documents stored[/green]')
+
     def store_readable_index(self) -> None:
-        
+
         self.indices.store_all_indices(self.config.indices_path)
-        
+
     def cache_completion_check(self) -> bool:
-        files_name = ['documents.parquet','text.parquet','indices.json']
+        # indices.json is written to the info folder, not the cache
+        files_name = ['documents.parquet','text.parquet']
         files = os.listdir(self.config.cache)
-        return all([file in files for file in files_name])
-    
+        return all([file in files for file in files_name]) and os.path.exists(self.config.indices_path)
+
     def delete_cache(self) -> None:
+        # the LLM response cache (and its sqlite journal files) is kept, it is what makes the rebuild cheap
+        llm_cache = os.path.basename(self.config.llm_cache_path)
         for file in os.listdir(self.config.cache):
-            os.remove(os.path.join(self.config.cache,file))    
+            if file.startswith(llm_cache):
+                continue
+            os.remove(os.path.join(self.config.cache,file))
         self.config.console.print('[red]There exist incomplete cache,deleted[/red]')
-        
+
+    def remove_documents(self) -> None:
+        # documents of deleted files, and those a modified file no longer has, leave the graph before new ones are stored
+        Document_removal(self.config).resume()
+        if not os.path.exists(self.config.documents_path):
+            return
+        with open(self.config.document_hash_path,'r') as f:
+            changes = json.load(f)
+        deleted_path = changes.get('deleted_path',[])
+        modified_path = changes.get('modified_path',[])
+        if not deleted_path and not modified_path:
+            return
+        current = {doc.hash_id for doc in self.iter_documents(modified_path)}
+        Document_removal(self.config).main(deleted_path,modified_path,current)
+
     def increment_doc(self) -> None:
+        # documents already in the cache are skipped by hash while streaming
         if os.path.exists(self.config.documents_path):
-            exist_doc_id = storage.load_parquet(self.config.documents_path)['doc_hash_id'].tolist()
-            increment_doc_id = list(set(self.hash_ids) - set(exist_doc_id))
-            self._documents = [doc for doc in self.documents if doc.hash_id in increment_doc_id]
-        else:
-            self._documents = self.documents
-        self.documents_path = [doc.path for doc in self.documents]
-        self._hash_ids = None
-        
-    
+            self.exist_doc_id = {record['doc_hash_id'] for record in storage.iter_parquet(self.config.documents_path,columns=['doc_hash_id'])}
+
+
     @info_timer(message='Document Pipeline')
     async def main(self):
         self.integrity_check()
+        self.remove_documents()
         self.increment_doc()
-        self.store_text_data()
-        self.store_documents_data()
+        self.store_data()
         self.store_readable_index()
-            
-        
-        
-        
-        
-        
-        
-        
+        self.save_manifest()
+
+
+
+
+
+
+
+
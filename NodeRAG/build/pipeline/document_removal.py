@@ -0,0 +1,362 @@
+import os
+import json
+from collections import Counter
+from typing import Dict, List
+
+import pandas as pd
+
+from ...config import NodeConfig
+from ...storage import storage,GraphStore,IdDictionary
+from ...utils.HNSW import HNSW
+from ..component import Semantic_unit,Entity
+
+
+
+class Document_removal():
+
+    STEPS = ['graph','parquets','hnsw','communities','documents']
+
+    def __init__(self,config:NodeConfig):
+        """
+        Takes documents out of the graph, the cache and the HNSW index by their text units.
+
+        Semantic units and entities are keyed by their content, so several texts can produce the same node.
+        The decomposition of the remaining texts (`text_decomposition.jsonl`) is replayed as the graph stage
+        adds it, which gives the weights and semantic belongings of a fresh build without the removed texts.
+        Nodes a removed text produced are set to them, and a node no remaining text produces is removed with
+        its edges, its attributes and its rows. High level elements linked to removed nodes are dropped and
+        their remaining nodes written to `resummarize.jsonl` for the summary stage.
+
+        The removal is planned before anything is changed and the plan is kept in `removal_journal.json`,
+        with the steps applied so far. Every step sets absolute values, so a removal interrupted by the last
+        run is finished from the journal by the next one.
+
+        Args:
+            config (NodeConfig): Provides the cache paths.
+        """
+        self.config = config
+        self.graph_store = GraphStore(self.config.base_graph_path,self.config.graph_compaction_ratio)
+        self.journal_path = self.config.removal_journal_path
+        self.removed_docs = set()
+        self.removed_texts = set()
+        # nodes and entity pairs produced by removed texts
+        self.touched = set()
+        self.relationships = set()
+        # a fresh build of the remaining texts: weights, belongings and the first text producing each node
+        self.replayed_weights = Counter()
+        self.replayed_belongings = Counter()
+        self.supported = {}
+        self.supported_relationships = {}
+        # contexts of the relationships remaining texts produce, in file order
+        self.contexts = {}
+        # the plan, kept in the journal
+        self.removed_nodes = set()
+        self.weights = {}
+        self.belongings = []
+        self.texts = {}
+        self.relationship_texts = {}
+        self.relationship_contexts = {}
+        self.communities = []
+        self.done = []
+
+    def select(self,deleted_path:List[str],modified_path:List[str],current:set) -> None:
+        '''Documents of deleted files, and of modified files when their hash is not in current'''
+
+        documents = storage.load(self.config.documents_path)
+        files = set(deleted_path) | set(modified_path)
+        # record documents are named <file>#<index>
+        source = documents['path'].map(lambda path: path if path in files else path.rpartition('#')[0])
+        removed = source.isin(files) & ~documents['doc_hash_id'].isin(current)
+
+        self.removed_docs = set(documents.loc[removed,'doc_hash_id'])
+        remaining_texts = {text for texts in documents.loc[~removed,'text_hash_id'] for text in texts}
+        self.removed_texts = {text for texts in documents.loc[removed,'text_hash_id'] for text in texts} - remaining_texts
+
+    @staticmethod
+    def relationship_key(relationship:str,reconstructed:Dict[str,List[str]]) -> tuple[frozenset,str]|None:
+        '''The entity pair of a relationship and its context, as the graph stage joins it'''
+        relationship = reconstructed.get(relationship) or [i.strip() for i in relationship.split(',')]
+        # relationships reconstructed by builds that did not record it cannot be told without asking the LLM again
+        if len(relationship) != 3:
+            return None
+        return frozenset((Entity(relationship[0]).hash_id,Entity(relationship[2]).hash_id))," ".join(relationship)
+
+    def replay(self,semantic_unit:str,entities:List[str],parsed:List[tuple],text_hash_id:str) -> None:
+        '''Add one output of a remaining text as Graph_pipeline.graph_tasks() does'''
+
+        self.replayed_weights[semantic_unit] += 1
+        self.replayed_weights.update(entities)
+        self.supported.setdefault(semantic_unit,text_hash_id)
+        for entity in entities:
+            self.supported.setdefault(entity,text_hash_id)
+
+        belongings = list(entities)
+        for key,context in parsed:
+            self.contexts.setdefault(key,[]).append(context)
+            # a known entity pair only adds its context
+            if key in self.supported_relationships:
+                continue
+            self.supported_relationships[key] = text_hash_id
+            # ends not yet in the graph are added with weight 1 and belong to the semantic unit
+            for node in key:
+                if node not in self.replayed_weights:
+                    self.replayed_weights[node] = 1
+                    self.supported.setdefault(node,text_hash_id)
+                    belongings.append(node)
+        self.replayed_belongings.update((semantic_unit,entity) for entity in belongings)
+
+    def scan_decomposition(self) -> None:
+
+        if not os.path.exists(self.config.text_decomposition_path):
+            return
+
+        with open(self.config.text_decomposition_path,'r',encoding='utf-8') as f, \
+             open(self.config.text_decomposition_path+'.tmp','w',encoding='utf-8') as out:
+            for line in f:
+                data = json.loads(line)
+                text_hash_id = data.get('text_hash_id')
+                removed = text_hash_id in self.removed_texts
+                if not removed:
+                    out.write(line)
+                response = data.get('response')
+                if not isinstance(response,dict):
+                    continue
+
+                for output in response.get('Output',[]):
+                    semantic_unit = Semantic_unit(output.get('semantic_unit')).hash_id
+                    entities = [Entity(entity).hash_id for entity in output.get('entities')]
+                    reconstructed = output.get('reconstructed',{})
+                    parsed = [key for key in (self.relationship_key(relationship,reconstructed) for relationship in output.get('relationships')) if key is not None]
+
+                    if removed:
+                        # nodes of removed texts are set to the replay, whether or not the graph stage reached them
+                        self.touched.update([semantic_unit,*entities])
+                        for key,_ in parsed:
+                            self.relationships.add(key)
+                            self.touched.update(key)
+                    elif data.get('processed'):
+                        # texts the graph stage has not reached yet are added by it later
+                        self.replay(semantic_unit,entities,parsed,text_hash_id)
+
+    def relationship_ids(self) -> Dict[frozenset,str]:
+
+        if not os.path.exists(self.config.relationship_path):
+            return {}
+        relationships = storage.load(self.config.relationship_path)
+        return {frozenset(pair):hash_id for pair,hash_id in zip(relationships['unique_relationship'],relationships['hash_id'])}
+
+    def plan(self,G) -> None:
+        '''Everything the removal changes, worked out before any of it is applied'''
+
+        removed = self.removed_nodes
+        nodes = [node for node in self.touched if G.has_node(node)]
+        for node in nodes:
+            if node in self.replayed_weights:
+                self.weights[node] = self.replayed_weights[node]
+            else:
+                removed.add(node)
+
+        relationship_ids = self.relationship_ids()
+        for key in self.relationships:
+            hash_id = relationship_ids.get(key)
+            if hash_id is not None and G.has_node(hash_id) and key not in self.supported_relationships:
+                removed.add(hash_id)
+        removed.update(text for text in self.removed_texts if G.has_node(text))
+
+        # relationships that lost an end and attributes of removed entities go with them
+        for node in list(removed):
+            for neighbour in G.neighbors(node):
+                if G.nodes[neighbour].get('type') in ('relationship','attribute') and G.nodes[node].get('type') == 'entity':
+                    removed.add(neighbour)
+
+        # communities that lost a node are summarized again from the nodes they keep
+        affected = {neighbour for node in removed for neighbour in G.neighbors(node) if G.nodes[neighbour].get('type') == 'high_level_element'}
+        for high_level_element in affected:
+            community = []
+            for neighbour in G.neighbors(high_level_element):
+                if G.nodes[neighbour].get('type') == 'high_level_element_title':
+                    removed.add(neighbour)
+                elif neighbour not in removed and G.nodes[neighbour].get('type') != 'high_level_element':
+                    community.append(neighbour)
+            removed.add(high_level_element)
+            # one summary gives several high level elements over the same nodes
+            community = sorted(community)
+            if community and community not in self.communities:
+                self.communities.append(community)
+
+        # semantic belongings of the touched nodes are those of the replay, including the ones it adds or drops
+        pairs = {pair for pair in self.replayed_belongings if pair[0] in self.weights or pair[1] in self.weights}
+        for node in self.weights:
+            if G.nodes[node].get('type') == 'semantic_unit':
+                pairs.update((node,neighbour) for neighbour in G.neighbors(node) if G.nodes[neighbour].get('type') == 'entity')
+            elif G.nodes[node].get('type') == 'entity':
+                pairs.update((neighbour,node) for neighbour in G.neighbors(node) if G.nodes[neighbour].get('type') == 'semantic_unit')
+        self.belongings = [[semantic_unit,entity,self.replayed_belongings[(semantic_unit,entity)]] for semantic_unit,entity in sorted(pairs)
+                           if semantic_unit not in removed and entity not in removed]
+
+        # rows first produced by a removed text point at a remaining one
+        self.texts = {node:self.supported[node] for node in self.weights}
+        self.relationship_texts = {hash_id:self.supported_relationships.get(key) for key,hash_id in relationship_ids.items() if key in self.relationships}
+        # kept relationships a removed text described are told again from the remaining texts alone
+        self.relationship_contexts = {hash_id:'\t'.join(self.contexts[key]) for key,hash_id in relationship_ids.items() if key in self.relationships and key in self.contexts}
+
+    def save_journal(self) -> None:
+
+        journal = {'removed_docs':sorted(self.removed_docs),
+                   'removed_texts':sorted(self.removed_texts),
+                   'removed_nodes':sorted(self.removed_nodes),
+                   'weights':self.weights,
+                   'belongings':self.belongings,
+                   'texts':self.texts,
+                   'relationship_texts':self.relationship_texts,
+                   'relationship_contexts':self.relationship_contexts,
+                   'communities':self.communities,
+                   'done':self.done}
+        with open(self.journal_path+'.tmp','w',encoding='utf-8') as f:
+            json.dump(journal,f,ensure_ascii=False)
+        os.replace(self.journal_path+'.tmp',self.journal_path)
+
+    def load_journal(self) -> bool:
+
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path,'r',encoding='utf-8') as f:
+            journal = json.load(f)
+        self.removed_docs = set(journal['removed_docs'])
+        self.removed_texts = set(journal['removed_texts'])
+        self.removed_nodes = set(journal['removed_nodes'])
+        self.weights = journal['weights']
+        self.belongings = journal['belongings']
+        self.texts = journal['texts']
+        self.relationship_texts = journal['relationship_texts']
+        self.relationship_contexts = journal['relationship_contexts']
+        self.communities = journal['communities']
+        self.done = journal['done']
+        return True
+
+    def update_graph(self,G = None) -> None:
+
+        if G is None:
+            G = self.graph_store.load()
+        if G is None:
+            return
+
+        for node,weight in self.weights.items():
+            if G.has_node(node):
+                G.nodes[node]['weight'] = weight
+        for semantic_unit,entity,weight in self.belongings:
+            if weight > 0 and G.has_node(semantic_unit) and G.has_node(entity):
+                G.add_edge(semantic_unit,entity,weight=weight)
+            elif G.has_edge(semantic_unit,entity):
+                G.remove_edge(semantic_unit,entity)
+        G.remove_nodes_from([node for node in self.removed_nodes if G.has_node(node)])
+
+        # semantic units kept through another text are linked to it when it is in the graph
+        for node,text_hash_id in self.texts.items():
+            if G.has_node(node) and G.nodes[node].get('type') == 'semantic_unit' and G.has_node(text_hash_id) and not G.has_edge(node,text_hash_id):
+                G.add_edge(node,text_hash_id,type='text',weight=1)
+
+        self.graph_store.save(G)
+        self.config.console.print(f'[green]{len(self.removed_nodes)} nodes removed from the graph[/green]')
+
+    def update_node_rows(self,path:str,texts:Dict[str,str]|None = None,contexts:Dict[str,str]|None = None) -> None:
+
+        if not os.path.exists(path):
+            return
+        df = storage.load(path)
+        df = df[~df['hash_id'].isin(self.removed_nodes)]
+        if 'node' in df.columns:
+            # attribute rows name their entity by its node code
+            nodes = pd.Series(IdDictionary.load(self.config.node_ids_path).decode_column(df['node']),index=df.index,dtype=object)
+            df = df[~nodes.isin(self.removed_nodes)]
+        if texts is not None:
+            moved = df['text_hash_id'].isin(self.removed_texts)
+            df.loc[moved,'text_hash_id'] = df.loc[moved,'hash_id'].map(texts).fillna(df.loc[moved,'text_hash_id'])
+        if 'weight' in df.columns and self.weights:
+            df['weight'] = df['hash_id'].map(self.weights).fillna(df['weight'])
+        if contexts:
+            changed = df['hash_id'].isin(contexts.keys())
+            df.loc[changed,'context'] = df.loc[changed,'hash_id'].map(contexts)
+            if 'tokens' in df.columns:
+                df.loc[changed,'tokens'] = df.loc[changed,'context'].map(self.config.token_counter)
+        storage(df.reset_index(drop=True)).save_parquet(path)
+
+    def update_parquets(self) -> None:
+
+        self.update_node_rows(self.config.semantic_units_path,self.texts)
+        self.update_node_rows(self.config.entities_path,self.texts)
+        self.update_node_rows(self.config.relationship_path,self.relationship_texts,self.relationship_contexts)
+        self.update_node_rows(self.config.attributes_path)
+        self.update_node_rows(self.config.high_level_elements_path)
+        self.update_node_rows(self.config.high_level_elements_titles_path)
+
+        storage.filter_parquet(self.config.text_path,'hash_id',self.removed_texts)
+        if os.path.exists(self.config.embedding):
+            storage.filter_parquet(self.config.embedding,'hash_id',self.removed_nodes | self.removed_texts)
+
+    def update_hnsw(self) -> None:
+
+        if not os.path.exists(self.config.HNSW_path):
+            return
+        hnsw = HNSW(self.config)
+        removed = hnsw.remove_nodes(self.removed_nodes | self.removed_texts)
+        hnsw.save_HNSW()
+        self.config.console.print(f'[green]{removed} items marked deleted in HNSW[/green]')
+
+    def mark_communities(self) -> None:
+
+        if not self.communities:
+            return
+        communities = []
+        if os.path.exists(self.config.resummarize_path):
+            with open(self.config.resummarize_path,'r',encoding='utf-8') as f:
+                communities = [json.loads(line)['community'] for line in f]
+        # rewritten whole, so a resumed removal does not mark its communities twice
+        communities.extend(community for community in self.communities if community not in communities)
+        with open(self.config.resummarize_path+'.tmp','w',encoding='utf-8') as f:
+            for community in communities:
+                f.write(json.dumps({'community':community},ensure_ascii=False)+'\n')
+        os.replace(self.config.resummarize_path+'.tmp',self.config.resummarize_path)
+
+    def update_documents(self) -> None:
+
+        # the decomposition without the removed texts was written when the removal was planned
+        if os.path.exists(self.config.text_decomposition_path+'.tmp'):
+            os.replace(self.config.text_decomposition_path+'.tmp',self.config.text_decomposition_path)
+        storage.filter_parquet(self.config.documents_path,'doc_hash_id',self.removed_docs)
+
+    def apply(self,G = None) -> None:
+
+        steps = {'graph':lambda: self.update_graph(G),
+                 'parquets':self.update_parquets,
+                 'hnsw':self.update_hnsw,
+                 'communities':self.mark_communities,
+                 'documents':self.update_documents}
+        for step in self.STEPS:
+            if step in self.done:
+                continue
+            steps[step]()
+            self.done.append(step)
+            self.save_journal()
+        os.remove(self.journal_path)
+        self.config.console.print(f'[green]{len(self.removed_docs)} documents and {len(self.removed_texts)} texts removed[/green]')
+
+    def resume(self) -> None:
+        '''Finish a removal the last run was interrupted in'''
+
+        if self.load_journal():
+            self.config.console.print(f'[yellow]Finishing the removal of {len(self.removed_docs)} documents[/yellow]')
+            self.apply()
+
+    def main(self,deleted_path:List[str],modified_path:List[str],current:set) -> None:
+
+        self.select(deleted_path,modified_path,current)
+        if not self.removed_docs:
+            return
+
+        self.scan_decomposition()
+        G = self.graph_store.load()
+        if G is not None:
+            self.plan(G)
+        self.save_journal()
+        self.apply(G)
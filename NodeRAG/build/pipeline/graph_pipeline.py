@@ -12,7 +12,7 @@ from ..component import (
     Relationship
 )
 
-from ...storage import storage
+from ...storage import storage,GraphStore,TrackedGraph
 from ...config import NodeConfig
 from ...logging import info_timer
 class Graph_pipeline:
@@ -21,6 +21,7 @@ class Graph_pipeline:
     def __init__(self,config:NodeConfig):
         
         self.config = config
+        self.graph_store = GraphStore(self.config.graph_path,self.config.graph_compaction_ratio)
         self.G = self.load_graph()
         self.indices = self.config.indices
         self.data ,self.processed_data = self.load_data()
@@ -29,6 +30,8 @@ class Graph_pipeline:
         self.semantic_units = []
         self.entities = []
         self.relationship, self.relationship_lookup = self.load_relationship()
+        self.stored_relationships = len(self.relationship)
+        self.stored_nodes = self.load_stored_nodes()
         self.relationship_nodes = []
         self.console = self.config.console
     
@@ -40,9 +43,9 @@ class Graph_pipeline:
         return True
         
     def load_graph(self) -> nx.Graph:
-        if os.path.exists(self.config.graph_path):
-            return storage.load_pickle(self.config.graph_path)
-        return nx.Graph()
+        if self.graph_store.exists():
+            return self.graph_store.load()
+        return TrackedGraph()
         
     def load_data(self)->List[LLMOutput]:
         data_list = []
@@ -54,6 +57,9 @@ class Graph_pipeline:
                     data_list.append(data)
                 else:
                     processed_data.append(data)
+        # decompositions are written as they finish, applied in text order so the graph does not depend on it
+        order = {record['hash_id']:i for i,record in enumerate(storage.iter_parquet(self.config.text_path,columns=['hash_id']))}
+        data_list.sort(key=lambda data:order.get(data.get('text_hash_id'),len(order)))
         return data_list,processed_data
     
     def load_relationship(self)->List[Relationship]:
@@ -67,27 +73,45 @@ class Graph_pipeline:
             for _, row in df.iterrows():
                 rel = Relationship.from_df_row(row)
                 relationship.append(rel)
-                relationship_lookup[rel.hash_id] = rel
+                relationship_lookup[rel.unique_relationship] = rel
                 
-                # Add relationship node to graph if it doesn't exist
+                # Add relationship node to graph if it doesn't exist; without weight, the base graph
+                # already holds it and concatenation adds the increment's weight to it
                 if not self.G.has_node(rel.hash_id):
-                    # Get weight from parquet if available, otherwise default to 1
-                    weight = row.get('weight', 1) if 'weight' in row else 1
-                    self.G.add_node(rel.hash_id, type='relationship', weight=weight)
+                    self.G.add_node(rel.hash_id, type='relationship', weight=0)
             
             return relationship, relationship_lookup
         
         return [],{}
     
+    def load_stored_nodes(self) -> set:
+        
+        # the graph here holds only this increment, nodes of earlier builds are told by their stored rows
+        stored = set()
+        for path in [self.config.semantic_units_path,self.config.entities_path]:
+            if os.path.exists(path):
+                stored.update(record['hash_id'] for record in storage.iter_parquet(path,columns=['hash_id']))
+        return stored
+    
     async def build_graph(self):
         
         self.config.tracker.set(len(self.data),desc="Building graph")
-        tasks = []
-        
+        # only the relationship reconstructions wait on the LLM, they run together before the texts are added one by one
+        await asyncio.gather(*[self.reconstruct_relationships(data) for data in self.data])
         for data in self.data:
-            tasks.append(self.graph_tasks(data))
-        await asyncio.gather(*tasks)
+            await self.graph_tasks(data)
         self.config.tracker.close()
+    
+    async def reconstruct_relationships(self,data:Dict):
+        
+        response = data.get('response')
+        if not isinstance(response,dict):
+            return
+        for output in response.get('Output'):
+            for raw_relationship in output.get('relationships'):
+                relationship = [i.strip() for i in raw_relationship.split(',')]
+                if len(relationship) != 3:
+                    output.setdefault('reconstructed',{})[raw_relationship] = await self.reconstruct_relationship(relationship)
         
     async def graph_tasks(self,data:Dict):
         text_hash_id = data.get('text_hash_id')
@@ -104,7 +128,11 @@ class Graph_pipeline:
                 semantic_unit_hash_id = self.add_semantic_unit(semantic_unit,text_hash_id)
                 entities_hash_id = self.add_entities(entities,text_hash_id)
         
-                entities_hash_id_re = await self.add_relationships(relationships,text_hash_id)
+                # relationships the LLM reconstructs are kept with the output, so removing a document can replay them
+                reconstructed = output.setdefault('reconstructed',{})
+                entities_hash_id_re = await self.add_relationships(relationships,text_hash_id,reconstructed)
+                if not reconstructed:
+                    del output['reconstructed']
                 entities_hash_id.extend(entities_hash_id_re)
                 self.add_semantic_belongings(semantic_unit_hash_id,entities_hash_id)
             data['processed'] = True
@@ -125,7 +153,8 @@ class Graph_pipeline:
             self.G.nodes[semantic_unit.hash_id]['weight'] += 1
         else:
             self.G.add_node(semantic_unit.hash_id,type ='semantic_unit',weight = 1)
-            self.semantic_units.append(semantic_unit)
+            if semantic_unit.hash_id not in self.stored_nodes:
+                self.semantic_units.append(semantic_unit)
         return semantic_unit.hash_id
         
     def add_entities(self,entities:List[Dict],text_hash_id:str):
@@ -142,7 +171,8 @@ class Graph_pipeline:
             
             else:
                 self.G.add_node(entity.hash_id,type = 'entity',weight = 1)
-                self.entities.append(entity)
+                if entity.hash_id not in self.stored_nodes:
+                    self.entities.append(entity)
         
         return entities_hash_id
     
@@ -155,33 +185,39 @@ class Graph_pipeline:
             else:
                 self.G.add_edge(semantic_unit_hash_id,entity_hash_id,weight = 1)
             
-    async def add_relationships(self,relationships:List[str],text_hash_id:str):
+    async def add_relationships(self,relationships:List[str],text_hash_id:str,reconstructed:Dict[str,List[str]]|None = None):
         
         entities_hash_id = []
-        for relationship in relationships:
+        for raw_relationship in relationships:
             
-            relationship = relationship.split(',')
+            relationship = raw_relationship.split(',')
             relationship = [i.strip() for i in relationship]
             
             if len(relationship) != 3:
-                relationship = await self.reconstruct_relationship(relationship)
+                if reconstructed is not None and raw_relationship in reconstructed:
+                    relationship = reconstructed[raw_relationship]
+                else:
+                    relationship = await self.reconstruct_relationship(relationship)
+                    if reconstructed is not None:
+                        reconstructed[raw_relationship] = relationship
             
             relationship = Relationship(relationship,text_hash_id)
-            hash_id = relationship.hash_id
-            if hash_id in self.relationship_lookup:
-                Re = self.relationship_lookup[hash_id]
-                Re.add(relationship.raw_context)
+            # looked up by the entity pair, relationships of earlier builds keep the id they were stored with
+            if relationship.unique_relationship in self.relationship_lookup:
+                Re = self.relationship_lookup[relationship.unique_relationship]
+                Re.add(relationship.relationship_tuple)
                 continue
             
             
             self.relationship.append(relationship)
-            self.relationship_lookup[hash_id] = relationship
+            self.relationship_lookup[relationship.unique_relationship] = relationship
             
             
             for node in [relationship.source, relationship.target, relationship]:
                 if not self.G.has_node(node.hash_id):
-                    self.G.add_node(node.hash_id, type='entity' if node in [relationship.source, relationship.target] else 'relationship', weight=1)
-                    if node in [relationship.source, relationship.target]:
+                    # an end that is already stored is not counted again, as when it is already in the graph
+                    self.G.add_node(node.hash_id, type='entity' if node in [relationship.source, relationship.target] else 'relationship', weight=0 if node.hash_id in self.stored_nodes else 1)
+                    if node in [relationship.source, relationship.target] and node.hash_id not in self.stored_nodes:
                         self.relationship_nodes.append(node)
                         entities_hash_id.append(node.hash_id)
                     
@@ -223,6 +259,7 @@ class Graph_pipeline:
                                    'human_readable_id':semantic_unit.human_readable_id,
                                    'type':'semantic_unit',
                                    'context':semantic_unit.raw_context,
+                                   'tokens':self.config.token_counter(semantic_unit.raw_context),
                                    'text_hash_id':semantic_unit.text_hash_id,
                                    'weight':self.G.nodes[semantic_unit.hash_id]['weight'],
                                    'embedding':None,
@@ -244,6 +281,7 @@ class Graph_pipeline:
                              'human_readable_id':entity.human_readable_id,
                              'type':'entity',
                              'context':entity.raw_context,
+                             'tokens':self.config.token_counter(entity.raw_context),
                              'text_hash_id':entity.text_hash_id,
                              'weight':self.G.nodes[entity.hash_id]['weight']})
         for node in self.relationship_nodes:
@@ -251,6 +289,7 @@ class Graph_pipeline:
                              'human_readable_id':node.human_readable_id,
                              'type':'entity',
                              'context':node.raw_context,
+                             'tokens':self.config.token_counter(node.raw_context),
                              'text_hash_id':node.text_hash_id,
                              'weight':self.G.nodes[node.hash_id]['weight']})
         G_entities = [node for node in self.G.nodes if self.G.nodes[node]['type'] == 'entity']
@@ -264,12 +303,14 @@ class Graph_pipeline:
         
     def save_relationships(self):
         relationships = []
-        for relationship in self.relationship:
+        # relationships loaded from relationship.parquet are already there, see update_stored_relationships
+        for relationship in self.relationship[self.stored_relationships:]:
             relationships.append({'hash_id':relationship.hash_id,
                                  'human_readable_id':relationship.human_readable_id,
                                  'type':'relationship',
                                  'unique_relationship':list(relationship.unique_relationship),
                                  'context':relationship.raw_context,
+                                 'tokens':self.config.token_counter(relationship.raw_context),
                                  'text_hash_id':relationship.text_hash_id,
                                  'weight':self.G.nodes[relationship.hash_id]['weight']})
         relation_nodes = [node for node in self.G.nodes if self.G.nodes[node]['type'] == 'relationship']
@@ -281,7 +322,35 @@ class Graph_pipeline:
         return relationships
         
         
+    def update_stored_relationships(self):
+        
+        if not os.path.exists(self.config.relationship_path):
+            return
+        # contexts appended to relationships of earlier builds by this one
+        contexts = {relationship.hash_id:relationship.raw_context for relationship in self.relationship[:self.stored_relationships]}
+        df = storage.load(self.config.relationship_path)
+        changed = df['hash_id'].map(contexts).fillna(df['context']) != df['context']
+        if changed.any():
+            df.loc[changed,'context'] = df.loc[changed,'hash_id'].map(contexts)
+            if 'tokens' in df.columns:
+                df.loc[changed,'tokens'] = df.loc[changed,'context'].map(self.config.token_counter)
+            storage(df).save_parquet(self.config.relationship_path)
+        
+    def update_stored_weights(self,path:str):
+        
+        if not os.path.exists(path):
+            return
+        # semantic units and entities of earlier builds keep their row, with this increment's weight added
+        df = storage.load(path)
+        weights = df['hash_id'].map(lambda hash_id: self.G.nodes[hash_id]['weight'] if self.G.has_node(hash_id) else 0)
+        if weights.any():
+            df['weight'] = df['weight'] + weights
+            storage(df).save_parquet(path)
+        
     def save(self):
+        self.update_stored_relationships()
+        self.update_stored_weights(self.config.semantic_units_path)
+        self.update_stored_weights(self.config.entities_path)
         semantic_units = self.save_semantic_units()
         entities = self.save_entities()
         relationships = self.save_relationships()
@@ -293,7 +362,7 @@ class Graph_pipeline:
     def save_graph(self):
         if self.data == []:
             return None
-        storage(self.G).save_pickle(self.config.graph_path)
+        self.graph_store.save(self.G)
         self.console.print('[green]Graph stored[/green]')
     
     @info_timer(message='Graph Pipeline')
@@ -13,7 +13,7 @@ import hnswlib_noderag
 from ...config import NodeConfig
 from ...build.component import Question, Answer
 from ...utils.qa_api_client import QAAPIClient
-from ...storage import storage
+from ...storage import storage,GraphStore
 from ...LLM import Embedding_message
 from ...logging import info_timer
 
@@ -39,8 +39,9 @@ class QA_Pipeline:
             Updated graph with Q&A nodes
         """
         # Load existing graph
-        if os.path.exists(self.config.graph_path):
-            self.G = self.storage_obj.load_pickle(self.config.graph_path)
+        graph_store = GraphStore(self.config.graph_path,self.config.graph_compaction_ratio)
+        if graph_store.exists():
+            self.G = graph_store.load()
         else:
             self.G = nx.DiGraph()
         
@@ -213,7 +214,7 @@ class QA_Pipeline:
                 sys.stdout.flush()
             
             # Save updated graph
-            self.storage_obj(self.G).save_pickle(self.config.graph_path)
+            graph_store.save(self.G)
             
             # Count nodes in graph before saving
             question_count = len([n for n in self.G.nodes() if self.G.nodes[n].get('type') == 'question'])
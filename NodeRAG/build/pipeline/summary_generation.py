@@ -8,7 +8,10 @@ import numpy as np
 
 from ...storage import (
     Mapper,
-    storage
+    storage,
+    GraphStore,
+    TrackedGraph,
+    IdDictionary
 )
 
 from ..component import (
@@ -19,7 +22,8 @@ from ...config import NodeConfig
 
 
 from ...utils import (
-    IGraph,
+    CompactGraph,
+    WorkerPool
 )
 
 from ...logging import info_timer
@@ -32,26 +36,43 @@ class SummaryGeneration:
         self.indices = self.config.indices
         self.communities = []
         self.high_level_elements = []
+        # communities of the base graph summarized again after document removal, by hash
+        self.resummarized = {}
 
-        if os.path.exists(self.config.graph_path):
+        if self.has_work():
             
-            self.mapper = Mapper([self.config.semantic_units_path,
-                                  self.config.attributes_path])
-            self.mapper.add_embedding(self.config.embedding)
-            self.G = storage.load(self.config.graph_path)
-            self.G_ig = IGraph(self.G).to_igraph()
+            self.mapper = Mapper([path for path in [self.config.semantic_units_path,
+                                                    self.config.attributes_path] if os.path.exists(path)])
+            if os.path.exists(self.config.embedding):
+                self.mapper.add_embedding(self.config.embedding)
+            self.graph_store = GraphStore(self.config.graph_path,self.config.graph_compaction_ratio)
+            if self.graph_store.exists():
+                self.G = self.graph_store.load()
+                # nodes without edges are left out of the partition, as ig.Graph.TupleList did; sorted, so the
+                # partition does not depend on the order the graph was built in
+                self.G_ig = CompactGraph.from_networkx(self.G).sorted().to_igraph(isolated=False)
+            else:
+                self.G = TrackedGraph()
+                self.G_ig = None
             self.nodes_high_level_elements_group = []
             self.nodes_high_level_elements_match = []
 
         
 
     
+    def has_work(self) -> bool:
+        return os.path.exists(self.config.graph_path) or os.path.exists(self.config.resummarize_path)
+    
     def partition(self):
         
-        partition = la.find_partition(self.G_ig,la.ModularityVertexPartition)
+        if self.G_ig is None:
+            return
+        # fixed seed on the sorted graph keeps community hashes stable across processes, so an interrupted run can resume its summaries
+        partition = la.find_partition(self.G_ig,la.ModularityVertexPartition,seed=0)
         
+        names = self.G_ig.vs['name']
         for i,community in enumerate(partition):
-            community_name = [self.G_ig.vs[node]['name'] for node in community if self.G_ig.vs[node]['name'] in self.mapper.embeddings]
+            community_name = [names[node] for node in community if names[node] in self.mapper.embeddings]
             self.communities.append(Community_summary(community_name,self.mapper,self.G,self.config))
             
     async def generate_community_summary(self,community:Community_summary):
@@ -68,22 +89,53 @@ class SummaryGeneration:
         
         with open(self.config.summary_path,'a',encoding='utf-8') as f:
             f.write(json.dumps(community_dict,ensure_ascii=False)+'\n')
+        community.response = None
         
         self.config.tracker.update()
         
+    def resume_community_summary(self) -> set:
+        
+        # keep summaries of communities that still exist from an interrupted run, drop the rest
+        if not os.path.exists(self.config.summary_path):
+            return set()
         
+        community_hash_ids = {community.hash_id for community in self.communities}
+        finished = []
+        with open(self.config.summary_path,'r',encoding='utf-8') as f:
+            for line in f:
+                if json.loads(line)['hash_id'] in community_hash_ids:
+                    finished.append(line)
+        with open(self.config.summary_path,'w',encoding='utf-8') as f:
+            f.writelines(finished)
+        return {json.loads(line)['hash_id'] for line in finished}
             
+    def load_resummarize(self):
+        
+        if not os.path.exists(self.config.resummarize_path):
+            return
+        base_G = GraphStore(self.config.base_graph_path).load(track=False)
+        with open(self.config.resummarize_path,'r',encoding='utf-8') as f:
+            for line in f:
+                # nodes removed since the community was marked are left out
+                community_name = [node for node in json.loads(line)['community'] if base_G.has_node(node)]
+                if not community_name:
+                    continue
+                community = Community_summary(community_name,self.mapper,base_G,self.config)
+                if community.hash_id not in self.resummarized:
+                    self.resummarized[community.hash_id] = base_G
+                    self.communities.append(community)
+    
     async def generate_high_level_element_summary(self):
         
         self.partition()
+        self.load_resummarize()
         
-        tasks = []
+        finished = self.resume_community_summary()
+        pending = [community for community in self.communities if community.hash_id not in finished]
         
-        self.config.tracker.set(len(self.communities),'Community Summary')
-        for community in self.communities:
-            tasks.append(self.generate_community_summary(community))
+        self.config.tracker.set(len(pending),'Community Summary')
         
-        await asyncio.gather(*tasks)
+        await WorkerPool(self.config.build_workers).run(pending,self.generate_community_summary)
         
         self.config.tracker.close()
        
@@ -115,12 +167,21 @@ class SummaryGeneration:
             for line in f:
                 line = json.loads(line)
                 results.append(line)
+        # summaries are written as they finish, read back in community order
+        order = {community.hash_id:i for i,community in enumerate(self.communities)}
+        results.sort(key=lambda result:order.get(result['hash_id'],len(order)))
                 
         All_nodes = []
         self.config.tracker.set(len(results),'High Level Element Summary')
         for result in results:
             high_level_elements = []
             node_names = result['community']
+            base_G = self.resummarized.get(result['hash_id'])
+            if base_G is not None:
+                # base graph nodes enter the new graph without weight, only to carry the edges to their summary
+                for node in node_names:
+                    if not self.G.has_node(node):
+                        self.G.add_node(node,type=base_G.nodes[node]['type'],weight=0)
             for high_level_element in  result['response']['high_level_elements']:
                 he = High_level_elements(high_level_element['description'],high_level_element['title'],self.config)
                 he.related_node(node_names)
@@ -140,8 +201,14 @@ class SummaryGeneration:
                 
                 if not self.G.has_edge(*edge):
                     self.G.add_edge(*edge,weight=1)
+                
+                if base_G is not None:
+                    for node in node_names:
+                        self.G.add_edge(node,he.hash_id,weight=1)
             
-            All_nodes.extend(node_names)
+            # the embeddings of base graph nodes are in the HNSW index, not in the mapper
+            if base_G is None:
+                All_nodes.extend(node_names)
             self.high_level_elements.extend(high_level_elements)
             self.config.tracker.update()
         self.config.tracker.close()
@@ -151,7 +218,7 @@ class SummaryGeneration:
         centroids = math.ceil(math.sqrt(len(All_nodes)+len(self.high_level_elements)))
         threshold = (len(All_nodes)+len(self.high_level_elements))/centroids
         n=0
-        if threshold > self.config.Hcluster_size:
+        if threshold > self.config.Hcluster_size and All_nodes:
             embedding_list = np.array([self.mapper.embeddings[node] for node in All_nodes], dtype=np.float32)
             high_level_element_embedding = np.array([he.embedding for he in self.high_level_elements], dtype=np.float32)
             all_embeddings = np.vstack([high_level_element_embedding, embedding_list])
@@ -196,24 +263,28 @@ class SummaryGeneration:
                 
    
     def store_graph(self):
-        storage(self.G).save_pickle(self.config.graph_path)
+        self.graph_store.save(self.G)
         self.config.console.print('[bold green]Graph stored[/bold green]')
         
     def delete_community_cache(self):
         os.remove(self.config.summary_path)
+        if os.path.exists(self.config.resummarize_path):
+            os.remove(self.config.resummarize_path)
         
     def store_high_level_elements(self):
         
         high_level_elements = []
         titles = []
         embedding_list = []
+        # related nodes are stored as node codes
+        node_ids = IdDictionary.load(self.config.node_ids_path)
         for high_level_element in self.high_level_elements:
             high_level_elements.append({'type':'high_level_element',
                                         'title_hash_id':high_level_element.title_hash_id,
                                         'context':high_level_element.context,
                                         'hash_id':high_level_element.hash_id,
                                         'human_readable_id':high_level_element.human_readable_id,
-                                        'related_nodes':list(self.G.neighbors(high_level_element.hash_id)),
+                                        'related_nodes':np.array([node_ids.add(node) for node in self.G.neighbors(high_level_element.hash_id)],dtype=np.int32),
                                         'embedding':'done'})
             
             titles.append({'type':'high_level_element_title',
@@ -229,13 +300,12 @@ class SummaryGeneration:
         storage(high_level_elements).save_parquet(self.config.high_level_elements_path,append = os.path.exists(self.config.high_level_elements_path))
         storage(titles).save_parquet(self.config.high_level_elements_titles_path,append = os.path.exists(self.config.high_level_elements_titles_path))
         storage(embedding_list).save_parquet(self.config.embedding,append = os.path.exists(self.config.embedding))
+        node_ids.save(self.config.node_ids_path)
         self.config.console.print('[bold green]High level elements stored[/bold green]')
             
     @info_timer(message='Summary Generation Pipeline')        
     async def main(self):
-        if os.path.exists(self.config.graph_path):
-            if os.path.exists(self.config.summary_path):
-                os.remove(self.config.summary_path)
+        if self.has_work():
             await self.generate_high_level_element_summary()
             await self.high_level_element_summary()
             self.store_high_level_elements()
@@ -1,5 +1,6 @@
-from typing import Dict,List
+from typing import Dict,List,Iterator
 import pandas as pd
+import pyarrow.parquet as pq
 import asyncio
 import os
 import json
@@ -10,13 +11,14 @@ from ...storage import storage
 from ..component import Text_unit
 from ...logging.error import clear_cache
 from ...logging import info_timer
+from ...utils import WorkerPool
 
 class text_pipline():
         
         def __init__(self, config:NodeConfig)-> None:
             
             self.config = config
-            self.texts = self.load_texts()
+            self.exist_hash_id = set()
             
             
         def load_texts(self) -> pd.DataFrame:
@@ -24,31 +26,33 @@ class text_pipline():
             texts = storage.load_parquet(self.config.text_path)
             return texts
         
+        def iter_texts(self, batch_size:int = 1024) -> Iterator[Text_unit]:
+            
+            # stream text units from parquet in record batches instead of loading the whole table
+            text_file = pq.ParquetFile(self.config.text_path)
+            for batch in text_file.iter_batches(batch_size=batch_size,columns=['context','hash_id','text_id']):
+                for row in batch.to_pylist():
+                    if row['hash_id'] not in self.exist_hash_id:
+                        yield Text_unit(row['context'],row['hash_id'],row['text_id'])
+        
         async def text_decomposition_pipline(self) -> None:
             
-            async_task = []
-            self.config.tracker.set(len(self.texts),'Text Decomposition')
+            total = pq.ParquetFile(self.config.text_path).metadata.num_rows
+            self.config.tracker.set(max(total-len(self.exist_hash_id),0),'Text Decomposition')
             
-            for index, row in self.texts.iterrows():
-                text = Text_unit(row['context'],row['hash_id'],row['text_id'])
-                async_task.append(text.text_decomposition(self.config))
-            await asyncio.gather(*async_task)
+            await WorkerPool(self.config.build_workers).run(self.iter_texts(),
+                                                           lambda text: text.text_decomposition(self.config))
             
                 
         def increment(self) -> None:
             
-            exist_hash_id = []
-            
             with open(self.config.text_decomposition_path,'r',encoding='utf-8') as f:
                 for line in f:
                     line = json.loads(line)
-                    exist_hash_id.append(line['hash_id'])
-            self.texts = self.texts[~self.texts['hash_id'].isin(exist_hash_id)]
+                    self.exist_hash_id.add(line['text_hash_id'])
             
         async def rerun(self) -> None:
             
-            self.texts = self.load_texts()
-            
             with open(self.config.LLM_error_cache,'r',encoding='utf-8') as f:
                 LLM_store = []
                 for line in f:
@@ -59,6 +63,8 @@ class text_pipline():
             
             await self.rerun_request(LLM_store)
             self.config.tracker.close()
+            if os.path.exists(self.config.text_decomposition_path):
+                self.increment()
             await self.text_decomposition_pipline()
                     
         async def rerun_request(self,LLM_store:List[Dict]) -> None:
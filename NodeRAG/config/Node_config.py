@@ -1,6 +1,6 @@
 import time
 import os
-from ..logging import setup_logger
+from ..logging import setup_logger,BuildMetrics,set_metrics
 import shutil
 import yaml
 from typing import Dict,Any
@@ -21,7 +21,8 @@ from ..utils import (
 from ..LLM import (
     set_api_client,
     set_embedding_client,
-    API_client
+    API_client,
+    ResponseCache
 )
 
 from ..build.component import text_unit_index_counter
@@ -91,25 +92,42 @@ class NodeConfig():
         self.question_id_map_path = os.path.join(self.cache, 'question_id_map.parquet')
         self.graph_path = os.path.join(self.cache, 'new_graph.pkl')
         self.attributes_path = os.path.join(self.cache, 'attributes.parquet')
+        self.attributes_cache = os.path.join(self.cache, 'attributes_cache.jsonl')
         self.embedding_cache = os.path.join(self.cache, 'embedding_cache.jsonl')
         self.embedding = os.path.join(self.cache, 'embedding.parquet')
         self.base_graph_path = os.path.join(self.cache, 'graph.pkl')
         self.summary_path = os.path.join(self.cache, 'community_summary.jsonl')
+        self.resummarize_path = os.path.join(self.cache, 'resummarize.jsonl')
+        self.removal_journal_path = os.path.join(self.cache, 'removal_journal.json')
         self.high_level_elements_path = os.path.join(self.cache, 'high_level_elements.parquet')
         self.high_level_elements_titles_path = os.path.join(self.cache, 'high_level_elements_titles.parquet')
         self.HNSW_path = os.path.join(self.cache, 'HNSW.bin')
         self.hnsw_graph_path = os.path.join(self.cache, 'hnsw_graph.pkl')
+        self.search_graph_path = os.path.join(self.cache, 'search_graph.pkl')
+        self.pagerank_path = os.path.join(self.cache, 'pagerank.pkl')
         self.id_map_path = os.path.join(self.cache, 'id_map.parquet')
+        self.node_ids_path = os.path.join(self.cache, 'node_ids.parquet')
         self.LLM_error_cache = os.path.join(self.cache, 'LLM_error.jsonl')
+        self.llm_cache_path = os.path.join(self.cache, 'llm_cache.sqlite')
         
         
         self.embedding_batch_size = self.config.get('embedding_batch_size',50)
+        # graph saves append changed nodes and edges until the log reaches this share of the snapshot size
+        self.graph_compaction_ratio = self.config.get('graph_compaction_ratio',0.5)
+        # number of concurrent LLM workers per build stage, bounds the prompts held in memory
+        self.build_workers = self.config.get('build_workers',16)
+        # processes splitting documents into text units, 1 splits in the build process
+        self.split_workers = self.config.get('split_workers',1)
+        # sampled source nodes of the betweenness estimate that picks entities for attribute generation
+        self.betweenness_samples = self.config.get('betweenness_samples',10)
         self._m = self.config.get('m',5)
         self._ef = self.config.get('ef',200)
         self._m0 = self.config.get('m0',None)
         self.space = self.config.get('space','l2')
         self.dim = self.config.get('dim',1536)
         self.docu_type = self.config.get('docu_type','mixed')
+        # field holding the document text in JSONL, CSV, TSV and parquet inputs, one document per record
+        self.record_text_field = self.config.get('record_text_field','text')
 
         self.Hcluster_size = self.config.get('Hcluster_size',39)
         self.cross_node = self.config.get('cross_node',10)
@@ -134,13 +152,19 @@ class NodeConfig():
         self.indices_path = os.path.join(self.info, 'indices.json')
         self.state_path = os.path.join(self.info, 'state.json')
         self.document_hash_path = os.path.join(self.info, 'document_hash.json')
+        self.file_manifest_path = os.path.join(self.info, 'file_manifest.json')
         self.info_path = os.path.join(self.info, 'info.log')
+        self.search_log_path = os.path.join(self.info, 'search.log')
+        self.metrics_path = os.path.join(self.info, 'build_metrics.json')
+        # Prometheus text exposition, e.g. for the node_exporter textfile collector
+        self.metrics_prometheus_path = os.path.join(self.info, 'build_metrics.prom') if self.config.get('metrics_prometheus',False) else None
         if not os.path.exists(self.info):
             os.makedirs(self.info)
         if not os.path.exists(self.info_path):
             with open(self.info_path,'w') as f:
                 f.write('')
         self.info_logger = setup_logger('info_logger',self.info_path)
+        self.metrics = set_metrics(BuildMetrics(self.user_id,self.metrics_path,self.metrics_prometheus_path))
         self.timer = []
         self.tracker = Tracker(self.cache,use_rich=True)
         self.rich_console = rich_console()
@@ -153,19 +177,28 @@ class NodeConfig():
         self._embedding_config = config['embedding_config']
         self._language = self.config['language']
         
+        # responses of identical LLM/embedding requests are reused across builds
+        if self.config.get('llm_cache',True):
+            self.response_cache = ResponseCache(self.llm_cache_path,self.config.get('llm_cache_size_mb',1024))
+        else:
+            self.response_cache = None
+        # search clients are built apart from the build ones, so queries skip the cache unless search_llm_cache is set
+        self._search_API_client = None
+        self._search_embedding_client = None
+        
         try:
-            self.API_client = set_api_client(API_client(self.model_config))
+            self.API_client = set_api_client(API_client(self.model_config,self.response_cache))
         except:
             self.API_client = None
         
         try:
-            self.embedding_client = set_embedding_client(API_client(self.embedding_config))
+            self.embedding_client = set_embedding_client(API_client(self.embedding_config,self.response_cache))
         except:
             self.embedding_client = None
             
         try:
 
-            self.embedding_client = set_embedding_client(API_client(self.embedding_config))
+            self.embedding_client = set_embedding_client(API_client(self.embedding_config,self.response_cache))
         except:
             self.embedding_client = None
 
@@ -181,6 +214,22 @@ class NodeConfig():
 
 
 
+    @property
+    def search_API_client(self):
+        if self.config.get('search_llm_cache',False):
+            return self.API_client
+        if self._search_API_client is None:
+            self._search_API_client = API_client(self.model_config)
+        return self._search_API_client
+    
+    @property
+    def search_embedding_client(self):
+        if self.config.get('search_llm_cache',False):
+            return self.embedding_client
+        if self._search_embedding_client is None:
+            self._search_embedding_client = API_client(self.embedding_config)
+        return self._search_embedding_client
+
     @property
     def model_config(self):
         return self._model_config
@@ -192,8 +241,9 @@ class NodeConfig():
     @embedding_config.setter
     def embedding_config(self,embedding_config:dict):
         self._embedding_config = embedding_config
+        self._search_embedding_client = None
         try:
-            self.embedding_client = set_embedding_client(API_client(self.embedding_config))
+            self.embedding_client = set_embedding_client(API_client(self.embedding_config,self.response_cache))
         except:
             self.embedding_client = None
             self.console.print(f'warning: embedding_config is not valid')
@@ -202,8 +252,9 @@ class NodeConfig():
     @model_config.setter
     def model_config(self,model_config:dict):
         self._model_config = model_config
+        self._search_API_client = None
         try:
-            self.API_client = set_api_client(API_client(self.model_config))
+            self.API_client = set_api_client(API_client(self.model_config,self.response_cache))
             self.semantic_text_splitter = SemanticTextSplitter(self.config['chunk_size'],self.model_config['model_name'])
             self.token_counter = self.semantic_text_splitter.token_counter
         except:
@@ -286,6 +337,9 @@ class NodeConfig():
         
         else:
             self.record_info('No time record')
+            
+        if self.response_cache is not None:
+            self.record_info(f'LLM cache: {self.response_cache.stats()}')
         
     def record_message_with_time(self,message:str):
         
@@ -1,4 +1,5 @@
 from .logger import setup_logger
 from .info_timer import info_timer
+from .metrics import BuildMetrics, get_metrics, set_metrics
 
-__all__ = ['setup_logger','info_timer']  
+__all__ = ['setup_logger','info_timer','BuildMetrics','get_metrics','set_metrics']  
@@ -5,13 +5,28 @@ import os
 
 error_logger = setup_logger(__name__,os.path.join(os.getcwd(),'error.log'))
 
+
+class ErrorMessage(str):
+    '''Error text returned in place of a response, still a plain str for existing callers'''
+    
+    
+class ThrottleError(Exception):
+    '''Raised when the provider throttles a request, so the caller can slow down all requests together'''
+    
+    def __init__(self, message:str, retry_after:float|None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 def error_handler(func): 
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
+        except ThrottleError:
+            raise
         except Exception as e:
-            return str(e)
+            return ErrorMessage(e)
     return wrapper
         
 def error_handler_async(func): 
@@ -19,8 +34,10 @@ def error_handler_async(func):
     async def wrapper(*args, **kwargs):
         try:
             return await func(*args, **kwargs)
+        except ThrottleError:
+            raise
         except Exception as e:
-            return str(e)
+            return ErrorMessage(e)
     return wrapper
 
 def cache_error(func): 
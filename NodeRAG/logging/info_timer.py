@@ -1,11 +1,21 @@
 from functools import wraps
 
+from .metrics import get_metrics
+
 def info_timer(message:str):
     def decorator(func):
         @wraps(func)
         async def wrapper(self,*args,**kwargs):
+            metrics = get_metrics()
             self.config.start_timer(f'{message} Started')
-            result = await func(self,*args,**kwargs)
+            metrics.start_stage(message)
+            status = 'error'
+            try:
+                result = await func(self,*args,**kwargs)
+                status = 'ok'
+            finally:
+                metrics.end_stage(status)
+                metrics.export()
             self.config.record_message_with_time(f'{message} Finished')
             return result
         return wrapper
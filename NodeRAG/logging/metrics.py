@@ -0,0 +1,191 @@
+import json
+import os
+import platform
+import threading
+import time
+from typing import Dict
+
+try:
+    import resource
+except ImportError:
+    # Unix only; memory figures are left empty on Windows
+    resource = None
+
+
+def current_rss() -> int | None:
+    '''Resident set size of this process in bytes, None where it cannot be read'''
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> int | None:
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+def to_mb(size: int | None) -> float | None:
+    return None if size is None else size / 2**20
+
+
+class BuildMetrics():
+
+    def __init__(self,
+                 user_id: str | None = None,
+                 json_path: str | None = None,
+                 prometheus_path: str | None = None) -> None:
+        """
+        Counters of a build, attributed to the pipeline stage running when they are recorded.
+
+        Stages are opened and closed by info_timer; the tracker, API_client and storage record into
+        whichever stage is current. Metrics are written after every stage, so an interrupted build
+        still leaves the stages it finished.
+
+        Args:
+            user_id (str | None): Label of the per-user build.
+            json_path (str | None): JSON export path.
+            prometheus_path (str | None): Prometheus text exposition export path, disabled when None.
+        """
+        self.user_id = user_id
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.stages = {}
+        self.stage = None
+        self.started = None
+        self.peak_at_start = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage: str | None = None) -> Dict:
+
+        return self.stages.setdefault(stage or self.stage or 'other', {'runs': 0,
+                                                                       'seconds': 0.0,
+                                                                       'items': 0,
+                                                                       'llm_requests': 0,
+                                                                       'retries': 0,
+                                                                       'throttled': 0,
+                                                                       'errors': 0,
+                                                                       'cache_hits': 0,
+                                                                       'prompt_tokens': 0,
+                                                                       'completion_tokens': 0,
+                                                                       'embedding_tokens': 0,
+                                                                       'bytes_read': {},
+                                                                       'bytes_written': {}})
+
+    def start_stage(self, stage: str) -> None:
+
+        with self._lock:
+            self.stage = stage
+            self.started = time.perf_counter()
+            self.peak_at_start = peak_rss()
+            record = self.record()
+            record['runs'] += 1
+            # pipelines load their inputs in the constructor, just before the stage opens
+            for name, value in self.stages.pop('other', {}).items():
+                if isinstance(value, dict):
+                    for artifact, size in value.items():
+                        record[name][artifact] = record[name].get(artifact, 0) + size
+                else:
+                    record[name] = record.get(name, 0) + value
+
+    def end_stage(self, status: str = 'ok') -> None:
+
+        with self._lock:
+            if self.stage is None:
+                return
+            record = self.record()
+            record['seconds'] += time.perf_counter() - self.started
+            record['status'] = status
+            record['rss_mb'] = to_mb(current_rss())
+            peak = peak_rss()
+            record['peak_rss_mb'] = to_mb(peak)
+            # the process high-water mark only grows, its growth shows which stage set the peak
+            record['peak_rss_growth_mb'] = None if peak is None else to_mb(peak - self.peak_at_start)
+            self.stage = None
+
+    def count(self, name: str, value: int | float = 1) -> None:
+
+        with self._lock:
+            record = self.record()
+            record[name] = record.get(name, 0) + value
+
+    def io(self, direction: str, path: str, size: int | None = None) -> None:
+        '''Record bytes read or written for an artifact, direction is "read" or "written"'''
+
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+        artifact = os.path.basename(path)
+        with self._lock:
+            artifacts = self.record()[f'bytes_{direction}']
+            artifacts[artifact] = artifacts.get(artifact, 0) + size
+
+    def totals(self) -> Dict:
+
+        totals = {}
+        for record in self.stages.values():
+            for name, value in record.items():
+                if isinstance(value, dict):
+                    totals[name] = totals.get(name, 0) + sum(value.values())
+                elif isinstance(value, (int, float)) and not name.endswith('_mb'):
+                    totals[name] = totals.get(name, 0) + value
+        totals['peak_rss_mb'] = to_mb(peak_rss())
+        return totals
+
+    def to_dict(self) -> Dict:
+
+        with self._lock:
+            return {'user_id': self.user_id,
+                    'updated_at': time.time(),
+                    'stages': json.loads(json.dumps(self.stages)),
+                    'totals': self.totals()}
+
+    def to_prometheus(self) -> str:
+
+        metrics = self.to_dict()
+        user = '' if self.user_id is None else str(self.user_id)
+        lines = []
+        samples = {}
+        for stage, record in metrics['stages'].items():
+            labels = f'stage="{stage}",user="{user}"'
+            for name, value in record.items():
+                if isinstance(value, dict):
+                    for artifact, size in value.items():
+                        samples.setdefault(name, []).append((f'{labels},artifact="{artifact}"', size))
+                elif isinstance(value, (int, float)):
+                    samples.setdefault(name, []).append((labels, value))
+        for name, values in samples.items():
+            metric = f'noderag_build_{name}'
+            lines.append(f'# TYPE {metric} gauge')
+            lines.extend(f'{metric}{{{labels}}} {value}' for labels, value in values)
+        return '\n'.join(lines) + '\n'
+
+    def export(self) -> None:
+
+        if self.json_path is not None:
+            with open(self.json_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        if self.prometheus_path is not None:
+            with open(self.prometheus_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+
+
+_metrics = BuildMetrics()
+
+
+def get_metrics() -> BuildMetrics:
+    return _metrics
+
+
+def set_metrics(metrics: BuildMetrics) -> BuildMetrics:
+    global _metrics
+    _metrics = metrics
+    return _metrics
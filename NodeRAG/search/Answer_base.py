@@ -1,4 +1,8 @@
+import time
+from contextlib import contextmanager
+
 from ..config import NodeConfig
+from ..LLM.usage import empty_usage
 
 class Retrieval():
     
@@ -18,6 +22,9 @@ class Retrieval():
         self._structured_prompt = None
         self._unstructured_prompt = None
         self.qa_results = []  # Phase 2: Q&A search results
+        self.timings = {}  # seconds spent per search stage
+        self.ppr_stats = {}  # PPR iterations and final residual
+        self.usage = empty_usage()  # LLM/embedding requests and tokens of this search
         
         
         
@@ -76,6 +83,21 @@ class Retrieval():
             prompt += '\n\n'
         return prompt
     
+    @contextmanager
+    def span(self,name:str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name,0.0) + time.perf_counter() - started
+            
+    @property
+    def timing_info(self)->dict:
+        return {'spans_ms':{name:seconds*1000 for name,seconds in self.timings.items()},
+                'total_ms':sum(self.timings.values())*1000,
+                'ppr_iterations':self.ppr_stats.get('iterations'),
+                'ppr_residual':self.ppr_stats.get('residual')}
+    
     def __str__(self):
         return self.retrieval_info
     
@@ -100,6 +122,14 @@ class Answer():
     def unstructured_prompt(self):
         return self.retrieval.unstructured_prompt
     
+    @property
+    def timings(self):
+        return self.retrieval.timing_info
+    
+    @property
+    def usage(self):
+        return self.retrieval.usage
+    
     @property
     def retrieval_tokens(self):
         return self.retrieval.config.token_counter(self.retrieval_info)
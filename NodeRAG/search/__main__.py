@@ -31,19 +31,41 @@ app = Flask(__name__)
 def answer():
     question = request.json['question']
     answer = Search_engine.answer(question)
-    return jsonify({'answer':answer.response})
+    response = {'answer':answer.response}
+    # per-stage latency breakdown, only when the client asks for it
+    if request.json.get('timings'):
+        response['timings'] = answer.timings
+    if request.json.get('usage'):
+        response['usage'] = answer.usage
+    return jsonify(response)
 
 @app.route('/answer_retrieval', methods=['POST'])
 def answer_retrieval():
     question = request.json['question']
     answer = Search_engine.answer(question)
-    return jsonify({'answer':answer.response, 'retrieval':answer.retrieval_info})
+    response = {'answer':answer.response, 'retrieval':answer.retrieval_info}
+    # per-stage latency breakdown, only when the client asks for it
+    if request.json.get('timings'):
+        response['timings'] = answer.timings
+    if request.json.get('usage'):
+        response['usage'] = answer.usage
+    return jsonify(response)
 
 @app.route('/retrieval', methods=['POST'])
 def search():
     question = request.json['question']
     retrieval = Search_engine.search(question)
-    return jsonify({'retrieval':retrieval.retrieval_info})
+    response = {'retrieval':retrieval.retrieval_info}
+    if request.json.get('timings'):
+        response['timings'] = retrieval.timing_info
+    if request.json.get('usage'):
+        response['usage'] = retrieval.usage
+    return jsonify(response)
+
+@app.route('/usage', methods=['GET'])
+def usage():
+    # requests and tokens of every search served by this process
+    return jsonify({'user_id':Search_engine.config.user_id,'usage':Search_engine.usage})
 
 if __name__ == '__main__':
     app.run(host=url, port=port,debug=False,threaded=True)
@@ -1,16 +1,22 @@
 import os
-from typing import Dict,List,Tuple,Optional
+from typing import Dict,List,Optional
 import numpy as np
 import re
+import json
+import logging
+import traceback
 import hnswlib_noderag
 
 
 from ..storage import Mapper
 from ..utils import HNSW
-from ..storage import storage
-from ..utils.graph_operator import GraphConcat
+from ..storage import storage,GraphStore,IdDictionary
+from ..utils.search_graph import SearchGraphStore
 from ..config import NodeConfig
 from ..utils.PPR import sparse_PPR
+from ..utils.compact_graph import CompactGraph
+from ..logging import setup_logger
+from ..LLM.usage import track_usage,empty_usage
 from .Answer_base import Answer,Retrieval
 
 
@@ -22,16 +28,22 @@ class NodeSearch():
         
 
         self.config = config
+        self.logger = setup_logger('search_logger',self.config.search_log_path)
+        self.usage = empty_usage()  # requests and tokens of all searches served for this user
         self.hnsw = self.load_hnsw()
         self.mapper = self.load_mapper()
         self.G = self.load_graph()
-        self.id_to_type = {id:self.G.nodes[id].get('type') for id in self.G.nodes}
+        self.compact = self.load_search_graph()
+        self.sparse_PPR = sparse_PPR(self.compact)
+        # dense int32 codes of the graph nodes; PPR and ranking work on codes, hex ids only leave through search_list
+        self.node_ids = self.compact.ids
+        self.intern_ids()
+        self.id_to_type = self.compact.node_types()
         self.id_to_text,self.accurate_id_to_text = self.mapper.generate_id_to_text(['entity','high_level_element_title'])
         
         # Note: Q&A nodes (question and answer) are now included in the mapper via questions.parquet and answers.parquet
         # No need for workaround - they're loaded automatically through load_mapper()
         
-        self.sparse_PPR = sparse_PPR(self.G)
         self._semantic_units = None
         # Load Question HNSW index if available (Phase 2)
         self.question_hnsw = None
@@ -39,6 +51,19 @@ class NodeSearch():
         self._load_question_hnsw_index()
             
         
+    def log(self,event:str,level:int=logging.DEBUG,**fields) -> None:
+        
+        # one JSON object per line, so search logs can be parsed and aggregated
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level,json.dumps({'event':event,**fields},default=str,ensure_ascii=False))
+        
+    def intern_ids(self) -> None:
+        
+        # the mapper and the HNSW node id dictionary were read from parquet with their own copies of every hex id
+        canonical = self.node_ids.canonical
+        self.mapper.mapping = {canonical(id):location for id,location in self.mapper.mapping.items()}
+        self.hnsw.node_ids = IdDictionary(map(canonical,self.hnsw.node_ids))
+        
     def load_mapper(self) -> Mapper:
         
         mapping_list = [self.config.semantic_units_path,
@@ -95,11 +120,10 @@ class NodeSearch():
                 
                 # Load Question id_map
                 id_map_data = storage.load(self.config.question_id_map_path)
-                self.question_id_map = dict(zip(id_map_data['id'], id_map_data['node']))  # Maps HNSW id -> node hash_id
+                self.question_id_map = dict(zip(id_map_data['id'], map(self.node_ids.canonical, id_map_data['node'])))  # Maps HNSW id -> node hash_id
             except Exception as e:
                 # If loading fails, disable Q&A search (don't break regular search)
-                import sys
-                print(f"[WARNING] Failed to load Question HNSW index: {e}", file=sys.stderr)
+                self.log('question_hnsw_load_failed',level=logging.WARNING,error=str(e))
                 self.question_hnsw = None
                 self.question_id_map = {}
         else:
@@ -110,39 +134,43 @@ class NodeSearch():
     def load_graph(self):
         
         if os.path.exists(self.config.base_graph_path):
-            G = storage.load(self.config.base_graph_path)
+            return GraphStore(self.config.base_graph_path).load(track=False)
         else:
             raise Exception('No base graph found.')
+    
+    def load_search_graph(self) -> CompactGraph:
         
-        if os.path.exists(self.config.hnsw_graph_path):
-            HNSW_graph = storage.load(self.config.hnsw_graph_path)
-        else:
+        # base graph plus HNSW edges, node attributes and Q&A edges are read from self.G
+        if not os.path.exists(self.config.hnsw_graph_path):
             raise Exception('No HNSW graph found.')
         
+        compact = SearchGraphStore(self.config).load(self.G)
         if self.config.unbalance_adjust:
-                G = GraphConcat(G).concat(HNSW_graph)
-                return GraphConcat.unbalance_adjust(G)
+            compact.unbalance_adjust()
+        return compact
             
-        return GraphConcat(G).concat(HNSW_graph)
-        
-    
+
     def search(self,query:str):
         
         retrieval = Retrieval(self.config,self.id_to_text,self.accurate_id_to_text,self.id_to_type)
         
 
         # HNSW search for enter points by cosine similarity
-        query_embedding = np.array(self.config.embedding_client.request(query),dtype=np.float32)
-        HNSW_results = self.hnsw.search(query_embedding,HNSW_results=self.config.HNSW_results)
-        retrieval.HNSW_results_with_distance = HNSW_results
+        with retrieval.span('query_embedding'),track_usage(retrieval.usage,self.usage):
+            query_embedding = np.array(self.config.search_embedding_client.request(query),dtype=np.float32)
+        with retrieval.span('hnsw_search'):
+            HNSW_results = self.hnsw.search(query_embedding,HNSW_results=self.config.HNSW_results)
+            retrieval.HNSW_results_with_distance = HNSW_results
         
         
         
         # Decompose query into entities and accurate search for short words level items.
-        decomposed_entities = self.decompose_query(query)
+        with retrieval.span('decompose_query'),track_usage(retrieval.usage,self.usage):
+            decomposed_entities = self.decompose_query(query)
         
-        accurate_results = self.accurate_search(decomposed_entities)
-        retrieval.accurate_results = accurate_results
+        with retrieval.span('accurate_search'):
+            accurate_results = self.accurate_search(decomposed_entities)
+            retrieval.accurate_results = accurate_results
         
         # Personlization for graph search
         personlization = {ids:self.config.similarity_weight for ids in retrieval.HNSW_results}
@@ -150,11 +178,9 @@ class NodeSearch():
         
         # Phase 2: Q&A semantic search (if Question HNSW index exists)
         if self.question_hnsw is not None and len(self.question_id_map) > 0:
-            print(f"[DEBUG Q&A Search] Starting Q&A search with query_embedding shape: {query_embedding.shape}")
-            qa_top_k = getattr(self.config, 'qa_top_k', 3)  # Get configurable top_k (default: 3)
-            print(f"[DEBUG Q&A Search] Using top_k={qa_top_k} (configurable)")
-            qa_results = self._search_qa_pairs(query_embedding, top_k=qa_top_k)
-            print(f"[DEBUG Q&A Search] _search_qa_pairs returned {len(qa_results)} results")
+            with retrieval.span('qa_search'):
+                qa_top_k = getattr(self.config, 'qa_top_k', 3)  # Get configurable top_k (default: 3)
+                qa_results = self._search_qa_pairs(query_embedding, top_k=qa_top_k)
             
             # Boost Q&A nodes in PageRank personalization (only if similarity >= threshold)
             qa_similarity_threshold = getattr(self.config, 'qa_similarity_threshold', 0.6)
@@ -174,18 +200,27 @@ class NodeSearch():
                     if answer_hash_id:
                         personlization[answer_hash_id] = personlization.get(answer_hash_id, 0) + boost
                     boosted_count += 1
-                else:
-                    print(f"[DEBUG Q&A Search] Skipping boost for Q&A pair (similarity {similarity:.3f} < threshold {qa_similarity_threshold:.3f})")
             
-            print(f"[DEBUG Q&A Search] Boosted {boosted_count}/{len(qa_results)} Q&A pairs (threshold: {qa_similarity_threshold:.3f})")
+            self.log('qa_boost',boosted=boosted_count,results=len(qa_results),threshold=qa_similarity_threshold)
             
             # Store Q&A results in retrieval for potential use in answer generation
             retrieval.qa_results = qa_results
-            print(f"[DEBUG Q&A Search] Stored {len(qa_results)} Q&A results in retrieval")
         
-        weighted_nodes = self.graph_search(personlization)
-        
-        retrieval = self.post_process_top_k(weighted_nodes,retrieval)
+        with retrieval.span('ppr'):
+            weighted_nodes = self.graph_search(personlization,retrieval.ppr_stats)
+        
+        with retrieval.span('post_process'):
+            retrieval = self.post_process_top_k(weighted_nodes,retrieval)
+        
+        self.log('search',
+                 level=logging.INFO,
+                 hnsw_results=len(retrieval.HNSW_results),
+                 accurate_results=len(retrieval.accurate_results),
+                 qa_results=len(retrieval.qa_results),
+                 search_list=len(retrieval.search_list),
+                 user_id=self.config.user_id,
+                 usage=retrieval.usage,
+                 timings=retrieval.timing_info)
 
         return retrieval
 
@@ -197,7 +232,7 @@ class NodeSearch():
             List of entity strings extracted from the query
         """
         query = self.config.prompt_manager.decompose_query.format(query=query)
-        response = self.config.API_client.request({'query':query,'response_format':self.config.prompt_manager.decomposed_text_json})
+        response = self.config.search_API_client.request({'query':query,'response_format':self.config.prompt_manager.decomposed_text_json})
         
         # Handle case where LLM returns a string instead of dict (error or format issue)
         if isinstance(response, str):
@@ -207,8 +242,7 @@ class NodeSearch():
                 response = json.loads(response)
             except json.JSONDecodeError:
                 # If parsing fails, log warning and return empty list
-                print(f"[WARNING] decompose_query received string response instead of JSON: {response[:100]}...")
-                print(f"[WARNING] Returning empty entities list. Query decomposition failed.")
+                self.log('decompose_query_failed',level=logging.WARNING,reason='string response',response=response[:100])
                 return []
         
         # Ensure response is a dict and has 'elements' key
@@ -216,9 +250,7 @@ class NodeSearch():
             return response['elements']
         else:
             # Handle unexpected response format
-            print(f"[WARNING] decompose_query received unexpected response format: {type(response)}")
-            print(f"[WARNING] Response content: {str(response)[:200]}...")
-            print(f"[WARNING] Returning empty entities list.")
+            self.log('decompose_query_failed',level=logging.WARNING,reason='unexpected format',response=str(response)[:200])
             return []
     
     
@@ -236,6 +268,36 @@ class NodeSearch():
         return accurate_results
     
     
+    def answer_prompt(self,ans:Answer,id_type:bool=True,job_context:str=None) -> str:
+        
+        retrieval = ans.retrieval
+        
+        with retrieval.span('prompt_assembly'):
+            if id_type:
+                retrieved_info = ans.structured_prompt
+            else:
+                retrieved_info = ans.unstructured_prompt
+            
+            # Format Q&A history from retrieval.qa_results for style consistency
+            qa_history = ""
+            if hasattr(retrieval, 'qa_results') and retrieval.qa_results:
+                qa_history_parts = []
+                for qa_pair in retrieval.qa_results[:3]:  # Use top 3 Q&A pairs for style reference
+                    question = qa_pair.get('question', '')
+                    answer = qa_pair.get('answer', '')  # Get answer text from qa_pair
+                    if question and answer:
+                        qa_history_parts.append(f"Q: {question}\nA: {answer}\n")
+                if qa_history_parts:
+                    qa_history = "\n".join(qa_history_parts)
+            
+            # Format prompt with all context sections
+            return self.config.prompt_manager.answer.format(
+                info=retrieved_info,
+                query=ans.query,
+                job_context=job_context or "",
+                qa_history=qa_history or "No previous answers available."
+            )
+    
     def answer(self,query:str,id_type:bool=True,job_context:str=None):
         """
         Generate answer for a query with optional job context
@@ -249,31 +311,9 @@ class NodeSearch():
         
         ans = Answer(query,retrieval)
         
-        if id_type:
-            retrieved_info = ans.structured_prompt
-        else:
-            retrieved_info = ans.unstructured_prompt
-        
-        # Format Q&A history from retrieval.qa_results for style consistency
-        qa_history = ""
-        if hasattr(retrieval, 'qa_results') and retrieval.qa_results:
-            qa_history_parts = []
-            for qa_pair in retrieval.qa_results[:3]:  # Use top 3 Q&A pairs for style reference
-                question = qa_pair.get('question', '')
-                answer = qa_pair.get('answer', '')  # Get answer text from qa_pair
-                if question and answer:
-                    qa_history_parts.append(f"Q: {question}\nA: {answer}\n")
-            if qa_history_parts:
-                qa_history = "\n".join(qa_history_parts)
-        
-        # Format prompt with all context sections
-        query = self.config.prompt_manager.answer.format(
-            info=retrieved_info,
-            query=query,
-            job_context=job_context or "",
-            qa_history=qa_history or "No previous answers available."
-        )
-        ans.response = self.config.API_client.request({'query':query})
+        prompt = self.answer_prompt(ans,id_type,job_context)
+        with retrieval.span('answer_generation'),track_usage(retrieval.usage,self.usage):
+            ans.response = self.config.search_API_client.request({'query':prompt})
         
         return ans
     
@@ -292,32 +332,9 @@ class NodeSearch():
         
         ans = Answer(query,retrieval)
         
-        if id_type:
-            retrieved_info = ans.structured_prompt
-        else:
-            retrieved_info = ans.unstructured_prompt
-
-        # Format Q&A history from retrieval.qa_results for style consistency
-        qa_history = ""
-        if hasattr(retrieval, 'qa_results') and retrieval.qa_results:
-            qa_history_parts = []
-            for qa_pair in retrieval.qa_results[:3]:  # Use top 3 Q&A pairs for style reference
-                question = qa_pair.get('question', '')
-                answer = qa_pair.get('answer', '')  # Get answer text from qa_pair
-                if question and answer:
-                    qa_history_parts.append(f"Q: {question}\nA: {answer}\n")
-            if qa_history_parts:
-                qa_history = "\n".join(qa_history_parts)
-        
-        # Format prompt with all context sections
-        query = self.config.prompt_manager.answer.format(
-            info=retrieved_info,
-            query=query,
-            job_context=job_context or "",
-            qa_history=qa_history or "No previous answers available."
-        )
-        
-        ans.response = await self.config.API_client({'query':query})
+        prompt = self.answer_prompt(ans,id_type,job_context)
+        with retrieval.span('answer_generation'),track_usage(retrieval.usage,self.usage):
+            ans.response = await self.config.search_API_client({'query':prompt})
         
         return ans
         
@@ -325,30 +342,33 @@ class NodeSearch():
     def stream_answer(self,query:str,retrieved_info:str):
         
         query = self.config.prompt_manager.answer.format(info=retrieved_info,query=query)
-        response = self.config.API_client.stream_chat({'query':query})
+        response = self.config.search_API_client.stream_chat({'query':query})
         yield from response
 
 
-    def graph_search(self,personlization:Dict[str,float])->List[Tuple[str,str]]|List[str]:
-        
-        page_rank_scores = self.sparse_PPR.PPR(personlization,alpha=self.config.ppr_alpha,max_iter=self.config.ppr_max_iter)
+    def graph_search(self,personlization:Dict[str,float],stats:Dict|None=None)->np.ndarray:
         
+        page_rank_scores = self.sparse_PPR.PPR_scores(personlization,alpha=self.config.ppr_alpha,max_iter=self.config.ppr_max_iter,stats=stats)
         
-        return [id for id,score in page_rank_scores]
+        # node codes by score, translated to ids only for the nodes post_process_top_k looks at
+        return self.sparse_PPR.rank(page_rank_scores)
         
     
-    def post_process_top_k(self,weighted_nodes:List[str],retrieval:Retrieval)->Retrieval:
+    def post_process_top_k(self,weighted_nodes:np.ndarray,retrieval:Retrieval)->Retrieval:
         
         
         entity_list = []
         high_level_element_title_list = []
         relationship_list = []
+        types = self.compact.types
+        type_names = self.compact.type_names
     
         addition_node = 0
         
-        for node in weighted_nodes:
-            if node not in retrieval.search_list:
-                type = self.G.nodes[node].get('type')
+        for code in weighted_nodes:
+            node = self.node_ids[code]
+            if node not in retrieval.unique_search_list:
+                type = type_names[types[code]]
                 match type:
                     case 'entity':
                         if node not in entity_list and len(entity_list) < self.config.Enode:
@@ -424,32 +444,27 @@ class NodeSearch():
             List of Q&A pairs with similarity scores
         """
         if self.question_hnsw is None or len(self.question_id_map) == 0:
-            print(f"[DEBUG Q&A Search] HNSW index or id_map is empty: hnsw={self.question_hnsw is not None}, id_map_size={len(self.question_id_map)}")
             return []
         
         try:
             # Search Question HNSW index
             k = min(top_k, len(self.question_id_map))
-            print(f"[DEBUG Q&A Search] Searching with k={k}, query_embedding shape={query_embedding.shape}")
             labels, distances = self.question_hnsw.knn_query(query_embedding, k=k)
-            print(f"[DEBUG Q&A Search] HNSW returned {len(labels[0])} labels, {len(distances[0])} distances")
             
             results = []
             for idx, (label, distance) in enumerate(zip(labels[0], distances[0])):
                 question_hash_id = self.question_id_map.get(label)
-                print(f"[DEBUG Q&A Search] Result {idx+1}: label={label}, distance={distance:.4f}, question_hash_id={question_hash_id}")
                 
                 if not question_hash_id:
-                    print(f"[DEBUG Q&A Search]   -> Skipping: no hash_id found for label {label}")
+                    self.log('qa_search_skip',reason='unknown label',label=label)
                     continue
                     
                 if question_hash_id not in self.G.nodes():
-                    print(f"[DEBUG Q&A Search]   -> Skipping: question node {question_hash_id} not in graph")
+                    self.log('qa_search_skip',reason='question not in graph',question=question_hash_id)
                     continue
                 
                 question_node = self.G.nodes[question_hash_id]
                 question_text = question_node.get('text', '')
-                print(f"[DEBUG Q&A Search]   -> Found question: '{question_text[:50]}...'")
                 
                 # Get answer node (connected via 'has_answer' edge)
                 # Note: Graph is undirected (nx.Graph), so use neighbors() instead of successors()
@@ -474,11 +489,10 @@ class NodeSearch():
                             answer_hash_id = neighbor
                             answer_node = self.G.nodes[neighbor]
                             answer_text = answer_node.get('text', '')
-                            print(f"[DEBUG Q&A Search]   -> Found answer: '{answer_text[:50]}...'")
                             break
                 
                 if answer_hash_id is None:
-                    print(f"[DEBUG Q&A Search]   -> Warning: No answer node found for question {question_hash_id}")
+                    self.log('qa_search_no_answer',level=logging.WARNING,question=question_hash_id)
                 
                 similarity = 1.0 - distance  # Convert distance to similarity (cosine distance)
                 
@@ -495,14 +509,12 @@ class NodeSearch():
                     'question_id': question_node.get('question_id')
                 })
             
-            print(f"[DEBUG Q&A Search] Returning {len(results)} Q&A pairs")
+            self.log('qa_search',k=k,results=len(results),distances=[float(d) for d in distances[0]])
             return results
             
         except Exception as e:
             # If search fails, return empty list (don't break regular search)
-            import traceback
-            print(f"[DEBUG Q&A Search] EXCEPTION in _search_qa_pairs: {e}")
-            print(f"[DEBUG Q&A Search] Traceback: {traceback.format_exc()}")
+            self.log('qa_search_failed',level=logging.ERROR,error=str(e),traceback=traceback.format_exc())
             return []
     
     
\ No newline at end of file
@@ -1,5 +1,9 @@
 from .genid import genid
 from .storage import storage
 from .graph_mapping import Mapper
+from .graph_store import GraphStore,TrackedGraph
+from .id_dictionary import IdDictionary
+from .parquet_writer import ParquetRowWriter
+from .file_manifest import FileManifest
 
-__all__ = ['genid','storage','Mapper']
\ No newline at end of file
+__all__ = ['genid','storage','Mapper','GraphStore','TrackedGraph','IdDictionary','ParquetRowWriter','FileManifest']
\ No newline at end of file
@@ -0,0 +1,69 @@
+import json
+import os
+from hashlib import sha256
+from typing import Dict, List
+
+from ..logging.metrics import get_metrics
+
+
+class FileManifest():
+
+    def __init__(self, path: str) -> None:
+        """
+        Size, mtime and content hash of every input file of the last build.
+
+        `scan()` compares the current input files against it. A file whose size and mtime are unchanged
+        is not read; otherwise its content is hashed, so a file that was only touched still counts as
+        unchanged. The manifest is saved by the document stage once the changed files are stored, so an
+        interrupted build sees the same changes again; when nothing changed, the INIT stage saves it.
+
+        Args:
+            path (str): JSON file the manifest is kept in, config.file_manifest_path.
+        """
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+            get_metrics().io('read', path)
+
+    @staticmethod
+    def content_hash(path: str, block_size: int = 1 << 20) -> str:
+
+        digest = sha256()
+        with open(path, 'rb') as f:
+            while block := f.read(block_size):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def scan(self, paths: List[str]) -> Dict[str, List[str] | Dict[str, Dict]]:
+        '''Classify paths as unchanged, new or modified, and manifest paths missing from them as deleted;
+        `entries` holds the manifest describing paths'''
+
+        changes = {'unchanged': [], 'new': [], 'modified': [], 'deleted': [], 'entries': {}}
+        for path in paths:
+            stat = os.stat(path)
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            previous = self.entries.get(path)
+            if previous is not None and previous['size'] == entry['size'] and previous['mtime_ns'] == entry['mtime_ns']:
+                entry['hash'] = previous['hash']
+                changes['unchanged'].append(path)
+            else:
+                entry['hash'] = self.content_hash(path)
+                if previous is None:
+                    changes['new'].append(path)
+                elif previous['hash'] == entry['hash']:
+                    changes['unchanged'].append(path)
+                else:
+                    changes['modified'].append(path)
+            changes['entries'][path] = entry
+        current = set(paths)
+        changes['deleted'] = [path for path in self.entries if path not in current]
+        return changes
+
+    def save(self, entries: Dict[str, Dict]) -> None:
+
+        self.entries = entries
+        with open(self.path, 'w') as f:
+            json.dump(entries, f)
+        get_metrics().io('written', self.path)
@@ -11,6 +11,7 @@ class Mapper():
         self.mapping = dict()
         self.datasources = self.load_datasource()
         self.embeddings = {}
+        self.token_counts = {}
 
     def load_datasource(self) -> None:
         
@@ -28,8 +29,8 @@ class Mapper():
     
     def generate_mapping(self,datasource:pd.DataFrame,datasource_id:int) -> None:
         
-        for index,row in datasource.iterrows():
-            self.mapping[row['hash_id']] = [datasource_id,index]
+        for index,hash_id in zip(datasource.index,datasource['hash_id']):
+            self.mapping[hash_id] = [datasource_id,index]
                 
     def add_datasource(self,path:str) -> None:
         
@@ -68,6 +69,20 @@ class Mapper():
         else:
             return self.datasources[datasource_id].iloc[index].to_dict()
     
+    def get_tokens(self,hash_id:str,token_counter) -> int:
+        '''Token count of the context, from the stored tokens column or counted once for caches built without it'''
+        
+        tokens = self.token_counts.get(hash_id)
+        if tokens is None:
+            datasource_id,index = self.mapping[hash_id]
+            datasource = self.datasources[datasource_id]
+            if 'tokens' in datasource.columns and not pd.isna(datasource.loc[index,'tokens']):
+                tokens = int(datasource.loc[index,'tokens'])
+            else:
+                tokens = token_counter(datasource.loc[index,'context'])
+            self.token_counts[hash_id] = tokens
+        return tokens
+    
     def add_attribute(self,hash_id:str,column:str,value:Any) -> None:
         
         datasource_id,index = self.mapping[hash_id]
@@ -116,7 +131,8 @@ class Mapper():
         for i,datasource in enumerate(self.datasources):
             if 'embedding' in datasource.columns:
                 for index,row in datasource.iterrows():
-                    if row['embedding'] is None:
+                    # rows appended to a file whose embedding column is already 'done' read back as NaN, not None
+                    if row['embedding'] is None or (isinstance(row['embedding'],float) and np.isnan(row['embedding'])):
                         none_embedding_ids.append(row['hash_id'])
         
         return none_embedding_ids
@@ -127,10 +143,15 @@ class Mapper():
         self.accurate_id_to_text= {}
         self.relationships = []
 
-        for id in self.mapping:
-            self.id_to_text[id] = self.get(id,'context')
-            if self.get(id,'type') in types:
-                self.accurate_id_to_text[id] = self.get(id,'context')
+        # column lookups per datasource instead of a .loc access per id and column
+        contexts = [dict(zip(datasource.index,datasource['context'])) for datasource in self.datasources]
+        node_types = [dict(zip(datasource.index,datasource['type'])) for datasource in self.datasources]
+        
+        for id,(datasource_id,index) in self.mapping.items():
+            context = contexts[datasource_id][index]
+            self.id_to_text[id] = context
+            if node_types[datasource_id][index] in types:
+                self.accurate_id_to_text[id] = context
     
 
         return self.id_to_text,self.accurate_id_to_text
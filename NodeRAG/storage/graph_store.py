@@ -0,0 +1,286 @@
+import os
+import pickle
+from collections.abc import MutableMapping
+from functools import cached_property
+from typing import Any, Dict, Hashable, Iterator, Set
+
+import networkx as nx
+from networkx.classes.coreviews import AtlasView
+from networkx.classes.reportviews import NodeView
+
+from ..logging.metrics import get_metrics
+
+
+class TrackedAttrs(MutableMapping):
+    '''Attribute dict of one node or edge, recording its key as changed when written through'''
+
+    __slots__ = ('data', 'changed', 'key')
+
+    def __init__(self, data: Dict, changed: Set, key: Hashable) -> None:
+        self.data = data
+        self.changed = changed
+        self.key = key
+
+    def __getitem__(self, name) -> Any:
+        return self.data[name]
+
+    def __setitem__(self, name, value) -> None:
+        self.changed.add(self.key)
+        self.data[name] = value
+
+    def __delitem__(self, name) -> None:
+        self.changed.add(self.key)
+        del self.data[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self.data
+
+    def __iter__(self) -> Iterator:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, name, default=None) -> Any:
+        return self.data.get(name, default)
+
+    def __repr__(self) -> str:
+        return repr(self.data)
+
+
+class TrackedNodeView(NodeView):
+
+    __slots__ = ('_changed',)
+
+    def __init__(self, graph: nx.Graph) -> None:
+        super().__init__(graph)
+        self._changed = graph.changed_nodes
+
+    def __getitem__(self, n) -> Any:
+        if isinstance(n, slice):
+            return super().__getitem__(n)
+        return TrackedAttrs(self._nodes[n], self._changed, n)
+
+
+class TrackedAtlasView(AtlasView):
+
+    __slots__ = ('_changed', '_node')
+
+    def __init__(self, neighbours: Dict, changed: Set, node: Hashable) -> None:
+        super().__init__(neighbours)
+        self._changed = changed
+        self._node = node
+
+    def __getitem__(self, v) -> TrackedAttrs:
+        return TrackedAttrs(self._atlas[v], self._changed, (self._node, v))
+
+
+class TrackedGraph(nx.Graph):
+    """
+    networkx Graph recording which nodes and edges were added, removed or written since it was loaded.
+
+    Writes through add_node(s)/add_edge(s), G.nodes[n][key] and G[u][v][key] are tracked. Attribute
+    dicts reached through G.adj, G.edges or nodes(data=True), and values mutated in place (e.g.
+    appending to a list attribute), are not: assign them through G.nodes or G[u][v].
+    """
+
+    def __init__(self, incoming_graph_data=None, **attr) -> None:
+        self.reset_changes()
+        super().__init__(incoming_graph_data, **attr)
+
+    def reset_changes(self) -> None:
+        self.changed_nodes = set()
+        self.changed_edges = set()
+        self.removed_nodes = set()
+        self.removed_edges = set()
+        # views built before the sets were replaced would record into the old ones
+        self.__dict__.pop('nodes', None)
+
+    @cached_property
+    def nodes(self) -> TrackedNodeView:
+        return TrackedNodeView(self)
+
+    def __getitem__(self, n) -> TrackedAtlasView:
+        return TrackedAtlasView(self._adj[n], self.changed_edges, n)
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state.pop('nodes', None)
+        return state
+
+    def add_node(self, node_for_adding, **attr) -> None:
+        super().add_node(node_for_adding, **attr)
+        self.changed_nodes.add(node_for_adding)
+
+    def add_nodes_from(self, nodes_for_adding, **attr) -> None:
+        nodes_for_adding = list(nodes_for_adding)
+        super().add_nodes_from(nodes_for_adding, **attr)
+        for n in nodes_for_adding:
+            try:
+                self.changed_nodes.add(n)
+            except TypeError:
+                # (node, attribute dict) pairs
+                self.changed_nodes.add(n[0])
+
+    def add_edge(self, u_of_edge, v_of_edge, **attr) -> None:
+        for n in (u_of_edge, v_of_edge):
+            if n not in self._node:
+                self.changed_nodes.add(n)
+        super().add_edge(u_of_edge, v_of_edge, **attr)
+        self.changed_edges.add((u_of_edge, v_of_edge))
+
+    def add_edges_from(self, ebunch_to_add, **attr) -> None:
+        ebunch_to_add = list(ebunch_to_add)
+        for edge in ebunch_to_add:
+            for n in edge[:2]:
+                if n not in self._node:
+                    self.changed_nodes.add(n)
+        super().add_edges_from(ebunch_to_add, **attr)
+        self.changed_edges.update((edge[0], edge[1]) for edge in ebunch_to_add)
+
+    def remove_node(self, n) -> None:
+        super().remove_node(n)
+        self.removed_nodes.add(n)
+
+    def remove_nodes_from(self, nodes) -> None:
+        for n in list(nodes):
+            if n in self._node:
+                self.remove_node(n)
+
+    def remove_edge(self, u, v) -> None:
+        super().remove_edge(u, v)
+        self.removed_edges.add((u, v))
+
+    def remove_edges_from(self, ebunch) -> None:
+        for edge in list(ebunch):
+            if self.has_edge(edge[0], edge[1]):
+                self.remove_edge(edge[0], edge[1])
+
+    def delta(self) -> Dict:
+        '''Full attributes of every changed node and edge still in the graph, and the removals'''
+
+        return {'nodes': [(n, dict(self._node[n])) for n in self.changed_nodes if n in self._node],
+                'edges': [(u, v, dict(self._adj[u][v])) for u, v in self.changed_edges if self.has_edge(u, v)],
+                'removed_nodes': list(self.removed_nodes),
+                'removed_edges': list(self.removed_edges)}
+
+
+class GraphStore():
+
+    def __init__(self, path: str, compaction_ratio: float = 0.5) -> None:
+        """
+        Graph pickle with an append-only delta log of the nodes and edges changed by every save.
+
+        The snapshot stays at `path`, the log is written next to it as `path.delta`. Loading replays
+        the log over the snapshot. A save appends only the changed nodes and edges, and rewrites the
+        snapshot once the log grows beyond `compaction_ratio` times the snapshot size.
+
+        Args:
+            path (str): Snapshot path, e.g. config.graph_path.
+            compaction_ratio (float): Log to snapshot size ratio that triggers a compaction.
+        """
+        self.path = path
+        self.delta_path = path + '.delta'
+        self.compaction_ratio = compaction_ratio
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def generation(self) -> tuple:
+        '''Identity of the current snapshot, log records written against an older one are skipped'''
+
+        stat = os.stat(self.path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def load(self, track: bool = True) -> nx.Graph | None:
+        """
+        Load the snapshot and replay the log.
+
+        Args:
+            track (bool): Return a TrackedGraph with nothing marked changed, for stages that save the
+                graph again. Read-only users get a plain networkx Graph.
+        """
+        if not self.exists():
+            return None
+        with open(self.path, 'rb') as f:
+            G = pickle.load(f)
+        get_metrics().io('read', self.path)
+        if G.is_directed() or G.is_multigraph():
+            return G
+        if os.path.exists(self.delta_path):
+            generation = self.generation()
+            for delta in self.deltas():
+                # a log left behind by a compaction interrupted before it was removed
+                if delta['snapshot'] == generation:
+                    self.apply(G, delta)
+            get_metrics().io('read', self.delta_path)
+        # both classes share the same layout, so switching needs no copy of the graph
+        if track:
+            G.__class__ = TrackedGraph
+            G.reset_changes()
+        elif isinstance(G, TrackedGraph):
+            G.__class__ = nx.Graph
+            for name in ['changed_nodes', 'changed_edges', 'removed_nodes', 'removed_edges']:
+                G.__dict__.pop(name, None)
+        return G
+
+    def deltas(self) -> Iterator[Dict]:
+
+        with open(self.delta_path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    @staticmethod
+    def apply(G: nx.Graph, delta: Dict) -> None:
+
+        nx.Graph.remove_nodes_from(G, delta['removed_nodes'])
+        nx.Graph.remove_edges_from(G, delta['removed_edges'])
+        # records hold the full attributes, so keys deleted since the snapshot stay deleted
+        for node, data in delta['nodes']:
+            if node in G._node:
+                G._node[node].clear()
+            nx.Graph.add_node(G, node, **data)
+        for u, v, data in delta['edges']:
+            if nx.Graph.has_edge(G, u, v):
+                G._adj[u][v].clear()
+            nx.Graph.add_edge(G, u, v, **data)
+
+    def save(self, G: nx.Graph) -> None:
+
+        if not isinstance(G, TrackedGraph) or not self.exists():
+            self.snapshot(G)
+            return
+        delta = {'snapshot': self.generation(), **G.delta()}
+        if not (delta['nodes'] or delta['edges'] or delta['removed_nodes'] or delta['removed_edges']):
+            return
+        data = pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL)
+        delta_size = os.path.getsize(self.delta_path) if os.path.exists(self.delta_path) else 0
+        if delta_size + len(data) > self.compaction_ratio * os.path.getsize(self.path):
+            self.snapshot(G)
+            return
+        with open(self.delta_path, 'ab') as f:
+            f.write(data)
+        get_metrics().io('written', self.delta_path, len(data))
+        G.reset_changes()
+
+    def snapshot(self, G: nx.Graph) -> None:
+        '''Write the whole graph and drop the log'''
+
+        if isinstance(G, TrackedGraph):
+            G.reset_changes()
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(G, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.path)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        get_metrics().io('written', self.path)
+
+    def delete(self) -> None:
+
+        for path in [self.path, self.delta_path]:
+            if os.path.exists(path):
+                os.remove(path)
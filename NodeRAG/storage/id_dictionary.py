@@ -0,0 +1,86 @@
+import os
+from typing import Dict, Hashable, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .storage import storage
+
+
+class IdDictionary():
+
+    def __init__(self, ids: Iterable[Hashable] = ()) -> None:
+        """
+        Dense int32 codes for node ids.
+
+        Code i is ids[i], in insertion order. Tables keyed by codes use numpy arrays indexed by the code
+        instead of dicts keyed by 64 character hex strings. The build keeps one dictionary at
+        config.node_ids_path, append only, so every hex id is stored once: id_map.parquet, the `node` of
+        attribute rows and the `related_nodes` of high level elements hold codes into it. The search graph
+        numbers its own nodes with a dictionary of its own.
+
+        Args:
+            ids (Iterable[Hashable]): Initial ids, duplicates are kept once.
+        """
+        self.ids: List[Hashable] = []
+        self.index: Dict[Hashable, int] = {}
+        for id in ids:
+            self.add(id)
+
+    @classmethod
+    def load(cls, path: str) -> 'IdDictionary':
+        '''Dictionary saved at path, empty when there is none'''
+
+        if not os.path.exists(path):
+            return cls()
+        return cls(pq.read_table(path, columns=['hash_id']).column('hash_id').to_pylist())
+
+    def save(self, path: str) -> None:
+        storage({'hash_id': self.ids}).save_parquet(path)
+
+    def add(self, id: Hashable) -> int:
+
+        code = self.index.get(id)
+        if code is None:
+            code = self.index[id] = len(self.ids)
+            self.ids.append(id)
+        return code
+
+    def code(self, id: Hashable) -> int:
+        '''Code of a known id, -1 otherwise'''
+
+        return self.index.get(id, -1)
+
+    def canonical(self, id: Hashable) -> Hashable:
+        '''The stored object equal to id, or id itself when it is unknown'''
+
+        code = self.index.get(id)
+        return id if code is None else self.ids[code]
+
+    def encode(self, ids: Iterable[Hashable]) -> np.ndarray:
+
+        return np.fromiter((self.index.get(id, -1) for id in ids), dtype=np.int32)
+
+    def decode(self, codes: Iterable[int]) -> List[Hashable]:
+
+        return [self.ids[code] for code in codes]
+
+    def decode_column(self, column: pd.Series) -> List[Hashable]:
+        '''Ids of a stored code column; rows written before the dictionary hold the hex ids themselves'''
+
+        if pd.api.types.is_integer_dtype(column):
+            return self.decode(column)
+        return [self.ids[id] if isinstance(id, (int, np.integer)) else id for id in column]
+
+    def __getitem__(self, code: int) -> Hashable:
+        return self.ids[code]
+
+    def __contains__(self, id: Hashable) -> bool:
+        return id in self.index
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
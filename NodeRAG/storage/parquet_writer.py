@@ -0,0 +1,98 @@
+import os
+from typing import Any, Dict, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..logging.metrics import get_metrics
+
+
+class ParquetRowWriter():
+
+    def __init__(self, path: str, append: bool = False, row_group_size: int = 1000) -> None:
+        """
+        Writes rows to a parquet file one row group at a time.
+
+        Rows are buffered until row_group_size of them are collected and then written through a pyarrow
+        ParquetWriter, so memory is bounded by a row group instead of the whole table. When appending, the
+        existing file is copied into a temporary file row group by row group before the new rows, and the
+        temporary file replaces it on close. The columns are those of the existing file and of the first row
+        group; later columns that are not among them are dropped.
+
+        Args:
+            path (str): Parquet file to write.
+            append (bool): Keep the rows already in path.
+            row_group_size (int): Rows per row group.
+        """
+        self.path = path
+        self.append = append and os.path.exists(path)
+        self.row_group_size = row_group_size
+        self.temp_path = path + '.tmp'
+        self.rows: List[Dict[str, Any]] = []
+        self.writer = None
+        self.schema = None
+        self.count = 0
+
+    def write(self, row: Dict[str, Any]) -> None:
+
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.write(row)
+
+    @staticmethod
+    def conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+        '''table with the columns of schema, missing ones as nulls'''
+
+        columns = [table.column(field.name).cast(field.type) if field.name in table.column_names
+                   else pa.nulls(table.num_rows, field.type) for field in schema]
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    def open(self, table: pa.Table) -> None:
+
+        self.schema = table.schema.remove_metadata()
+        if self.append:
+            existing = pq.ParquetFile(self.path)
+            self.schema = pa.unify_schemas([existing.schema_arrow.remove_metadata(), self.schema], promote_options='permissive')
+            self.writer = pq.ParquetWriter(self.temp_path, self.schema)
+            for i in range(existing.num_row_groups):
+                self.writer.write_table(self.conform(existing.read_row_group(i), self.schema))
+            existing.close()
+        else:
+            self.writer = pq.ParquetWriter(self.temp_path, self.schema)
+
+    def flush(self) -> None:
+
+        if not self.rows:
+            return
+        table = pa.Table.from_pylist(self.rows)
+        if self.writer is None:
+            self.open(table)
+        self.writer.write_table(self.conform(table, self.schema))
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self) -> None:
+        '''Write the buffered rows and move the file into place; with no rows written an existing file is left as it is'''
+
+        self.flush()
+        if self.writer is None:
+            if not self.append:
+                pq.write_table(pa.table({}), self.path)
+            return
+        self.writer.close()
+        os.replace(self.temp_path, self.path)
+        get_metrics().io('written', self.path)
+
+    def __enter__(self) -> 'ParquetRowWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif self.writer is not None:
+            self.writer.close()
+            os.remove(self.temp_path)
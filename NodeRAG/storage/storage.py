@@ -1,9 +1,11 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator
 import pandas as pd
 import json
 import pickle
 import os
 
+from ..logging.metrics import get_metrics
+
 class storage():
     
     def __init__(self,content:Dict[str,Any]|List[Dict[str,Any]]) -> None:
@@ -15,6 +17,7 @@ class storage():
         else:
             with open(path,'w') as f:
                 json.dump(self.content,f,indent=4)
+            get_metrics().io('written',path)
             
     def append_json(self,content:Dict[str,Any]|List[Dict[str,Any]],path:str) -> None:
         with open(path,'w') as f:
@@ -36,32 +39,39 @@ class storage():
             else:
                 df =self.content
             df.to_parquet(path)
+            get_metrics().io('written',path)
         
     def append_parquet(self,content,path:str) -> None:
         df = self.load_parquet(path)
         df = pd.concat([df,pd.DataFrame(content)],ignore_index=True)
         df.to_parquet(path)
+        get_metrics().io('written',path)
         
     def save_pickle(self,path:str) -> None:
         with open(path,'wb') as f:
             pickle.dump(self.content,f)
+        get_metrics().io('written',path)
     
     @staticmethod        
     def load_pickle(path:str) -> Any:
+        get_metrics().io('read',path)
         with open(path,'rb') as f:
             return pickle.load(f)
     
     @staticmethod
     def load_parquet(path:str) -> pd.DataFrame:
+        get_metrics().io('read',path)
         return pd.read_parquet(path)
     
     @staticmethod
     def load_json(path:str) -> Dict[str,Any]:
+        get_metrics().io('read',path)
         with open(path) as f:
             return json.load(f)
     
     @staticmethod
     def load_jsonl(path:str) -> List[Dict[str,Any]]:
+        get_metrics().io('read',path)
         with open(path) as f:
             return [json.loads(line) for line in f]
     
@@ -83,6 +93,78 @@ class storage():
         return pd.read_csv(path,sep='\t')
     
     
+    # chunked readers yield one record (a dict) at a time, holding at most batch_size rows of the file
+    
+    RECORD_FORMATS = ('.jsonl','.csv','.tsv','.parquet')
+    
+    @staticmethod
+    def iter_jsonl(path:str) -> Iterator[Dict[str,Any]]:
+        get_metrics().io('read',path)
+        with open(path,encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    @staticmethod
+    def iter_csv(path:str,columns:List[str]|None = None,batch_size:int = 10000,sep:str = ',') -> Iterator[Dict[str,Any]]:
+        get_metrics().io('read',path)
+        with pd.read_csv(path,sep=sep,usecols=columns,chunksize=batch_size) as reader:
+            for chunk in reader:
+                yield from chunk.to_dict('records')
+    
+    @staticmethod
+    def iter_parquet(path:str,columns:List[str]|None = None,batch_size:int = 10000) -> Iterator[Dict[str,Any]]:
+        import pyarrow.parquet as pq
+        get_metrics().io('read',path)
+        with pq.ParquetFile(path) as file:
+            for batch in file.iter_batches(batch_size=batch_size,columns=columns):
+                yield from batch.to_pylist()
+    
+    @staticmethod
+    def iter_records(path:str,columns:List[str]|None = None,batch_size:int = 10000) -> Iterator[Dict[str,Any]]:
+        '''Records of a JSONL, CSV, TSV or parquet file in order; columns limits the fields read where the format allows it'''
+        
+        if path.endswith('.jsonl'):
+            return storage.iter_jsonl(path)
+        elif path.endswith('.csv'):
+            return storage.iter_csv(path,columns,batch_size)
+        elif path.endswith('.tsv'):
+            return storage.iter_csv(path,columns,batch_size,sep='\t')
+        elif path.endswith('.parquet'):
+            return storage.iter_parquet(path,columns,batch_size)
+        raise ValueError(f'Unsupported record file {path}')
+    
+    @staticmethod
+    def count_records(path:str) -> int:
+        '''Number of records, from the parquet metadata or the line count (an estimate for CSV with quoted newlines)'''
+        
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(path).metadata.num_rows
+        with open(path,'rb') as f:
+            lines = sum(1 for line in f if line.strip())
+        return lines if path.endswith('.jsonl') else max(lines-1,0)
+    
+    @staticmethod
+    def filter_parquet(path:str,column:str,values:set) -> int:
+        '''Drop the rows whose column is in values, one row group at a time; returns the number dropped'''
+
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        get_metrics().io('read',path)
+        dropped = 0
+        with pq.ParquetFile(path) as file:
+            with pq.ParquetWriter(path+'.tmp',file.schema_arrow) as writer:
+                for i in range(file.num_row_groups):
+                    table = file.read_row_group(i)
+                    mask = pc.is_in(table.column(column),value_set=pa.array(list(values),type=table.schema.field(column).type))
+                    dropped += pc.sum(mask).as_py() or 0
+                    writer.write_table(table.filter(pc.invert(mask)))
+        os.replace(path+'.tmp',path)
+        get_metrics().io('written',path)
+        return dropped
+
     @staticmethod
     def load(path:str) -> str:
         if not os.path.exists(path):
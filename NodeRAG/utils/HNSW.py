@@ -1,11 +1,12 @@
 import hnswlib_noderag
 import networkx as nx
 import numpy as np
+import pandas as pd
 from typing import Tuple,List
 from heapq import nsmallest
 
 import os
-from ..storage import storage
+from ..storage import storage,IdDictionary
 
 
 class HNSW:
@@ -14,6 +15,8 @@ class HNSW:
         
         self.config = config
         
+        # the index labels map to int32 codes of the node id dictionary, which holds each hex id once
+        self.node_ids = IdDictionary.load(self.config.node_ids_path)
         self.id_map = self.load_id_map()
         self.load_HNSW()
         self._nxgraphs = None
@@ -26,25 +29,40 @@ class HNSW:
         if graph_layer_0 is not None:
             if self._nxgraphs is None:
                 self._nxgraphs = nx.Graph()
+                # items marked deleted keep their links in the index but have code -1 in id_map
                 for id,neighbors in graph_layer_0.items():
+                    if self.code(id) < 0:
+                        continue
                     for neighbor in neighbors:
-                        self._nxgraphs.add_edge(self.id_map[id],self.id_map[neighbor])
+                        if self.code(neighbor) >= 0:
+                            self._nxgraphs.add_edge(self.node(id),self.node(neighbor))
             return self._nxgraphs
         else:
             return None
     
     def add_nodes(self, nodes: List[Tuple[str, np.ndarray]]):
-        current_length = len(self.id_map)
-        id_list = []
-        embedding_list = []
-        for idx, (node_id, embedding) in enumerate(nodes):
-            new_id = current_length + idx
-            self.id_map[new_id] = node_id
-            id_list.append(new_id)
-            embedding_list.append(embedding)
+        # labels continue after every item in the index, deleted ones included
+        current_length = self.hnsw.get_current_count()
+        id_list = list(range(current_length,current_length+len(nodes)))
+        embedding_list = [embedding for node_id,embedding in nodes]
+        id_map = np.full(current_length+len(nodes),-1,dtype=np.int32)
+        id_map[:len(self.id_map)] = self.id_map
+        id_map[current_length:] = [self.node_ids.add(node_id) for node_id,embedding in nodes]
+        self.id_map = id_map
         self.hnsw.resize_index(len(id_list)+current_length)
         self.hnsw.add_items(np.array(embedding_list).astype(np.float32),id_list)
         
+    def remove_nodes(self, nodes: set) -> int:
+        '''Mark the items of nodes deleted, so queries no longer return them, and drop them from id_map'''
+        
+        codes = self.node_ids.encode(nodes)
+        labels = np.flatnonzero(np.isin(self.id_map,codes[codes >= 0]))
+        for label in labels:
+            self.hnsw.mark_deleted(int(label))
+        self.id_map[labels] = -1
+        self._nxgraphs = None
+        return len(labels)
+        
     def search(self,query:np.ndarray,HNSW_results:int=None):
         
         if HNSW_results is None:
@@ -53,7 +71,7 @@ class HNSW:
         idx,dist = self.hnsw.knn_query(query,HNSW_results)
         idx = idx.flatten()
         dist = dist.flatten()
-        node_list = [self.id_map[idx[i]] for i in range(len(idx))]
+        node_list = self.node_ids.decode(self.id_map[idx])
         dist_list = list(dist)
         results = zip(dist_list,node_list)
         return results
@@ -69,24 +87,41 @@ class HNSW:
         node_list = []
         dist_list = []
         for i in range(len(idx)):
-            if self.id_map[idx[i]] not in node_list:
-                node_list.append(self.id_map[idx[i]])
+            node = self.node(idx[i])
+            if node not in node_list:
+                node_list.append(node)
                 dist_list.append(dist[i])
             else:
-                dist_list[node_list.index(self.id_map[idx[i]])] = 0.9*min(dist_list[node_list.index(self.id_map[idx[i]])],dist[i])
+                dist_list[node_list.index(node)] = 0.9*min(dist_list[node_list.index(node)],dist[i])
         results = zip(dist_list,node_list)
         
         return nsmallest(HNSW_results,results)
     
 
-    def load_id_map(self):
+    def code(self,label:int) -> int:
+        '''Node code of an index label, -1 for deleted and unknown labels'''
         
+        return int(self.id_map[label]) if 0 <= label < len(self.id_map) else -1
+    
+    def node(self,label:int) -> str:
+        return self.node_ids[self.id_map[label]]
+    
+    def load_id_map(self) -> np.ndarray:
+        
+        # label -> node code, -1 for labels without a node
         if os.path.exists(self.config.id_map_path):
             id_map = storage.load(self.config.id_map_path)
-            return dict(zip(id_map['id'],id_map['node']))
+            labels = id_map['id'].to_numpy()
+            codes = np.full(labels.max()+1 if len(labels) else 0,-1,dtype=np.int32)
+            if pd.api.types.is_integer_dtype(id_map['node']):
+                codes[labels] = id_map['node'].to_numpy()
+            else:
+                # id maps written before the node id dictionary hold the hex ids
+                codes[labels] = [self.node_ids.add(node) for node in id_map['node']]
+            return codes
 
         else:
-            return {}
+            return np.empty(0,dtype=np.int32)
             
     def load_HNSW(self):
     
@@ -103,15 +138,17 @@ class HNSW:
     def save_HNSW(self):
         
         self.hnsw.save_index(self.config.HNSW_path)
-        storage({'id':list(self.id_map.keys()),'node':list(self.id_map.values())}).save_parquet(self.config.id_map_path)
+        labels = np.flatnonzero(self.id_map >= 0)
+        storage({'id':labels,'node':self.id_map[labels]}).save_parquet(self.config.id_map_path)
+        self.node_ids.save(self.config.node_ids_path)
         storage(self.nxgraphs).save_pickle(self.config.hnsw_graph_path)
     
     def get_layer_graph(self,layer:int):
         return self.hnsw.get_layer_graph(layer)
     
     def get_embeddings(self):
-        ids = self.hnsw.get_ids_list()
+        ids = [id for id in self.hnsw.get_ids_list() if self.code(id) >= 0]
         embeddings = self.hnsw.get_items(ids,return_type='numpy')
-        return zip([self.id_map[id] for id in ids],embeddings)
+        return zip([self.node(id) for id in ids],embeddings)
         
         
\ No newline at end of file
@@ -1,14 +1,16 @@
 import networkx as nx
 import numpy as np
 import scipy.sparse as sp
-from operator import itemgetter
+
+from .compact_graph import CompactGraph
 
 class sparse_PPR():
     
-    def __init__(self,graph:nx.Graph,modified = True,weight = 'weight'):
+    def __init__(self,graph:nx.Graph|CompactGraph,modified = True,weight = 'weight'):
         
         self.graph = graph
-        self.nodes = list(self.graph.nodes())
+        self.compact = graph if isinstance(graph,CompactGraph) else CompactGraph.from_networkx(graph,weight)
+        self.nodes = self.compact.ids
         self.modified = modified
         self.weight = weight
         self.n_nodes = len(self.nodes)
@@ -18,7 +20,7 @@ class sparse_PPR():
         
         
         
-        adjaceny_matrix = nx.adjacency_matrix(self.graph,weight = self.weight)
+        adjaceny_matrix = self.compact.adjacency().astype(np.float64)
         adjaceny_matrix = (adjaceny_matrix+adjaceny_matrix.T)/2
 
         if self.modified:
@@ -39,22 +41,48 @@ class sparse_PPR():
             perosnalization:dict[str,float],
             alpha:float=0.85,
             max_iter:int=100,
-            epsilons:float=1e-5):
+            epsilons:float=1e-5,
+            stats:dict|None=None):
+        
+        probs = self.PPR_scores(perosnalization,alpha,max_iter,epsilons,stats)
+        order = self.rank(probs)
+        return list(zip(self.nodes.decode(order),probs[order]))
+    
+    def PPR_scores(self,
+                   perosnalization:dict[str,float],
+                   alpha:float=0.85,
+                   max_iter:int=100,
+                   epsilons:float=1e-5,
+                   stats:dict|None=None) -> np.ndarray:
+        '''Personalized PageRank score of every node, indexed by its code in self.nodes'''
         
         probs = np.zeros(len(self.nodes))
        
         for node,prob in perosnalization.items():
-            probs[self.nodes.index(node)] = prob
+            probs[self.nodes.index[node]] = prob
             
         probs = probs/np.sum(probs)
         
+        residual = float('nan')
         for i in range(max_iter):
             probs_old = probs.copy()
             probs = alpha*self.trans_matrix.dot(probs) + (1-alpha)*probs
-            if np.linalg.norm(probs-probs_old)<epsilons:
+            residual = np.linalg.norm(probs-probs_old)
+            if residual<epsilons:
                 break
+        
+        # convergence of this run, filled in for the caller since the instance is shared between requests
+        if stats is not None:
+            stats['iterations'] = i+1 if max_iter > 0 else 0
+            stats['residual'] = float(residual)
             
-        return sorted(zip(self.nodes,probs),key=itemgetter(1),reverse=True)
+        return probs
+    
+    @staticmethod
+    def rank(probs:np.ndarray) -> np.ndarray:
+        '''Node codes by descending score, ties in node order'''
+        
+        return np.argsort(-probs,kind='stable')
     
     def PR(self,
            alpha:float=0.1,
@@ -68,10 +96,6 @@ class sparse_PPR():
             probs = alpha*self.trans_matrix.dot(probs) + (1-alpha)*probs
             if np.linalg.norm(probs-probs_old)<epsilons:
                 break
-            
-        return sorted(zip(self.nodes,probs),key=itemgetter(1),reverse=True)
-
-
-
-# class approx_PPR():
-#     pass
\ No newline at end of file
+        
+        order = self.rank(probs)
+        return list(zip(self.nodes.decode(order),probs[order]))
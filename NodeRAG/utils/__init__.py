@@ -7,8 +7,12 @@ from .lazy_import import LazyImport
 from .prompt.prompt_manager import prompt_manager
 from .PPR import sparse_PPR
 from .graph_operator import IGraph,MultigraphConcat
+from .compact_graph import CompactGraph
+from .search_graph import SearchGraphStore,PageRankStore
 from .HNSW import HNSW
 from .yaml_operation import YamlHandler
+from .worker_pool import WorkerPool
+from .context_packer import ContextPacker
 
 __all__ = [
     'Tracker',
@@ -21,6 +25,11 @@ __all__ = [
     'sparse_PPR',
     'IGraph',
     'MultigraphConcat',
+    'CompactGraph',
+    'SearchGraphStore',
+    'PageRankStore',
     'HNSW',
-    'YamlHandler'
+    'YamlHandler',
+    'WorkerPool',
+    'ContextPacker'
 ]
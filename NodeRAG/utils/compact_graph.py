@@ -0,0 +1,284 @@
+from collections.abc import Mapping
+from typing import Hashable, Iterator, List
+
+import igraph as ig
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+from ..storage.id_dictionary import IdDictionary
+
+
+class CompactGraph():
+
+    def __init__(self,
+                 ids: List[Hashable] | IdDictionary,
+                 src: np.ndarray,
+                 dst: np.ndarray,
+                 edge_weight: np.ndarray,
+                 types: np.ndarray,
+                 type_names: List[str | None],
+                 weight: np.ndarray) -> None:
+        """
+        Array-backed undirected graph with interned integer node ids.
+
+        Node i is ids[i]. Each edge is stored once in the (src, dst, edge_weight) columns; node types
+        are codes into type_names and node weights a float column. This takes a few bytes per node and
+        edge instead of the hundreds of a networkx graph, and converts to igraph and scipy without
+        going through the string ids.
+
+        Args:
+            ids (List[Hashable] | IdDictionary): Node ids, position is the integer id.
+            src (np.ndarray): Integer source of every edge.
+            dst (np.ndarray): Integer target of every edge.
+            edge_weight (np.ndarray): Weight of every edge.
+            types (np.ndarray): Type code of every node.
+            type_names (List[str | None]): Type of every code.
+            weight (np.ndarray): Weight of every node.
+        """
+        self.ids = ids if isinstance(ids, IdDictionary) else IdDictionary(ids)
+        self.src = src
+        self.dst = dst
+        self.edge_weight = edge_weight
+        self.types = types
+        self.type_names = type_names
+        self.weight = weight
+        self._csr = None
+
+    @classmethod
+    def from_networkx(cls, G: nx.Graph, weight: str = 'weight') -> 'CompactGraph':
+
+        ids = IdDictionary(G._node)
+        index = ids.index
+        type_names = []
+        type_codes = {}
+        types = np.empty(len(ids), dtype=np.int16)
+        node_weight = np.empty(len(ids), dtype=np.float32)
+        for i, data in enumerate(G._node.values()):
+            type = data.get('type')
+            code = type_codes.get(type)
+            if code is None:
+                code = type_codes[type] = len(type_names)
+                type_names.append(type)
+            types[i] = code
+            node_weight[i] = data.get('weight', 1)
+
+        edges = G.number_of_edges()
+        src = np.empty(edges, dtype=np.int32)
+        dst = np.empty(edges, dtype=np.int32)
+        edge_weight = np.empty(edges, dtype=np.float32)
+        for e, (u, v, w) in enumerate(G.edges(data=weight, default=1)):
+            src[e] = index[u]
+            dst[e] = index[v]
+            edge_weight[e] = w
+        return cls(ids, src, dst, edge_weight, types, type_names, node_weight)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.src)
+
+    def type_code(self, type: str | None) -> int:
+
+        if type not in self.type_names:
+            self.type_names.append(type)
+        return self.type_names.index(type)
+
+    def type_mask(self, type: str) -> np.ndarray:
+
+        if type not in self.type_names:
+            return np.zeros(self.n_nodes, dtype=bool)
+        return self.types == self.type_names.index(type)
+
+    def node_types(self) -> 'NodeTypes':
+        return NodeTypes(self)
+
+    def adjacency(self) -> sp.csr_array:
+        '''Symmetric weighted adjacency matrix, rows and columns in id order'''
+
+        if self._csr is None:
+            # self loops are stored once and must not be doubled by the symmetric copy
+            loops = self.src == self.dst
+            rows = np.concatenate([self.src, self.dst[~loops]])
+            cols = np.concatenate([self.dst, self.src[~loops]])
+            data = np.concatenate([self.edge_weight, self.edge_weight[~loops]])
+            self._csr = sp.csr_array((data, (rows, cols)), shape=(self.n_nodes, self.n_nodes))
+        return self._csr
+
+    def degree(self) -> np.ndarray:
+        return np.diff(self.adjacency().indptr)
+
+    def concat(self, G: nx.Graph) -> 'CompactGraph':
+        """
+        Add every edge of G with weight 1, summed into the weight of an existing edge, in place.
+
+        Nodes of G that are new get no type and weight 1. This is GraphConcat.concat as one sparse sum
+        over the upper triangles instead of an edge at a time.
+
+        Args:
+            G (nx.Graph): Graph to merge, e.g. the HNSW layer 0 graph.
+        """
+        n_nodes = self.n_nodes
+        for node in G._node:
+            self.ids.add(node)
+        added = self.n_nodes - n_nodes
+        if added:
+            self.types = np.concatenate([self.types, np.full(added, self.type_code(None), dtype=np.int16)])
+            self.weight = np.concatenate([self.weight, np.ones(added, dtype=np.float32)])
+
+        edges = G.number_of_edges()
+        index = self.ids.index
+        src = np.fromiter((index[u] for u, v in G.edges()), dtype=np.int32, count=edges)
+        dst = np.fromiter((index[v] for u, v in G.edges()), dtype=np.int32, count=edges)
+        src, dst = np.concatenate([self.src, src]), np.concatenate([self.dst, dst])
+        data = np.concatenate([self.edge_weight, np.ones(edges, dtype=np.float32)])
+        # both graphs undirected: one (low, high) entry per edge, duplicates are summed by tocsr
+        upper = sp.coo_array((data, (np.minimum(src, dst), np.maximum(src, dst))),
+                             shape=(self.n_nodes, self.n_nodes)).tocsr().tocoo()
+        self.src = upper.row.astype(np.int32)
+        self.dst = upper.col.astype(np.int32)
+        self.edge_weight = upper.data.astype(np.float32)
+        self._csr = None
+        return self
+
+    def unbalance_adjust(self) -> 'CompactGraph':
+        '''Clip every edge weight to 1/degree of both its ends, in place, as GraphConcat.unbalance_adjust'''
+
+        # networkx degree, self loops count twice
+        degree = np.bincount(self.src, minlength=self.n_nodes) + np.bincount(self.dst, minlength=self.n_nodes)
+        limit = 1 / np.maximum(degree, 1)
+        self.edge_weight = np.minimum(self.edge_weight, np.minimum(limit[self.src], limit[self.dst])).astype(np.float32)
+        self._csr = None
+        return self
+
+    def sorted(self) -> 'CompactGraph':
+        '''Copy with the nodes in id order and the edges in (low, high) code order, independent of insertion order'''
+
+        order = np.array(sorted(range(self.n_nodes), key=self.ids.__getitem__), dtype=np.int64)
+        position = np.empty(self.n_nodes, dtype=np.int32)
+        position[order] = np.arange(self.n_nodes, dtype=np.int32)
+        src, dst = position[self.src], position[self.dst]
+        low, high = np.minimum(src, dst), np.maximum(src, dst)
+        edges = np.lexsort((high, low))
+        return CompactGraph(self.ids.decode(order), low[edges], high[edges], self.edge_weight[edges],
+                            self.types[order], list(self.type_names), self.weight[order])
+
+    def to_igraph(self, isolated: bool = True, weights: bool = False) -> ig.Graph:
+        """
+        igraph Graph over the integer edge arrays, vertex names are the node ids.
+
+        Args:
+            isolated (bool): Keep nodes without edges. ig.Graph.TupleList drops them.
+            weights (bool): Add the edge weights as the "weight" edge attribute.
+        """
+        if isolated:
+            vertices = np.arange(self.n_nodes)
+            src, dst = self.src, self.dst
+        else:
+            vertices = np.unique(np.concatenate([self.src, self.dst]))
+            position = np.full(self.n_nodes, -1, dtype=np.int64)
+            position[vertices] = np.arange(len(vertices))
+            src, dst = position[self.src], position[self.dst]
+        G = ig.Graph(n=len(vertices), edges=np.column_stack([src, dst]).tolist(), directed=False)
+        G.vs['name'] = self.ids.decode(vertices)
+        if weights:
+            G.es['weight'] = self.edge_weight.tolist()
+        return G
+
+    def coreness(self) -> np.ndarray:
+        '''Core number of every node, the k-core holds the nodes with coreness >= k'''
+
+        return np.array(self.to_igraph().coreness(), dtype=np.int32)
+
+    def k_core(self, k: int) -> List[Hashable]:
+        return self.ids.decode(np.flatnonzero(self.coreness() >= k))
+
+    def steiner_connectors(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Nodes that join the components induced by `codes` along shortest (hop count) paths.
+
+        Mehlhorn's 2-approximate Steiner tree: one multi-source shortest path search from all of
+        `codes`, the edges between the regions of different components as candidate bridges, and a
+        minimum spanning forest over the components. Components without any path to the others stay
+        apart. O(E log E), instead of a path query per pair of nodes.
+
+        Args:
+            codes (np.ndarray): Codes of the selected nodes.
+
+        Returns:
+            np.ndarray: Codes of the added nodes, none of them in `codes`.
+        """
+        selected = np.zeros(self.n_nodes, dtype=bool)
+        selected[codes] = True
+        terminals = np.flatnonzero(selected)
+        A = self.adjacency()
+        n_components, labels = csgraph.connected_components(A[terminals][:, terminals], directed=False)
+        if n_components <= 1:
+            return np.empty(0, dtype=np.int32)
+
+        component = np.full(self.n_nodes, -1)
+        component[terminals] = labels
+        distance, predecessor, source = csgraph.dijkstra(A, directed=False, indices=terminals, unweighted=True,
+                                                         return_predecessors=True, min_only=True)
+        # unreachable nodes have source -9999
+        region = np.where(source >= 0, component[np.maximum(source, 0)], -1)
+        u, v = self.src, self.dst
+        bridge = (region[u] >= 0) & (region[v] >= 0) & (region[u] != region[v])
+        u, v = u[bridge], v[bridge]
+        cost = distance[u] + distance[v] + 1
+
+        parent = list(range(n_components))
+
+        def find(c: int) -> int:
+            while parent[c] != c:
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            return c
+
+        added = set()
+        merged = 0
+        for e in np.argsort(cost, kind='stable'):
+            a, b = find(region[u[e]]), find(region[v[e]])
+            if a == b:
+                continue
+            parent[a] = b
+            for node in (u[e], v[e]):
+                while not selected[node]:
+                    added.add(int(node))
+                    node = predecessor[node]
+            merged += 1
+            if merged == n_components - 1:
+                break
+        return np.array(sorted(added), dtype=np.int32)
+
+    def to_networkx(self) -> nx.Graph:
+        '''networkx adapter for the code paths that need the full graph API'''
+
+        G = nx.Graph()
+        G.add_nodes_from((self.ids[i], {'type': self.type_names[self.types[i]], 'weight': float(self.weight[i])})
+                         for i in range(self.n_nodes))
+        G.add_edges_from((self.ids[u], self.ids[v], {'weight': float(w)})
+                         for u, v, w in zip(self.src, self.dst, self.edge_weight))
+        return G
+
+
+class NodeTypes(Mapping):
+    '''Read-only id -> type view over the type column of a CompactGraph, in place of an {id: type} dict'''
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph: CompactGraph) -> None:
+        self.graph = graph
+
+    def __getitem__(self, id: Hashable) -> str | None:
+        return self.graph.type_names[self.graph.types[self.graph.ids.index[id]]]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.graph.ids)
+
+    def __len__(self) -> int:
+        return self.graph.n_nodes
@@ -0,0 +1,39 @@
+from typing import Hashable, Iterable, List, Tuple
+
+
+class ContextPacker():
+
+    def __init__(self, token_counter, budget: int | None = None, separator_tokens: int = 1) -> None:
+        """
+        Greedy token-budgeted selection of context units for a prompt.
+
+        Units come with precomputed token counts (the `tokens` column stored next to `context`), so
+        packing is one linear pass over them instead of re-tokenizing the growing prompt after every
+        added unit.
+
+        Args:
+            token_counter: The config token counter, used for the prompt overhead and its default budget.
+            budget (int | None): Token budget of the whole prompt, defaults to token_counter.token_limit_bound.
+            separator_tokens (int): Tokens charged per unit for the newline that joins it to the next one.
+        """
+        self.token_counter = token_counter
+        self.budget = budget if budget is not None else token_counter.token_limit_bound
+        self.separator_tokens = separator_tokens
+
+    def overhead(self, text: str) -> int:
+        '''Tokens of the prompt without any units'''
+
+        return self.token_counter(text)
+
+    def pack(self, units: Iterable[Tuple[Hashable, int]], overhead: int = 0) -> List[Hashable]:
+        '''Keys of the (key, tokens) units that fit, taken in the given priority order; units too large for the
+        remaining budget are skipped and smaller ones after them may still be taken'''
+
+        remaining = self.budget - overhead
+        packed = []
+        for key, tokens in units:
+            cost = tokens + self.separator_tokens
+            if cost <= remaining:
+                packed.append(key)
+                remaining -= cost
+        return packed
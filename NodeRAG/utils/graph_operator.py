@@ -1,6 +1,8 @@
 import networkx as nx
 import igraph as ig
 
+from .compact_graph import CompactGraph
+
 
 
 class IGraph:
@@ -8,21 +10,20 @@ class IGraph:
     def __init__(self, graph:nx.Graph):
         self.graph = graph
     
-    def to_igraph(self):
+    def to_igraph(self) -> ig.Graph:
         
-        G = ig.Graph.TupleList(self.graph.edges(), directed=False)
-        return G
+        # built from integer edge arrays, without the isolated nodes ig.Graph.TupleList never saw
+        return CompactGraph.from_networkx(self.graph).to_igraph(isolated=False)
     
-    def to_igraph_with_weights(self):
-        G = ig.Graph.TupleList(self.graph.edges(data=True), directed=False, edge_attrs=['weight'])
-        return G
+    def to_igraph_with_weights(self) -> ig.Graph:
+        return CompactGraph.from_networkx(self.graph).to_igraph(isolated=False,weights=True)
 
     
 class MultigraphConcat:
     
     def __init__(self, base_graph: nx.Graph = None):
         
-        self.graph = base_graph if base_graph else nx.Graph()
+        self.graph = base_graph if base_graph is not None else nx.Graph()
 
     def concat(self, new_graph: nx.Graph):
         
@@ -4,6 +4,8 @@ from tqdm import tqdm
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn
 from rich.console import Console
 
+from ..logging.metrics import get_metrics
+
 
 class Observer(ABC):
     @abstractmethod
@@ -77,6 +79,7 @@ class Tracker():
         
     def update(self):
         self.process_state.current_task += 1
+        get_metrics().count('items')
         
     def close(self):
         self.process_state.close()
@@ -0,0 +1,100 @@
+import os
+from typing import List
+
+import networkx as nx
+import numpy as np
+
+from ..storage import GraphStore, storage
+from .compact_graph import CompactGraph
+from .PPR import sparse_PPR
+
+
+def file_signature(paths: List[str]) -> List[tuple | None]:
+    '''Size and mtime of every path, None for missing ones, to tell whether derived data is stale'''
+
+    signature = []
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        else:
+            signature.append(None)
+    return signature
+
+
+class SearchGraphStore():
+
+    def __init__(self, config) -> None:
+        """
+        Graph searched by PPR: the base graph with the HNSW layer 0 edges added, as a CompactGraph.
+
+        The HNSW stage stores it at config.search_graph_path, so search startup loads arrays instead of
+        merging the graphs. A stored graph is used only while the base graph, its delta log and the HNSW
+        graph are the files it was built from; otherwise it is rebuilt.
+
+        Args:
+            config (NodeConfig): Provides the base graph, HNSW graph and search graph paths.
+        """
+        self.path = config.search_graph_path
+        self.base_graph_path = config.base_graph_path
+        self.hnsw_graph_path = config.hnsw_graph_path
+        self.sources = [self.base_graph_path, self.base_graph_path + '.delta', self.hnsw_graph_path]
+
+    def build(self, base_graph: nx.Graph | CompactGraph | None = None) -> CompactGraph:
+        '''Merge the HNSW graph into base_graph, a CompactGraph given here is extended in place'''
+
+        if base_graph is None:
+            base_graph = GraphStore(self.base_graph_path).load(track=False)
+        if not isinstance(base_graph, CompactGraph):
+            base_graph = CompactGraph.from_networkx(base_graph)
+        return base_graph.concat(storage.load(self.hnsw_graph_path))
+
+    def save(self, graph: CompactGraph) -> None:
+
+        storage({'sources': file_signature(self.sources), 'graph': graph}).save_pickle(self.path)
+
+    def load(self, base_graph: nx.Graph | None = None) -> CompactGraph:
+        '''Stored search graph when it is current, otherwise one built from the graphs on disk'''
+
+        if os.path.exists(self.path):
+            stored = storage.load(self.path)
+            if stored['sources'] == file_signature(self.sources):
+                return stored['graph']
+        return self.build(base_graph)
+
+
+class PageRankStore():
+
+    def __init__(self, path: str, base_graph_path: str) -> None:
+        """
+        Global PageRank of the base graph, computed by the HNSW stage for the visualiser.
+
+        Args:
+            path (str): Where the scores are stored, config.pagerank_path.
+            base_graph_path (str): The graph they are computed on; a change to it or its delta log makes
+                the stored scores stale.
+        """
+        self.path = path
+        self.base_graph_path = base_graph_path
+        self.sources = [base_graph_path, base_graph_path + '.delta']
+
+    @staticmethod
+    def build(graph: nx.Graph | CompactGraph) -> List[tuple]:
+        return sparse_PPR(graph).PR()
+
+    def save(self, page_rank: List[tuple]) -> None:
+
+        nodes = [node for node, score in page_rank]
+        scores = np.array([score for node, score in page_rank])
+        storage({'sources': file_signature(self.sources), 'nodes': nodes, 'scores': scores}).save_pickle(self.path)
+
+    def load(self, graph: nx.Graph | None = None) -> List[tuple]:
+        '''(node, score) pairs by descending score; computed from graph when none are stored or they are stale'''
+
+        if os.path.exists(self.path):
+            stored = storage.load(self.path)
+            if stored['sources'] == file_signature(self.sources):
+                return list(zip(stored['nodes'], stored['scores']))
+        if graph is None:
+            graph = GraphStore(self.base_graph_path).load(track=False)
+        return self.build(graph)
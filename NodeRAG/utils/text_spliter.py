@@ -1,4 +1,5 @@
-from typing import List
+from typing import Generator, Iterable, Iterator, List
+import numpy as np
 from .token_utils import get_token_counter
 
 class SemanticTextSplitter:
@@ -16,47 +17,63 @@ class SemanticTextSplitter:
     def split(self, text: str) -> List[str]:
         """
         Split text into chunks based on both token count and semantic boundaries.
+
+        The text is tokenized once. Each chunk starts from a window of chunk_size tokens, mapped to
+        characters through the token offsets, and ends at the last semantic boundary inside it, or at
+        the token window itself when there is none.
+        """
+        return list(self.split_stream([text]))
+    
+    def split_stream(self, blocks: Iterable[str]) -> Iterator[str]:
+        """
+        Split text arriving in blocks (e.g. a large file read piece by piece) without holding all of it.
+
+        Chunks whose token window ends inside the text seen so far are emitted and the rest is carried
+        over to the next block, so about one block plus one chunk is held at a time.
+        """
+        rest = ''
+        for block in blocks:
+            rest = yield from self.split_text(rest + block, final=False)
+        yield from self.split_text(rest, final=True)
+    
+    def split_text(self, text: str, final: bool = True) -> Generator[str, None, str]:
+        """
+        Yield the chunks of text and return the unsplit rest. Unless final, a chunk whose token window
+        reaches the end of text stays in the rest, as more text may follow.
         """
-        chunks = []
         start = 0
         text_len = len(text)
+        offsets = self.token_counter.offsets(text)
+        boundaries = ['\n\n', '\n', '。', '.', '！', '!', '？', '?', '；', ';']
         
         while start < text_len:
-            # add 4 times of chunk_size string to the start position
-            end = start + self.chunk_size * 4  # assume each token is 4 characters
-            if end > text_len:
+            # token containing the start position, and the character where chunk_size tokens later begins
+            token = max(int(np.searchsorted(offsets, start, side='right')) - 1, 0)
+            window_end = token + self.chunk_size
+            if window_end >= len(offsets):
+                if not final:
+                    return text[start:]
                 end = text_len
+            else:
+                end = int(offsets[window_end])
+                current_chunk = text[start:end]
                 
-            # get the current text fragment
-            current_chunk = text[start:end]
-            
-            # if the token count of the current fragment exceeds the limit, need to find the split point
-            while self.token_counter(current_chunk) > self.chunk_size and start < end:
-                # find semantic boundary in the current range
-                boundaries = ['\n\n', '\n', '。', '.', '！', '!', '？', '?', '；', ';']
-                semantic_end = end
-                
+                # find semantic boundary in the current window
                 for boundary in boundaries:
                     boundary_pos = current_chunk.rfind(boundary)
                     if boundary_pos != -1:
-                        semantic_end = start + boundary_pos + len(boundary)
+                        end = start + boundary_pos + len(boundary)
                         break
                 
-                # if found semantic boundary, use it; otherwise, force truncation by character
-                if semantic_end < end:
-                    end = semantic_end
-                else:
-                    # 没找到合适的语义边界，往回数token直到满足大小限制
-                    end = start + int(len(current_chunk) // 1.2)
-                
-                current_chunk = text[start:end]
+                # tokens starting inside one character (split multibyte characters) never stall the loop
+                end = max(end, start + 1)
             
             # 添加处理好的文本块
-            chunk = current_chunk.strip()
+            chunk = text[start:end].strip()
             if chunk:
-                chunks.append(chunk)
+                yield chunk
             
             # 移动到下一个起始位置
             start = end
 
-        return chunks
+        return ''
@@ -1,3 +1,5 @@
+import re
+import numpy as np
 import tiktoken
 from typing import Protocol, List
 # from transformers import AutoTokenizer
@@ -10,6 +12,10 @@ class token_counter(Protocol):
     def __call__(self, text:str) -> int:
         ...
     
+    def offsets(self, text:str) -> np.ndarray:
+        '''Character offset at which each token of text starts'''
+        ...
+    
 class tiktoken_counter(token_counter):
     
     def __init__(self,model_name:str):
@@ -24,11 +30,39 @@ class tiktoken_counter(token_counter):
                 
         return len(self.encode(text)) > self.token_limit_bound
     
+    def offsets(self, text:str) -> np.ndarray:
+        
+        # byte length of every token, then byte offsets mapped to characters through the utf-8 lead bytes
+        token_bytes = self.tokenizer.decode_tokens_bytes(self.encode(text))
+        lengths = np.fromiter(map(len,token_bytes),dtype=np.int64,count=len(token_bytes))
+        byte_offsets = np.cumsum(lengths) - lengths
+        raw = np.frombuffer(text.encode('utf-8'),dtype=np.uint8)
+        char_index = np.cumsum((raw & 0xC0) != 0x80) - 1
+        return char_index[byte_offsets]
 
 
     def __call__(self, text: str) -> int:
         return len(self.encode(text))
     
+class approximate_counter(token_counter):
+    
+    def __init__(self,model_name:str):
+        # offline providers have no tokenizer, split on words and punctuation instead
+        self.model_name = model_name
+        self.token_limit_bound = 128000
+        
+    def encode(self, text:str) -> List[int]:
+        return [hash(token) for token in re.findall(r'\w+|[^\w\s]', text)]
+    
+    def token_limit(self, text:str) -> bool:
+        return len(self.encode(text)) > self.token_limit_bound
+    
+    def offsets(self, text:str) -> np.ndarray:
+        return np.fromiter((match.start() for match in re.finditer(r'\w+|[^\w\s]', text)),dtype=np.int64)
+    
+    def __call__(self, text:str) -> int:
+        return len(self.encode(text))
+    
 # class deepseek_counter(token_counter):
     
 #     def __init__(self,model_name:str):
@@ -61,6 +95,8 @@ def get_token_counter(model_name:str) -> token_counter:
         token = tiktoken_counter('gpt-4o')
         token.token_limit_bound = 1280000
         return token
+    elif 'fake' in model_name or 'local' in model_name:
+        return approximate_counter(model_name)
     # elif 'deepseek' in model_name:
     #     return deepseek_counter(model_name)
     else:
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable
+
+
+class WorkerPool():
+
+    def __init__(self, workers: int = 16, queue_size: int | None = None) -> None:
+        """
+        Bounded producer/consumer scheduler for LLM fan-out.
+
+        Items are pulled lazily from the source into a bounded queue and handled by a fixed number of
+        workers, so only about workers + queue_size items (prompts, responses) are alive at any time
+        instead of one coroutine per item for the whole corpus.
+
+        Args:
+            workers (int): Number of concurrent workers.
+            queue_size (int | None): Items buffered ahead of the workers, defaults to twice the workers.
+        """
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size if queue_size is not None else 2 * self.workers
+
+    async def produce(self, items: Iterable | AsyncIterable, queue: asyncio.Queue) -> None:
+
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+
+    async def consume(self, worker: Callable[[Any], Awaitable[Any]], queue: asyncio.Queue) -> None:
+
+        while True:
+            item = await queue.get()
+            if item is _Stop:
+                return
+            await worker(item)
+
+    async def run(self, items: Iterable | AsyncIterable, worker: Callable[[Any], Awaitable[Any]]) -> None:
+        '''Run worker on every item with backpressure; the first worker error cancels the rest and is raised'''
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        consumers = [asyncio.create_task(self.consume(worker, queue)) for _ in range(self.workers)]
+
+        async def producer():
+            await self.produce(items, queue)
+            for _ in consumers:
+                await queue.put(_Stop)
+
+        producer_task = asyncio.create_task(producer())
+        tasks = [producer_task, *consumers]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+class _Stop():
+    pass
@@ -0,0 +1,31 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from NodeRAG.benchmark.build_benchmark import benchmark_config, run_build
+
+
+def main_folder(folder):
+    '''folder with the input, cache and info sub folders of a build'''
+
+    for sub_folder in ('input', 'cache', 'info'):
+        os.makedirs(os.path.join(folder, sub_folder), exist_ok=True)
+    return str(folder)
+
+
+def build(folder, target=run_build, **options):
+    """
+    Build folder against the offline provider in a fresh process, as the benchmark does, and return the report.
+
+    Index counters start from zero and strings hash differently in every build. options are set on the
+    config section, e.g. llm_cache=True.
+    """
+    config = benchmark_config(folder, chunk_size=64, dim=16, build_workers=8)
+    config['config'].update(options)
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(target, config).result()
+
+
+def provider_calls(report):
+    return sum(record.get('llm_requests', 0) + record.get('embedding_requests', 0)
+               for record in report['states'].values())
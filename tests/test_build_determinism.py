@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import build, main_folder, provider_calls
+from NodeRAG.benchmark.corpus import synthetic_corpus
+
+
+def empty_cache(folder):
+    '''Everything the build wrote, but the LLM response cache'''
+
+    for sub_folder in ('cache', 'info'):
+        path = os.path.join(folder, sub_folder)
+        for file in os.listdir(path):
+            if not file.startswith('llm_cache'):
+                os.remove(os.path.join(path, file))
+
+
+@pytest.fixture
+def corpus(tmp_path):
+
+    folder = main_folder(tmp_path / 'corpus')
+    synthetic_corpus(os.path.join(folder, 'input'), 40, 64, chunks_per_document=20, entities=30)
+    return folder
+
+
+def test_rebuild_on_an_emptied_cache_is_served_from_the_response_cache(corpus):
+
+    assert provider_calls(build(corpus, llm_cache=True)) > 0
+    empty_cache(corpus)
+    # every prompt and embedding batch of the rebuild is the same as the first build's
+    assert provider_calls(build(corpus, llm_cache=True)) == 0
+
+
+def test_separate_builds_give_the_same_high_level_elements(corpus, tmp_path):
+
+    from NodeRAG.storage import storage
+
+    copy = main_folder(tmp_path / 'copy')
+    shutil.copytree(os.path.join(corpus, 'input'), os.path.join(copy, 'input'), dirs_exist_ok=True)
+    hash_ids = []
+    for folder in (corpus, copy):
+        build(folder)
+        hash_ids.append(storage.load(os.path.join(folder, 'cache', 'high_level_elements.parquet'))['hash_id'].tolist())
+    assert hash_ids[0] and hash_ids[0] == hash_ids[1]
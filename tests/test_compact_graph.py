@@ -0,0 +1,60 @@
+import networkx as nx
+import numpy as np
+
+from NodeRAG.utils import CompactGraph
+
+
+def typed_graph(seed=0):
+    '''Random graph with string ids, node types and weights, and one isolated node'''
+
+    G = nx.relabel_nodes(nx.gnm_random_graph(60, 150, seed=seed), lambda i: f'n{i:02d}')
+    rng = np.random.default_rng(seed)
+    for node in G:
+        G.nodes[node].update(type=rng.choice(['entity', 'semantic_unit', 'relationship']), weight=int(rng.integers(1, 4)))
+    for u, v in G.edges:
+        G[u][v]['weight'] = float(rng.integers(1, 5))
+    G.add_node('isolated', type='text', weight=1)
+    return G
+
+
+def test_networkx_round_trip():
+
+    G = typed_graph()
+    H = CompactGraph.from_networkx(G).to_networkx()
+    assert dict(H.nodes(data=True)) == {node: {'type': data['type'], 'weight': float(data['weight'])}
+                                        for node, data in G.nodes(data=True)}
+    assert {frozenset(e): w for *e, w in H.edges(data='weight')} == {frozenset(e): w for *e, w in G.edges(data='weight')}
+
+
+def test_columns_match_networkx():
+
+    G = typed_graph()
+    compact = CompactGraph.from_networkx(G)
+    assert dict(zip(compact.ids, compact.coreness())) == nx.core_number(G)
+    assert dict(zip(compact.ids, compact.degree())) == dict(G.degree)
+    assert compact.ids.decode(np.flatnonzero(compact.type_mask('entity'))) == [n for n, t in G.nodes(data='type') if t == 'entity']
+    assert dict(compact.node_types()) == dict(G.nodes(data='type'))
+
+
+def test_igraph_leaves_out_isolated_nodes():
+
+    compact = CompactGraph.from_networkx(typed_graph())
+    assert 'isolated' in compact.to_igraph().vs['name']
+    G_ig = compact.to_igraph(isolated=False, weights=True)
+    assert 'isolated' not in G_ig.vs['name']
+    assert sorted(G_ig.es['weight']) == sorted(compact.edge_weight.tolist())
+
+
+def test_sorted_does_not_depend_on_insertion_order():
+
+    G = typed_graph()
+    shuffled = nx.Graph()
+    order = np.random.default_rng(1).permutation(list(G.nodes))
+    shuffled.add_nodes_from((node, G.nodes[node]) for node in order)
+    shuffled.add_edges_from((v, u, data) for u, v, data in reversed(list(G.edges(data=True))))
+
+    a, b = CompactGraph.from_networkx(G).sorted(), CompactGraph.from_networkx(shuffled).sorted()
+    assert list(a.ids) == list(b.ids) == sorted(G.nodes)
+    for column in ('src', 'dst', 'edge_weight', 'weight'):
+        assert np.array_equal(getattr(a, column), getattr(b, column))
+    assert [a.type_names[t] for t in a.types] == [b.type_names[t] for t in b.types]
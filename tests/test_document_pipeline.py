@@ -0,0 +1,71 @@
+import os
+import shutil
+import sys
+
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import build, main_folder
+from NodeRAG.benchmark.corpus import synthetic_corpus
+from NodeRAG.build.component.document import document
+from NodeRAG.storage import ParquetRowWriter, storage
+from NodeRAG.utils import SemanticTextSplitter
+
+
+def test_split_workers_store_the_texts_of_sequential_splitting(tmp_path):
+
+    sequential, parallel = main_folder(tmp_path / 'sequential'), main_folder(tmp_path / 'parallel')
+    synthetic_corpus(os.path.join(sequential, 'input'), 90, 64, chunks_per_document=10, entities=40)
+    shutil.copytree(os.path.join(sequential, 'input'), os.path.join(parallel, 'input'), dirs_exist_ok=True)
+    build(sequential, split_workers=1)
+    build(parallel, split_workers=3)
+
+    for file, path_columns in [('text.parquet', []), ('documents.parquet', ['path'])]:
+        expected = storage.load(os.path.join(sequential, 'cache', file)).drop(columns=path_columns)
+        assert len(expected) >= 9
+        assert storage.load(os.path.join(parallel, 'cache', file)).drop(columns=path_columns).equals(expected)
+
+
+def test_row_writer_appends_in_row_groups(tmp_path):
+
+    path = str(tmp_path / 'rows.parquet')
+    with ParquetRowWriter(path, row_group_size=4) as writer:
+        writer.write_rows({'id': i, 'text': str(i)} for i in range(10))
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+
+    # a column the file does not have yet is null in its earlier rows
+    with ParquetRowWriter(path, append=True, row_group_size=4) as writer:
+        writer.write_rows({'id': i, 'text': str(i), 'extra': i} for i in range(10, 15))
+    df = storage.load(path)
+    assert df['id'].tolist() == list(range(15))
+    assert df['extra'].isna().sum() == 10
+
+
+def test_failed_write_keeps_the_stored_rows(tmp_path):
+
+    path = str(tmp_path / 'rows.parquet')
+    with ParquetRowWriter(path) as writer:
+        writer.write_rows({'id': i} for i in range(3))
+    with pytest.raises(RuntimeError):
+        with ParquetRowWriter(path, append=True, row_group_size=2) as writer:
+            writer.write_rows({'id': i} for i in range(3, 8))
+            raise RuntimeError('interrupted')
+    assert storage.load(path)['id'].tolist() == [0, 1, 2]
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_file_read_in_blocks_splits_as_a_whole(tmp_path, monkeypatch):
+
+    path, = synthetic_corpus(str(tmp_path), 20, 64, chunks_per_document=20)
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    splitter = SemanticTextSplitter(chunk_size=64, model_name='fake')
+
+    # the package exports the document class under the module's name
+    monkeypatch.setattr(sys.modules[document.__module__], 'BLOCK_SIZE', 100)
+    streamed = document(path=path, splitter=splitter)
+    whole = document(raw_context=text, splitter=splitter)
+    assert streamed.hash_id == whole.hash_id
+    texts = [unit.raw_context for unit in streamed.iter_text_units()]
+    assert len(texts) > 10
+    assert texts == [unit.raw_context for unit in whole.iter_text_units()]
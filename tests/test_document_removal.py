@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import build, main_folder
+from NodeRAG.benchmark.build_benchmark import run_build
+from NodeRAG.benchmark.corpus import synthetic_corpus
+from NodeRAG.build.pipeline.document_removal import Document_removal
+
+
+GRAPH_TYPES = ('semantic_unit', 'entity', 'relationship', 'text')
+ROW_COLUMNS = {'semantic_units.parquet': ['context', 'tokens', 'text_hash_id', 'weight'],
+               'entities.parquet': ['context', 'tokens', 'text_hash_id', 'weight'],
+               'relationship.parquet': ['context', 'tokens', 'text_hash_id', 'weight'],
+               'text.parquet': ['context']}
+
+
+def interrupted_build(config):
+    '''Build with the removal stopped after its graph step'''
+
+    def interrupt(self):
+        raise RuntimeError('interrupted')
+    Document_removal.update_parquets = interrupt
+    run_build(config)
+
+
+def snapshot(folder):
+    '''Graph weights and the stored rows of the nodes a removal changes'''
+
+    from NodeRAG.storage import GraphStore, storage
+
+    cache = os.path.join(folder, 'cache')
+    G = GraphStore(os.path.join(cache, 'graph.pkl')).load(track=False)
+    nodes = {node for node, data in G.nodes(data=True) if data.get('type') in GRAPH_TYPES}
+    graph = {'nodes': {node: G.nodes[node].get('weight') for node in nodes},
+             'edges': {frozenset(edge): G.edges[edge].get('weight') for edge in G.subgraph(nodes).edges}}
+    rows = {}
+    for file, columns in ROW_COLUMNS.items():
+        df = storage.load(os.path.join(cache, file))
+        rows[file] = df.set_index('hash_id')[columns].sort_index().to_dict('index')
+    return graph, rows
+
+
+@pytest.fixture
+def corpora(tmp_path):
+    '''A build of three documents with the first deleted, and a fresh build of the other two'''
+
+    removed, fresh = main_folder(tmp_path / 'removed'), main_folder(tmp_path / 'fresh')
+    paths = synthetic_corpus(os.path.join(removed, 'input'), 30, 64, chunks_per_document=10, entities=25)
+    build(removed)
+    os.remove(paths[0])
+    for path in paths[1:]:
+        shutil.copy(path, os.path.join(fresh, 'input'))
+    build(fresh)
+    return removed, fresh
+
+
+def test_removal_matches_fresh_build(corpora):
+
+    removed, fresh = corpora
+    build(removed)
+    assert snapshot(removed) == snapshot(fresh)
+
+
+def test_interrupted_removal_is_finished_once(corpora):
+
+    removed, fresh = corpora
+    with pytest.raises(Exception):
+        build(removed, interrupted_build)
+    assert os.path.exists(os.path.join(removed, 'cache', 'removal_journal.json'))
+    build(removed)
+    assert not os.path.exists(os.path.join(removed, 'cache', 'removal_journal.json'))
+    assert snapshot(removed) == snapshot(fresh)
+
+
+def test_marked_communities_are_written_once(tmp_path):
+
+    removal = Document_removal.__new__(Document_removal)
+    removal.config = SimpleNamespace(resummarize_path=str(tmp_path / 'resummarize.jsonl'))
+    removal.communities = [['a', 'b'], ['c']]
+    # a removal resumed after its communities were written marks them again
+    removal.mark_communities()
+    removal.mark_communities()
+    with open(removal.config.resummarize_path, encoding='utf-8') as f:
+        assert f.read().splitlines() == ['{"community": ["a", "b"]}', '{"community": ["c"]}']
+
+
+def test_decomposition_without_output_is_skipped(tmp_path):
+
+    path = tmp_path / 'text_decomposition.jsonl'
+    path.write_text(json.dumps({'text_hash_id': 'removed', 'response': {}}) + '\n'
+                    + json.dumps({'text_hash_id': 'kept', 'response': {}, 'processed': True}) + '\n')
+    removal = Document_removal.__new__(Document_removal)
+    removal.config = SimpleNamespace(text_decomposition_path=str(path))
+    removal.removed_texts = {'removed'}
+    removal.scan_decomposition()
+    with open(str(path) + '.tmp', encoding='utf-8') as f:
+        assert [json.loads(line)['text_hash_id'] for line in f] == ['kept']
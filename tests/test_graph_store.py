@@ -0,0 +1,71 @@
+import os
+
+import networkx as nx
+
+from NodeRAG.storage import GraphStore, TrackedGraph
+
+
+def state(G):
+    return dict(G.nodes(data=True)), {frozenset((u, v)): data for u, v, data in G.edges(data=True)}
+
+
+def path_graph(n):
+
+    G = nx.Graph()
+    G.add_nodes_from((i, {'type': 'entity', 'weight': 1}) for i in range(n))
+    G.add_edges_from(((i, i + 1) for i in range(n - 1)), weight=1)
+    return G
+
+
+def test_save_appends_only_the_changes(tmp_path):
+
+    store = GraphStore(str(tmp_path / 'graph.pkl'))
+    store.save(path_graph(100))
+    snapshot = os.stat(store.path)
+
+    G = store.load()
+    assert isinstance(G, TrackedGraph) and not G.changed_nodes
+    G.nodes[3]['weight'] += 1
+    del G.nodes[4]['type']
+    G[5][6]['weight'] = 7
+    G.add_edge(0, 99, weight=2)
+    G.remove_node(50)
+    store.save(G)
+
+    # the snapshot is untouched, the log holds the five changed nodes and edges and the removal
+    assert os.stat(store.path) == snapshot
+    assert os.path.getsize(store.delta_path) < os.path.getsize(store.path) / 10
+    assert state(store.load(track=False)) == state(G)
+    assert type(store.load(track=False)) is nx.Graph
+
+
+def test_log_is_compacted_into_the_snapshot(tmp_path):
+
+    store = GraphStore(str(tmp_path / 'graph.pkl'), compaction_ratio=0.5)
+    store.save(path_graph(50))
+    snapshot = os.stat(store.path)
+    G = store.load()
+    for i in range(50):
+        G.nodes[i]['weight'] = 2
+        store.save(G)
+        # the log never grows beyond half the snapshot, it is folded into a new one instead
+        assert not os.path.exists(store.delta_path) or os.path.getsize(store.delta_path) <= 0.5 * os.path.getsize(store.path)
+    assert os.stat(store.path).st_mtime_ns != snapshot.st_mtime_ns
+    assert state(store.load()) == state(G)
+
+
+def test_log_of_an_older_snapshot_is_skipped(tmp_path):
+
+    store = GraphStore(str(tmp_path / 'graph.pkl'))
+    store.save(path_graph(10))
+    G = store.load()
+    G.nodes[0]['weight'] = 5
+    store.save(G)
+    with open(store.delta_path, 'rb') as f:
+        stale = f.read()
+
+    # a compaction interrupted after the snapshot was replaced, before its log was removed
+    store.snapshot(path_graph(10))
+    with open(store.delta_path, 'wb') as f:
+        f.write(stale)
+    assert store.load().nodes[0]['weight'] == 1
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from NodeRAG.storage import IdDictionary, storage
+from NodeRAG.utils.HNSW import HNSW
+
+
+@pytest.fixture
+def config(tmp_path):
+    return SimpleNamespace(node_ids_path=str(tmp_path / 'node_ids.parquet'),
+                           id_map_path=str(tmp_path / 'id_map.parquet'),
+                           HNSW_path=str(tmp_path / 'HNSW.bin'),
+                           hnsw_graph_path=str(tmp_path / 'hnsw_graph.pkl'),
+                           space='l2', dim=4, _ef=50, _m=5)
+
+
+def vectors(n):
+    return np.random.default_rng(0).standard_normal((n, 4)).astype(np.float32)
+
+
+def test_id_map_stores_node_codes(config):
+
+    embeddings = vectors(20)
+    hnsw = HNSW(config)
+    hnsw.add_nodes([(f'node-{i}', embeddings[i]) for i in range(20)])
+    hnsw.save_HNSW()
+
+    assert storage.load(config.id_map_path)['node'].dtype == np.int32
+    assert list(IdDictionary.load(config.node_ids_path)) == [f'node-{i}' for i in range(20)]
+    hnsw = HNSW(config)
+    assert [node for dist, node in hnsw.search(embeddings[7], 1)] == ['node-7']
+
+
+def test_removed_nodes_are_not_returned(config):
+
+    embeddings = vectors(20)
+    hnsw = HNSW(config)
+    hnsw.add_nodes([(f'node-{i}', embeddings[i]) for i in range(20)])
+    assert hnsw.remove_nodes({'node-7', 'unknown'}) == 1
+    hnsw.save_HNSW()
+
+    hnsw = HNSW(config)
+    assert 'node-7' not in [node for dist, node in hnsw.search(embeddings[7], 5)]
+    assert 'node-7' not in hnsw.nxgraphs
+    # labels continue after the deleted item, the code of node-7 is not reused
+    hnsw.add_nodes([('node-20', embeddings[7])])
+    assert [node for dist, node in hnsw.search(embeddings[7], 1)] == ['node-20']
+    assert hnsw.node_ids.code('node-20') == 20
+
+
+def test_hex_id_map_is_read(config):
+
+    embeddings = vectors(5)
+    hnsw = HNSW(config)
+    hnsw.add_nodes([(f'node-{i}', embeddings[i]) for i in range(5)])
+    hnsw.hnsw.save_index(config.HNSW_path)
+    # an id map written before the node id dictionary, without node_ids.parquet
+    storage({'id': list(range(5)), 'node': [f'node-{i}' for i in range(5)]}).save_parquet(config.id_map_path)
+
+    hnsw = HNSW(config)
+    assert [node for dist, node in hnsw.search(embeddings[3], 1)] == ['node-3']
+    assert dict(hnsw.get_embeddings()).keys() == {f'node-{i}' for i in range(5)}
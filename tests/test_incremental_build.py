@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from conftest import build, main_folder, provider_calls
+from NodeRAG.benchmark.corpus import synthetic_corpus
+from NodeRAG.storage import FileManifest, storage
+
+
+def test_manifest_classifies_the_input_files(tmp_path, monkeypatch):
+
+    files = {name: tmp_path / f'{name}.md' for name in ('kept', 'touched', 'modified', 'deleted')}
+    for name, path in files.items():
+        path.write_text(f'{name} content')
+    manifest = FileManifest(str(tmp_path / 'manifest.json'))
+    manifest.save(manifest.scan([str(path) for path in files.values()])['entries'])
+
+    files['touched'].write_text('touched content')
+    os.utime(files['touched'], ns=(0, 0))
+    files['modified'].write_text('modified content, longer')
+    files['deleted'].unlink()
+    (tmp_path / 'new.md').write_text('new content')
+
+    hashed = []
+    content_hash = FileManifest.content_hash
+    monkeypatch.setattr(FileManifest, 'content_hash', staticmethod(lambda path: hashed.append(path) or content_hash(path)))
+    paths = [str(files[name]) for name in ('kept', 'touched', 'modified')] + [str(tmp_path / 'new.md')]
+    changes = FileManifest(manifest.path).scan(paths)
+
+    assert changes['unchanged'] == [str(files['kept']), str(files['touched'])]
+    assert changes['modified'] == [str(files['modified'])]
+    assert changes['new'] == [str(tmp_path / 'new.md')]
+    assert changes['deleted'] == [str(files['deleted'])]
+    # a file with the size and mtime of the manifest is not read
+    assert str(files['kept']) not in hashed
+
+
+@pytest.fixture
+def built(tmp_path):
+
+    folder = main_folder(tmp_path / 'corpus')
+    synthetic_corpus(os.path.join(folder, 'input'), 30, 64, chunks_per_document=10, entities=25)
+    build(folder)
+    return folder
+
+
+def test_rebuild_without_changes_does_nothing(built):
+
+    text_path = os.path.join(built, 'cache', 'text.parquet')
+    stored = os.stat(text_path).st_mtime_ns
+    assert provider_calls(build(built)) == 0
+    assert os.stat(text_path).st_mtime_ns == stored
+
+
+def test_added_document_decomposes_only_its_texts(built, tmp_path):
+
+    texts = len(storage.load(os.path.join(built, 'cache', 'text.parquet')))
+    # a corpus of other names and seed, written beside the first one
+    synthetic_corpus(str(tmp_path / 'added'), 10, 64, chunks_per_document=10, entities=10, seed=1)
+    for name in os.listdir(tmp_path / 'added'):
+        os.replace(tmp_path / 'added' / name, os.path.join(built, 'input', f'added_{name}'))
+
+    report = build(built)
+    added = len(storage.load(os.path.join(built, 'cache', 'text.parquet'))) - texts
+    assert added > 0
+    assert report['states']['Text pipeline']['llm_requests'] == added
@@ -0,0 +1,124 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pytest
+
+from NodeRAG.LLM.rate_limiter import FileTokenBucket, RateLimiter, TokenBucket
+
+
+class Clock():
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    for cls in (TokenBucket, FileTokenBucket, RateLimiter):
+        monkeypatch.setattr(cls, 'clock', staticmethod(clock))
+    return clock
+
+
+def test_bucket_paces_requests_after_the_burst(clock):
+
+    bucket = TokenBucket(60, capacity=2)
+    assert [bucket.reserve(1) for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+    clock.now += 2.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_token_budget_delays_large_requests(clock):
+
+    limiter = RateLimiter(6000, tokens_per_minute=600)
+    assert limiter.reserve(tokens=600) == 0.0
+    # the bucket is in debt for 300 tokens, refilled at 10 per second
+    assert limiter.reserve(tokens=300) == pytest.approx(30.0)
+
+
+@pytest.mark.parametrize('rate', [0, -5])
+def test_non_positive_rate_is_unlimited(clock, rate):
+
+    limiter = RateLimiter(rate, tokens_per_minute=rate)
+    assert limiter.effective_rate == math.inf
+    assert not limiter.counts_tokens
+    assert all(limiter.reserve(tokens=100) == 0.0 for _ in range(1000))
+    # a throttle still pauses requests
+    limiter.on_throttle(retry_after=3.0)
+    assert limiter.reserve() == pytest.approx(3.0)
+
+
+def test_buckets_reject_non_positive_rates(tmp_path):
+
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    with pytest.raises(ValueError):
+        FileTokenBucket(str(tmp_path / 'bucket'), 0)
+
+
+def take_tokens(path: str, count: int) -> None:
+    bucket = FileTokenBucket(path, 6, capacity=10)
+    for _ in range(count):
+        bucket.reserve(1)
+
+
+def test_file_bucket_is_shared_across_processes(tmp_path):
+
+    path = str(tmp_path / 'bucket')
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        executor.submit(take_tokens, path, 10).result()
+    # the other process emptied the bucket, one token comes back every 10 s
+    assert FileTokenBucket(path, 6, capacity=10).reserve(1) > 5.0
+
+
+def test_file_bucket_budget_and_pause_are_shared(tmp_path, clock):
+
+    path = str(tmp_path / 'bucket')
+    first, second = FileTokenBucket(path, 600, capacity=10), FileTokenBucket(path, 600, capacity=10)
+    assert [bucket.reserve(1) for bucket in [first, second] * 5] == [0.0] * 10
+    # ten tokens taken through two holders, the next one waits for a tenth of a second of refill
+    assert second.reserve(1) == pytest.approx(0.1)
+    first.pause(4.0)
+    assert second.reserve(1) == pytest.approx(4.0)
+
+
+def test_throttle_burst_decreases_once_per_window(clock):
+
+    limiter = RateLimiter(600, max_concurrency=4, decrease_window=5.0)
+    for _ in range(10):
+        limiter.on_throttle(retry_after=0.0)
+    assert limiter.factor == 0.5
+    assert limiter.effective_concurrency == 4
+    clock.now += 5.0
+    limiter.on_throttle(retry_after=0.0)
+    assert limiter.factor == 0.25
+
+
+def test_rate_recovers_under_random_throttling(clock):
+
+    # 30% of requests throttled at 10 per second, the old halving per throttle ended at the floor
+    limiter = RateLimiter(600, max_concurrency=4)
+    for request in range(600):
+        clock.now += 0.1
+        if request % 10 < 3:
+            limiter.on_throttle(retry_after=0.0)
+        else:
+            limiter.on_success()
+    assert limiter.factor > 0.5
+
+
+def test_rate_recovers_to_the_budget(clock):
+
+    limiter = RateLimiter(600, min_factor=0.05)
+    for _ in range(5):
+        limiter.on_throttle(retry_after=0.0)
+        clock.now += 5.0
+    assert limiter.factor == pytest.approx(0.05)
+    for _ in range(200):
+        limiter.on_success()
+    assert limiter.factor == 1.0
+    assert limiter.effective_rate == 600
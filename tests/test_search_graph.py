@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from NodeRAG.storage import GraphStore, storage
+from NodeRAG.utils import CompactGraph, SearchGraphStore
+from NodeRAG.utils.graph_operator import GraphConcat
+
+
+def weighted_graph(n, m, seed):
+
+    G = nx.gnm_random_graph(n, m, seed=seed)
+    rng = np.random.default_rng(seed)
+    for u, v in G.edges:
+        G[u][v]['weight'] = int(rng.integers(1, 4))
+    return nx.relabel_nodes(G, str)
+
+
+@pytest.fixture
+def graphs():
+    '''A base graph and an HNSW graph sharing some edges, with a few nodes of its own'''
+
+    base = weighted_graph(200, 600, seed=0)
+    hnsw = nx.relabel_nodes(nx.gnm_random_graph(230, 500, seed=1), str)
+    hnsw.add_edges_from(list(base.edges)[:50])
+    return base, hnsw
+
+
+def test_array_merge_and_clip_match_the_networkx_version(graphs):
+
+    base, hnsw = graphs
+    expected = GraphConcat.unbalance_adjust(GraphConcat(base.copy()).concat(hnsw))
+    compact = CompactGraph.from_networkx(base).concat(hnsw).unbalance_adjust()
+
+    merged = compact.to_networkx()
+    assert set(merged.nodes) == set(expected.nodes)
+    assert {frozenset(edge) for edge in merged.edges} == {frozenset(edge) for edge in expected.edges}
+    for u, v, weight in expected.edges(data='weight'):
+        assert merged[u][v]['weight'] == pytest.approx(weight, rel=1e-6)
+
+
+def test_stored_search_graph_is_used_until_its_sources_change(graphs, tmp_path):
+
+    base, hnsw = graphs
+    config = SimpleNamespace(search_graph_path=str(tmp_path / 'search_graph.pkl'),
+                             base_graph_path=str(tmp_path / 'graph.pkl'),
+                             hnsw_graph_path=str(tmp_path / 'hnsw_graph.pkl'))
+    GraphStore(config.base_graph_path).snapshot(base)
+    storage(hnsw).save_pickle(config.hnsw_graph_path)
+    store = SearchGraphStore(config)
+    store.save(store.build())
+
+    stored = store.load()
+    assert stored.n_edges == CompactGraph.from_networkx(base).concat(hnsw).n_edges
+    # a stored graph is returned as it is, without looking at the base graph
+    stored.edge_weight[:] = 0
+    store.save(stored)
+    assert not store.load().edge_weight.any()
+
+    # a save to the base graph's delta log makes it stale
+    G = GraphStore(config.base_graph_path).load()
+    G.add_edge('new', '0', weight=1)
+    GraphStore(config.base_graph_path).save(G)
+    rebuilt = store.load()
+    assert rebuilt.edge_weight.all()
+    assert 'new' in rebuilt.ids
@@ -0,0 +1,67 @@
+import random
+
+from NodeRAG.utils import SemanticTextSplitter
+from NodeRAG.utils.token_utils import tiktoken_counter
+
+
+def document(sentences=400, seed=0):
+
+    rng = random.Random(seed)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta']
+    paragraphs = []
+    for start in range(0, sentences, 7):
+        paragraphs.append(' '.join(' '.join(rng.choices(words, k=rng.randint(4, 12))).capitalize() + rng.choice('.!?;')
+                                   for _ in range(min(7, sentences - start))))
+    return '\n\n'.join(paragraphs)
+
+
+def test_chunks_fit_the_window_and_end_at_boundaries():
+
+    splitter = SemanticTextSplitter(chunk_size=60, model_name='fake')
+    text = document()
+    chunks = splitter.split(text)
+
+    assert len(chunks) > 10
+    assert all(splitter.token_counter(chunk) <= 60 for chunk in chunks)
+    assert all(chunk[-1] in '.!?;' for chunk in chunks)
+    assert ''.join(''.join(chunks).split()) == ''.join(text.split())
+
+
+def test_text_without_boundaries_is_cut_at_the_window():
+
+    splitter = SemanticTextSplitter(chunk_size=10, model_name='fake')
+    chunks = splitter.split(' '.join(['word'] * 95))
+    assert [splitter.token_counter(chunk) for chunk in chunks] == [10] * 9 + [5]
+
+
+def test_document_is_tokenized_once(monkeypatch):
+
+    splitter = SemanticTextSplitter(chunk_size=60, model_name='fake')
+    calls = []
+    offsets = splitter.token_counter.offsets
+    monkeypatch.setattr(splitter.token_counter, 'offsets', lambda text: calls.append(len(text)) or offsets(text))
+    text = document()
+    chunks = splitter.split(text)
+    # the whole text once, then only the rest shorter than a window that was held back for more text
+    assert calls[0] == len(text)
+    assert sum(calls[1:]) <= max(len(chunk) for chunk in chunks) + 2
+
+
+class ByteTokenizer():
+    '''Three utf-8 bytes per token, so tokens start inside multibyte characters'''
+
+    def encode(self, text):
+        data = text.encode('utf-8')
+        return [data[i:i + 3] for i in range(0, len(data), 3)]
+
+    def decode_tokens_bytes(self, tokens):
+        return tokens
+
+
+def test_token_offsets_map_to_the_character_they_start_in():
+
+    counter = tiktoken_counter.__new__(tiktoken_counter)
+    counter.tokenizer = ByteTokenizer()
+    text = 'ab。cd！é'
+    # tokens start at bytes 0, 3, 6 and 9: a, inside 。, d and inside ！
+    assert counter.offsets(text).tolist() == [0, 2, 4, 5]
@@ -0,0 +1,65 @@
+import networkx as nx
+import pytest
+
+from NodeRAG.storage import GraphStore
+from NodeRAG.utils import CompactGraph, PageRankStore, sparse_PPR
+from NodeRAG.Vis.html.visual_html import filter_nodes
+
+
+def sparse_graph(seed=0):
+    '''Random sparse graph with string ids, almost surely connected'''
+
+    G = nx.connected_watts_strogatz_graph(400, 4, 0.2, seed=seed)
+    nx.set_edge_attributes(G, 1, 'weight')
+    return nx.relabel_nodes(G, lambda i: f'n{i:03d}')
+
+
+def test_page_rank_is_stored_until_the_graph_changes(tmp_path):
+
+    graph_path, path = str(tmp_path / 'graph.pkl'), str(tmp_path / 'pagerank.pkl')
+    G = sparse_graph()
+    GraphStore(graph_path).snapshot(G)
+    store = PageRankStore(path, graph_path)
+    store.save([('stored', 1.0)])
+    assert store.load() == [('stored', 1.0)]
+
+    G.add_edge('n000', 'n200', weight=1)
+    GraphStore(graph_path).snapshot(G)
+    assert [node for node, score in store.load()] == [node for node, score in sparse_PPR(G).PR()]
+
+
+def test_connectors_join_the_selected_nodes():
+
+    G = sparse_graph()
+    compact = CompactGraph.from_networkx(G)
+    selected = [f'n{i:03d}' for i in range(0, 400, 37)]
+    added = compact.ids.decode(compact.steiner_connectors(compact.ids.encode(selected)))
+
+    assert not set(added) & set(selected)
+    assert nx.is_connected(G.subgraph(set(selected) | set(added)))
+    # no worse than twice the networkx approximation, which is itself within twice the optimum
+    reference = nx.algorithms.approximation.steiner_tree(G, selected)
+    assert len(added) <= 2 * (reference.number_of_nodes() - len(selected))
+
+
+def test_unreachable_components_stay_apart():
+
+    G = nx.union(sparse_graph(), nx.relabel_nodes(nx.path_graph(5), lambda i: f'island{i}'))
+    compact = CompactGraph.from_networkx(G)
+    selected = ['n000', 'n100', 'n300', 'island0', 'island4']
+    added = set(compact.ids.decode(compact.steiner_connectors(compact.ids.encode(selected))))
+
+    components = list(nx.connected_components(G.subgraph(set(selected) | added)))
+    assert len(components) == 2
+    assert {'island1', 'island2', 'island3'} <= added
+
+
+@pytest.mark.parametrize('nodes_num', [20, 80])
+def test_filtered_subgraph_is_connected(nodes_num):
+
+    G = sparse_graph(seed=1)
+    page_rank = sparse_PPR(G).PR()
+    subgraph, weighted_nodes = filter_nodes(G, nodes_num, page_rank)
+    assert nx.is_connected(subgraph)
+    assert {node for node, score in page_rank[:nodes_num]} <= set(subgraph)
+    assert weighted_nodes == dict(page_rank)